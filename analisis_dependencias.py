@@ -0,0 +1,349 @@
+# sistema_contador/analisis_dependencias.py
+"""
+Análisis de dependencias del proyecto a partir de mediciones reales
+- Recorre los módulos .py con ast para encontrar qué se importa, dónde y si la importación
+  ocurre al cargar el módulo o dentro de una función (carga diferida).
+- Mide cada dependencia externa en un intérprete limpio con -X importtime: tiempo de import,
+  memoria residente que agrega y cantidad de módulos que arrastra.
+- Mide el arranque de app.py y lo reparte por paquete.
+
+El resultado se guarda en disco junto con una huella de requirements.txt y de las fuentes;
+mientras ninguno cambie, analizar_proyecto() devuelve el análisis guardado sin volver a medir.
+
+Uso:
+    python analisis_dependencias.py              # Resumen en consola
+    python analisis_dependencias.py --forzar     # Ignorar la caché
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from importlib import metadata
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+RUTA_CACHE = os.getenv('DEPENDENCIAS_CACHE',
+                       os.path.join(tempfile.gettempdir(), 'sistema_contador_dependencias.json'))
+REPETICIONES = int(os.getenv('DEPENDENCIAS_REPETICIONES', 3))   # Mediciones por dependencia (se usa la mediana)
+UMBRAL_PESADA_MS = float(os.getenv('DEPENDENCIAS_UMBRAL_MS', 50))  # Desde aquí una dependencia se considera pesada
+MODULO_ARRANQUE = 'app'
+# requirements.txt y las dependencias opcionales (formatos extra de exportación)
+ARCHIVOS_REQUIREMENTS = ('requirements.txt', 'requirements-opcional.txt')
+
+# Se ejecuta en un intérprete nuevo: importa el módulo indicado y reporta memoria y módulos cargados
+SCRIPT_MEDICION = """
+import json, os, sys
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo if sys.platform == 'darwin' else maximo * 1024
+    except Exception:
+        return None
+
+antes_rss, antes_modulos = rss(), len(sys.modules)
+for modulo in sys.argv[1:]:
+    __import__(modulo)
+despues_rss = rss()
+print(json.dumps({
+    'memoria_bytes': None if antes_rss is None or despues_rss is None else despues_rss - antes_rss,
+    'modulos': len(sys.modules) - antes_modulos
+}))
+"""
+
+def _es_prueba(archivo):
+    return os.path.basename(archivo).startswith('test_')
+
+def _fuentes(directorio):
+    return sorted(nombre for nombre in os.listdir(directorio) if nombre.endswith('.py'))
+
+def huella_proyecto(directorio=DIRECTORIO_PROYECTO):
+    """Huella de los requirements, las fuentes .py y la versión de Python"""
+    huella = hashlib.sha256(sys.version.encode())
+    for nombre in list(ARCHIVOS_REQUIREMENTS) + _fuentes(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if os.path.exists(ruta):
+            huella.update(nombre.encode())
+            with open(ruta, 'rb') as f:
+                huella.update(f.read())
+    return huella.hexdigest()[:16]
+
+def leer_requirements(directorio=DIRECTORIO_PROYECTO):
+    """{distribución normalizada: (nombre, versión fijada o None)} de requirements.txt y las opcionales"""
+    requisitos = {}
+    for archivo in ARCHIVOS_REQUIREMENTS:
+        ruta = os.path.join(directorio, archivo)
+        if not os.path.exists(ruta):
+            continue
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.split('#')[0].strip()
+                if not linea or linea.startswith('-'):
+                    continue
+                nombre, _, version = linea.partition('==')
+                requisitos[_normalizar(nombre)] = (nombre.strip(), version.strip() or None)
+    return requisitos
+
+def _normalizar(nombre):
+    return nombre.strip().lower().replace('_', '-').replace('.', '-')
+
+class _VisitanteImports(ast.NodeVisitor):
+    """Imports de un archivo y, para cada nombre importado, en qué funciones se usa"""
+
+    def __init__(self):
+        self.imports = []    # (módulo importado, linea, nombre ligado, en_funcion)
+        self.usos = {}       # nombre ligado -> {funciones o '<modulo>'}
+        self._ambito = []
+        self._funciones = 0
+
+    def _registrar(self, modulo, linea, nombre):
+        self.imports.append((modulo, linea, nombre, self._funciones > 0))
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._registrar(alias.name, node.lineno, (alias.asname or alias.name).split('.')[0])
+
+    def visit_ImportFrom(self, node):
+        if node.level or not node.module:
+            return
+        for alias in node.names:
+            self._registrar(node.module, node.lineno, alias.asname or alias.name)
+
+    def visit_ClassDef(self, node):
+        # El cuerpo de una clase se ejecuta al cargar el archivo; sus métodos no
+        self._ambito.append(node.name)
+        self.generic_visit(node)
+        self._ambito.pop()
+
+    def _visitar_funcion(self, node):
+        self._ambito.append(node.name)
+        self._funciones += 1
+        self.generic_visit(node)
+        self._funciones -= 1
+        self._ambito.pop()
+
+    visit_FunctionDef = _visitar_funcion
+    visit_AsyncFunctionDef = _visitar_funcion
+
+    def visit_Name(self, node):
+        ambito = '.'.join(self._ambito) if self._funciones else '<modulo>'
+        self.usos.setdefault(node.id, set()).add(ambito)
+
+def escanear_imports(directorio=DIRECTORIO_PROYECTO):
+    """
+    Imports de terceros de cada archivo .py del proyecto
+    Retorna: {módulo raíz: [{'archivo', 'linea', 'modulo', 'diferido', 'usado_en'}]}
+      diferido: la importación ya está dentro de una función
+      usado_en: funciones que usan el nombre importado ('<modulo>' si se usa al cargar el archivo)
+    """
+    locales = {nombre[:-3] for nombre in _fuentes(directorio)}
+    estandar = set(sys.stdlib_module_names) | {'__future__'}
+    encontrados = {}
+
+    for nombre in _fuentes(directorio):
+        with open(os.path.join(directorio, nombre), encoding='utf-8-sig') as f:
+            arbol = ast.parse(f.read(), filename=nombre)
+        visitante = _VisitanteImports()
+        visitante.visit(arbol)
+
+        for modulo, linea, ligado, en_funcion in visitante.imports:
+            raiz = modulo.split('.')[0]
+            if raiz in locales or raiz in estandar:
+                continue
+            encontrados.setdefault(raiz, []).append({
+                'archivo': nombre,
+                'linea': linea,
+                'modulo': modulo,
+                'diferido': en_funcion,
+                'usado_en': sorted(visitante.usos.get(ligado, set()))
+            })
+    return encontrados
+
+def _parsear_importtime(salida):
+    """Filas (self_us, acumulado_us, módulo, nivel) de la salida de -X importtime"""
+    filas = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'imported package' in linea:
+            continue
+        propio, acumulado, modulo = linea[len('import time:'):].split('|')
+        nivel = len(modulo) - len(modulo.lstrip())
+        filas.append((int(propio), int(acumulado), modulo.strip(), nivel))
+    return filas
+
+def medir_import(modulos, directorio=DIRECTORIO_PROYECTO):
+    """
+    Importar uno o más módulos (del mismo paquete) en un intérprete limpio
+    Retorna: {'ms', 'memoria_bytes', 'modulos', 'por_paquete': {paquete: ms propios}} o {'error'}
+    """
+    if isinstance(modulos, str):
+        modulos = [modulos]
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT_MEDICION, *modulos],
+        cwd=directorio, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        ultima = proceso.stderr.strip().splitlines()[-1:] or ['error desconocido']
+        return {'error': ultima[0]}
+
+    filas = _parsear_importtime(proceso.stderr)
+    raices = {modulo.split('.')[0] for modulo in modulos}
+    nivel_superior = min((nivel for *_, nivel in filas), default=0)
+    por_paquete = {}
+    for propio, _, nombre, _ in filas:
+        paquete = nombre.split('.')[0]
+        por_paquete[paquete] = por_paquete.get(paquete, 0) + propio / 1000
+
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    # Tiempo acumulado de los imports pedidos (las entradas de primer nivel del paquete)
+    resultado['ms'] = sum(
+        acumulado for _, acumulado, nombre, nivel in filas
+        if nivel == nivel_superior and nombre.split('.')[0] in raices
+    ) / 1000
+    resultado['por_paquete'] = por_paquete
+    return resultado
+
+def _mediana(mediciones):
+    validas = [m for m in mediciones if 'error' not in m]
+    if not validas:
+        return mediciones[0]
+    medida = dict(validas[0])
+    medida['ms'] = statistics.median(m['ms'] for m in validas)
+    memorias = [m['memoria_bytes'] for m in validas if m['memoria_bytes'] is not None]
+    medida['memoria_bytes'] = statistics.median(memorias) if memorias else None
+    return medida
+
+def analizar_proyecto(directorio=DIRECTORIO_PROYECTO, repeticiones=REPETICIONES, ruta_cache=RUTA_CACHE, forzar=False):
+    """Análisis completo; se reutiliza el guardado en ruta_cache mientras la huella no cambie"""
+    huella = huella_proyecto(directorio)
+    if not forzar and ruta_cache and os.path.exists(ruta_cache):
+        try:
+            with open(ruta_cache, encoding='utf-8') as f:
+                guardado = json.load(f)
+            if guardado.get('huella') == huella:
+                return guardado
+        except (OSError, ValueError):
+            pass
+
+    requisitos = leer_requirements(directorio)
+    imports = escanear_imports(directorio)
+
+    # Recorre todos los paquetes instalados: se calcula una vez por análisis
+    distribuciones_por_modulo = metadata.packages_distributions()
+    dependencias = []
+    for modulo, usos in sorted(imports.items()):
+        distribuciones = distribuciones_por_modulo.get(modulo, [])
+        distribucion = distribuciones[0] if distribuciones else modulo
+        requerida = requisitos.get(_normalizar(distribucion))
+        try:
+            instalada = metadata.version(distribucion)
+        except metadata.PackageNotFoundError:
+            instalada = None
+
+        importados = sorted({uso['modulo'] for uso in usos})
+        medida = _mediana([medir_import(importados, directorio) for _ in range(repeticiones)]) if instalada else {}
+        solo_pruebas = all(_es_prueba(uso['archivo']) for uso in usos)
+        al_cargar = [uso for uso in usos if not uso['diferido'] and not _es_prueba(uso['archivo'])]
+        dependencias.append({
+            'modulo': modulo,
+            'distribucion': distribucion,
+            'version_requerida': requerida[1] if requerida else None,
+            'en_requirements': requerida is not None,
+            'version_instalada': instalada,
+            'ms': medida.get('ms'),
+            'memoria_mb': None if medida.get('memoria_bytes') is None else round(medida['memoria_bytes'] / 2**20, 1),
+            'modulos': medida.get('modulos'),
+            'error': medida.get('error'),
+            'usos': usos,
+            'solo_pruebas': solo_pruebas,
+            # Se puede diferir si ningún import de aplicación se usa mientras se carga el archivo
+            'diferible': bool(al_cargar) and all('<modulo>' not in uso['usado_en'] for uso in al_cargar),
+            'al_cargar': bool(al_cargar)
+        })
+
+    arranque = _mediana([medir_import(MODULO_ARRANQUE, directorio) for _ in range(repeticiones)])
+    en_uso = {_normalizar(d['distribucion']) for d in dependencias}
+
+    analisis = {
+        'huella': huella,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'umbral_pesada_ms': UMBRAL_PESADA_MS,
+        'instaladas': len({_normalizar(d.metadata['Name']) for d in metadata.distributions()}),
+        'dependencias': dependencias,
+        'requirements': [[nombre, version] for nombre, version in requisitos.values()],
+        'sin_uso': sorted(nombre for clave, (nombre, _) in requisitos.items() if clave not in en_uso),
+        'arranque': {
+            'modulo': MODULO_ARRANQUE,
+            'ms': arranque.get('ms'),
+            'memoria_mb': None if arranque.get('memoria_bytes') is None else round(arranque['memoria_bytes'] / 2**20, 1),
+            'modulos': arranque.get('modulos'),
+            'error': arranque.get('error'),
+            'por_paquete': dict(sorted(arranque.get('por_paquete', {}).items(), key=lambda p: -p[1]))
+        }
+    }
+
+    if ruta_cache:
+        temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(analisis, f, ensure_ascii=False, indent=1)
+        os.replace(temporal, ruta_cache)
+    return analisis
+
+def hallazgos(analisis):
+    """Observaciones derivadas de las mediciones: (severidad, dependencia, descripción)"""
+    resultado = []
+    for dep in analisis['dependencias']:
+        nombre = dep['distribucion']
+        if dep['version_instalada'] is None:
+            resultado.append(('ALTA', nombre, 'Importada en el código pero no instalada'))
+        elif dep['version_requerida'] and dep['version_requerida'] != dep['version_instalada']:
+            resultado.append(('MEDIA', nombre, f"requirements.txt fija {dep['version_requerida']} "
+                                               f"y está instalada {dep['version_instalada']}"))
+        if not dep['en_requirements'] and not dep['solo_pruebas']:
+            resultado.append(('MEDIA', nombre, 'Importada por la aplicación pero ausente de requirements.txt'))
+        if dep['error']:
+            resultado.append(('ALTA', nombre, f"Falla al importar: {dep['error']}"))
+        if dep['diferible'] and (dep['ms'] or 0) >= analisis['umbral_pesada_ms']:
+            funciones = sorted({f"{uso['archivo']}:{f}" for uso in dep['usos'] if not uso['diferido']
+                                for f in uso['usado_en']})
+            resultado.append(('BAJA', nombre, f"{dep['ms']:.0f} ms al importar; solo se usa en "
+                                              f"{', '.join(funciones)}: puede cargarse de forma diferida"))
+    for nombre in analisis['sin_uso']:
+        resultado.append(('BAJA', nombre, 'En requirements.txt pero ningún módulo de la aplicación la importa'))
+    for dep in analisis['dependencias']:
+        if dep['solo_pruebas'] and dep['en_requirements']:
+            resultado.append(('BAJA', dep['distribucion'], 'Solo la importan las pruebas'))
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description='Medir el costo de importar cada dependencia del proyecto')
+    parser.add_argument('--forzar', action='store_true', help='Volver a medir aunque haya un análisis en caché')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES, help='Mediciones por dependencia')
+    args = parser.parse_args()
+
+    analisis = analizar_proyecto(repeticiones=args.repeticiones, forzar=args.forzar)
+    print(f"📦 Dependencias (Python {analisis['python']}, huella {analisis['huella']}, {analisis['fecha']})")
+    for dep in sorted(analisis['dependencias'], key=lambda d: -(d['ms'] or 0)):
+        memoria = '—' if dep['memoria_mb'] is None else f"{dep['memoria_mb']:.1f} MB"
+        tiempo = '—' if dep['ms'] is None else f"{dep['ms']:.0f} ms"
+        print(f"  {dep['distribucion']:<28} {tiempo:>8} {memoria:>10}  {dep['modulos'] or 0:>5} módulos")
+    arranque = analisis['arranque']
+    if arranque['ms'] is not None:
+        print(f"🚀 import {arranque['modulo']}: {arranque['ms']:.0f} ms, {arranque['modulos']} módulos")
+    for severidad, nombre, descripcion in hallazgos(analisis):
+        print(f"  [{severidad}] {nombre}: {descripcion}")
+
+if __name__ == '__main__':
+    main()
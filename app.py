@@ -1,14 +1,22 @@
 # sistema_contador/app.py
-from flask import Flask, render_template, request, jsonify, g, send_file
-from database import get_db_connection, init_database
+from flask import Flask, render_template, request, jsonify, g, send_file, Response, stream_with_context
+from database import get_db_connection, init_database, resumen_de_pagos, ajustar_resumen_pagos, reconstruir_resumen_pagos
+from database import version_reglas_activa, obtener_reglas_credito, guardar_reglas_credito, activar_version_reglas
+from database import serializar_evaluacion, leer_evaluacion, registrar_evaluacion
+from database import marcar_datos_modificados, version_datos
 from modelos_ia import CadenaMarkovPagos
-from evaluacion_credito import EvaluadorCredito
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-import base64
+from evaluacion_credito import EvaluadorCredito, ReglasCredito, ReglasInvalidasError, activar_reglas, reglas_activas
+from evaluacion_credito import DETALLE_DESGLOSE, DETALLE_COMPLETO, NIVELES_DETALLE
+from recalificacion import recalificar_cartera, iniciar_programador, TAMANO_BLOQUE
+from informes import ColaInformes, LISTO
+from analisis_dependencias import analizar_proyecto, huella_proyecto
+from exportacion import EXPORTACIONES, FORMATOS, FormatoNoDisponibleError
+from exportacion import validar_filtros, verificar_formato, consulta_exportacion, leer_por_lotes
+from graficos import FORMATOS_GRAFICO, grafico_estados, huella_estados
+from estadisticas import SQL_ESTADOS_CLIENTES, calcular_estadisticas, server_timing
+from periodos import resolver_periodo, clave_periodo, fecha_referencia
+import numpy as np
+import click
 import random
 from dotenv import load_dotenv
 import os
@@ -16,8 +24,8 @@ import webbrowser
 import threading
 import time
 from datetime import datetime, timedelta
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-import openpyxl
+from concurrent.futures import TimeoutError as FuturoTimeoutError
+from collections import Counter
 
 # Cargar variables de entorno
 load_dotenv()
@@ -25,238 +33,401 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'clave_secreta_sistema_contador')
 
+def obtener_conexion():
+    """Conexión del pool prestada a la petición actual (se devuelve en el teardown)"""
+    if 'db_conn' not in g:
+        g.db_conn = get_db_connection()
+    return g.db_conn
+
+# Columnas de clientes para listados (sin evaluacion_ia, que solo se lee en la ficha del cliente)
+COLUMNAS_CLIENTE = """
+    c.id, c.nombre, c.email, c.telefono, c.direccion, c.estado_actual, c.fecha_registro,
+    c.sueldo, c.otros_ingresos, c.gastos_vivienda, c.tiene_propiedad, c.valor_propiedad,
+    c.apto_prestamo, c.calificacion_crediticia, c.fecha_evaluacion, c.notas, c.monto_solicitado
+"""
+
+@app.teardown_appcontext
+def liberar_conexion(exception):
+    """Devolver al pool la conexión prestada a la petición"""
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.close()
+
+# Caché en proceso de los contadores del encabezado
+CONTADORES_TTL = float(os.getenv('CONTADORES_TTL', 30))  # Segundos
+_contadores_cache = {'valores': None, 'expira': 0.0}
+_contadores_lock = threading.Lock()
+
+def invalidar_contadores():
+    """Descartar los contadores en caché tras una escritura"""
+    with _contadores_lock:
+        _contadores_cache['valores'] = None
+
+def obtener_contadores():
+    """Contadores del encabezado, servidos desde caché mientras no venza el TTL"""
+    with _contadores_lock:
+        if _contadores_cache['valores'] is not None and time.monotonic() < _contadores_cache['expira']:
+            return _contadores_cache['valores']
+    
+    contadores = {
+        'total_clientes': 0,
+        'clientes_riesgo_count': 0,
+        'pagos_pendientes': 0,
+        'alertas_count': 0
+    }
+    conn = obtener_conexion()
+    if not conn:
+        return contadores
+    
+    try:
+        cursor = conn.cursor(dictionary=True)
+        
+        # Total de clientes
+        cursor.execute("SELECT COUNT(*) as total FROM clientes")
+        contadores['total_clientes'] = cursor.fetchone()['total']
+        
+        # Clientes en riesgo (con impagos)
+        cursor.execute("""
+            SELECT COUNT(*) as count 
+            FROM clientes c
+            WHERE c.estado_actual = 'impago'
+               OR EXISTS (SELECT 1 FROM pagos p WHERE p.cliente_id = c.id AND p.estado = 'impago')
+        """)
+        contadores['clientes_riesgo_count'] = cursor.fetchone()['count']
+        
+        # Pagos pendientes (desde el resumen por año/mes/estado)
+        cursor.execute("""
+            SELECT COALESCE(SUM(cantidad), 0) as count 
+            FROM resumen_pagos 
+            WHERE estado IN ('retraso_leve', 'retraso_grave', 'impago')
+        """)
+        contadores['pagos_pendientes'] = int(cursor.fetchone()['count'])
+        
+        # Total de alertas
+        contadores['alertas_count'] = contadores['clientes_riesgo_count'] + contadores['pagos_pendientes']
+        
+    except Exception as e:
+        print(f"Error cargando variables globales: {e}")
+        # Valores por defecto (no se guardan en caché)
+        return {clave: 0 for clave in contadores}
+    
+    with _contadores_lock:
+        _contadores_cache['valores'] = contadores
+        _contadores_cache['expira'] = time.monotonic() + CONTADORES_TTL
+    return contadores
+
 # Contexto global para variables compartidas
 @app.before_request
 def cargar_variables_globales():
     """Cargar variables globales para todas las templates"""
-    conn = get_db_connection()
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            
-            # Total de clientes
-            cursor.execute("SELECT COUNT(*) as total FROM clientes")
-            g.total_clientes = cursor.fetchone()['total']
-            
-            # Clientes en riesgo (con impagos)
-            cursor.execute("""
-                SELECT COUNT(DISTINCT c.id) as count 
-                FROM clientes c
-                LEFT JOIN pagos p ON c.id = p.cliente_id
-                WHERE p.estado = 'impago' OR c.estado_actual = 'impago'
-            """)
-            g.clientes_riesgo_count = cursor.fetchone()['count']
-            
-            # Pagos pendientes
-            cursor.execute("""
-                SELECT COUNT(*) as count 
-                FROM pagos 
-                WHERE estado IN ('retraso_leve', 'retraso_grave', 'impago')
-            """)
-            g.pagos_pendientes = cursor.fetchone()['count']
-            
-            # Total de alertas
-            g.alertas_count = g.clientes_riesgo_count + g.pagos_pendientes
-            
-        except Exception as e:
-            print(f"Error cargando variables globales: {e}")
-            # Valores por defecto
-            g.total_clientes = 0
-            g.clientes_riesgo_count = 0
-            g.pagos_pendientes = 0
-            g.alertas_count = 0
-        finally:
-            conn.close()
-    else:
-        g.total_clientes = 0
-        g.clientes_riesgo_count = 0
-        g.pagos_pendientes = 0
-        g.alertas_count = 0
+    # Los archivos estáticos, las imágenes de gráficos y las APIs JSON no renderizan el encabezado
+    if request.endpoint in (None, 'static', 'grafico_estados_clientes') or request.path.startswith('/api/'):
+        return
+    
+    for clave, valor in obtener_contadores().items():
+        setattr(g, clave, valor)
+
+TAMANO_LOTE_ENTRENAMIENTO = 50_000  # Filas por fetchmany al leer el historial
 
 def obtener_datos_entrenamiento():
-    """Obtener datos históricos para entrenamiento"""
-    conn = get_db_connection()
+    """
+    Obtener datos históricos para entrenamiento en una sola pasada
+    Retorna (codigos, grupos, version): código de estado y cliente de cada pago, ordenados por
+    cliente y periodo, listos para CadenaMarkovPagos.entrenar_arrays, y la versión de datos leída
+    """
+    vacio = (np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int64), 0)
+    conn = obtener_conexion()
     if not conn:
-        return []
+        return vacio
     
-    try:
-        query = """
-        SELECT cliente_id, estado 
+    # Codificar el estado en SQL para no crear un string de Python por pago
+    casos = ' '.join(f"WHEN '{estado}' THEN {i}" for i, estado in enumerate(CadenaMarkovPagos.ESTADOS))
+    query = f"""
+        SELECT cliente_id, CASE estado {casos} ELSE -1 END as codigo
         FROM pagos 
-        ORDER BY cliente_id, año, mes
-        """
-        df = pd.read_sql(query, conn)
-        
-        # Procesar datos para Markov
-        datos_markov = []
-        for cliente_id in df['cliente_id'].unique():
-            estados = df[df['cliente_id'] == cliente_id]['estado'].tolist()
-            if len(estados) >= 2:
-                datos_markov.append(estados)
-        
-        return datos_markov
+        WHERE cliente_id IS NOT NULL
+        ORDER BY cliente_id, año, mes, id
+    """
+    
+    cursor = conn.cursor()  # Sin buffer: las filas llegan del servidor por lotes
+    try:
+        # Misma transacción (REPEATABLE READ): la versión y los pagos salen de la misma foto de los datos
+        version = version_datos(cursor)
+        cursor.execute(query)
+        grupos, codigos = [], []
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE_ENTRENAMIENTO)
+            if not filas:
+                break
+            lote = np.array(filas, dtype=np.int64).reshape(-1, 2)
+            grupos.append(lote[:, 0])
+            codigos.append(lote[:, 1].astype(np.int8))
+        
+        if not grupos:
+            return vacio[:2] + (version,)
+        return np.concatenate(codigos), np.concatenate(grupos), version
         
     except Exception as e:
         print(f"Error obteniendo datos: {e}")
-        return []
+        return vacio
     finally:
-        if conn:
-            conn.close()
+        try:
+            cursor.close()
+        except Exception:
+            pass
 
-def generar_grafico_estados(estados_clientes):
-    """Generar gráfico de estados de clientes"""
-    plt.figure(figsize=(10, 6))
+# Modelo de Markov entrenado y compartido por el proceso
+MARKOV_MAX_EDAD = float(os.getenv('MARKOV_MAX_EDAD', 3600))  # Segundos antes de reentrenar completo
+# version_datos: versión de datos que leyó el entrenamiento (los aportes hasta ella ya están contados)
+# pendientes: aportes recibidos mientras corre un reentrenamiento (None si no hay ninguno en curso)
+_modelo_markov = {'modelo': None, 'entrenado_en': 0.0, 'version_datos': 0, 'pendientes': None}
+_modelo_markov_lock = threading.Lock()
+_entrenamiento_markov_lock = threading.Lock()  # Un solo reentrenamiento completo a la vez
+
+def _entrenar_y_publicar_markov():
+    """
+    Entrenar con todo el historial y publicar el modelo
+    Los aportes que llegan mientras se entrena se guardan y, al publicar, se vuelven a aplicar solo
+    los de versión posterior a la leída: ni se pierden ni se cuentan dos veces
+    """
+    with _modelo_markov_lock:
+        _modelo_markov['pendientes'] = []
+    try:
+        codigos, grupos, version = obtener_datos_entrenamiento()
+        modelo = CadenaMarkovPagos()
+        modelo.entrenar_arrays(codigos, grupos)
+        with _modelo_markov_lock:
+            for version_aporte, transiciones, signo in _modelo_markov['pendientes']:
+                if version_aporte > version:
+                    modelo.actualizar_conteos(transiciones, signo)
+            _modelo_markov['modelo'] = modelo
+            _modelo_markov['entrenado_en'] = time.monotonic()
+            _modelo_markov['version_datos'] = version
+        return modelo
+    finally:
+        with _modelo_markov_lock:
+            _modelo_markov['pendientes'] = None
+
+def refrescar_modelo_markov():
+    """Reentrenar el modelo de Markov con todo el historial y publicarlo"""
+    with _entrenamiento_markov_lock:
+        return _entrenar_y_publicar_markov()
+
+def _modelo_markov_publicado():
+    """(modelo publicado o None, si sigue vigente)"""
+    with _modelo_markov_lock:
+        modelo = _modelo_markov['modelo']
+        vigente = modelo is not None and time.monotonic() - _modelo_markov['entrenado_en'] < MARKOV_MAX_EDAD
+    return modelo, vigente
+
+def obtener_modelo_markov():
+    """
+    Modelo en memoria; solo se reentrena si no existe o superó MARKOV_MAX_EDAD
+    Reentrena un único hilo: mientras tanto los demás siguen con el modelo vencido,
+    o lo esperan si todavía no hay ninguno
+    """
+    modelo, vigente = _modelo_markov_publicado()
+    if vigente:
+        return modelo
+    if modelo is None:
+        _entrenamiento_markov_lock.acquire()
+    elif not _entrenamiento_markov_lock.acquire(blocking=False):
+        return modelo
+    try:
+        # Otro hilo pudo haberlo reentrenado mientras se esperaba el lock
+        modelo, vigente = _modelo_markov_publicado()
+        if vigente:
+            return modelo
+        return _entrenar_y_publicar_markov()
+    finally:
+        _entrenamiento_markov_lock.release()
+
+def aplicar_aporte_markov(transiciones, version, signo=1):
+    """
+    Incorporar (o retirar) en el modelo en memoria las transiciones de un cambio ya confirmado
+    version es la versión de datos de ese cambio (la que retorna marcar_datos_modificados)
+    El modelo publicado no se modifica: se actualiza una copia y se reemplaza, así quien lo esté
+    leyendo sigue viendo una matriz, sus análisis y su versión coherentes
+    Los otros procesos del servidor lo recogen al vencer MARKOV_MAX_EDAD
+    """
+    if not transiciones:
+        return
+    with _modelo_markov_lock:
+        if _modelo_markov['pendientes'] is not None:
+            _modelo_markov['pendientes'].append((version, transiciones, signo))
+        modelo = _modelo_markov['modelo']
+        # El entrenamiento ya contó los cambios hasta la versión que leyó
+        if modelo is not None and version > _modelo_markov['version_datos']:
+            actualizado = modelo.copiar()
+            actualizado.actualizar_conteos(transiciones, signo)
+            _modelo_markov['modelo'] = actualizado
+
+def aporte_markov_de_pago(cursor, pago_id):
+    """
+    Transiciones que un pago aporta a la secuencia de su cliente:
+    previo -> pago y pago -> siguiente, menos el salto previo -> siguiente que reemplaza
+    Requiere un cursor normal (no dictionary)
+    """
+    cursor.execute("SELECT cliente_id, año, mes, estado FROM pagos WHERE id = %s", (pago_id,))
+    pago = cursor.fetchone()
+    if not pago:
+        return Counter()
+    cliente_id, año, mes, estado = pago
+    
+    cursor.execute("""
+        SELECT estado FROM pagos 
+        WHERE cliente_id = %s AND (año, mes, id) < (%s, %s, %s)
+        ORDER BY año DESC, mes DESC, id DESC 
+        LIMIT 1
+    """, (cliente_id, año, mes, pago_id))
+    previo = cursor.fetchone()
     
-    labels = [estado['estado_actual'].title().replace('_', ' ') for estado in estados_clientes]
-    valores = [estado['cantidad'] for estado in estados_clientes]
-    colores = ['#28a745', '#ffc107', '#fd7e14', '#dc3545'][:len(labels)]
+    cursor.execute("""
+        SELECT estado FROM pagos 
+        WHERE cliente_id = %s AND (año, mes, id) > (%s, %s, %s)
+        ORDER BY año, mes, id 
+        LIMIT 1
+    """, (cliente_id, año, mes, pago_id))
+    siguiente = cursor.fetchone()
     
-    plt.bar(labels, valores, color=colores, alpha=0.8)
-    plt.title('Distribución de Estados de Clientes', fontsize=14, fontweight='bold')
-    plt.xlabel('Estado Actual')
-    plt.ylabel('Cantidad de Clientes')
+    aporte = Counter()
+    if previo:
+        aporte[(previo[0], estado)] += 1
+    if siguiente:
+        aporte[(estado, siguiente[0])] += 1
+    if previo and siguiente:
+        aporte[(previo[0], siguiente[0])] -= 1
+    return aporte
+
+def transiciones_de_cliente(cursor, cliente_id):
+    """Todas las transiciones del historial de un cliente"""
+    cursor.execute("""
+        SELECT estado FROM pagos 
+        WHERE cliente_id = %s 
+        ORDER BY año, mes, id
+    """, (cliente_id,))
+    estados = [fila[0] for fila in cursor.fetchall()]
+    return Counter(zip(estados, estados[1:]))
+
+# Reglas de evaluación crediticia: se comprueba la versión activa en la base como mucho cada REGLAS_TTL segundos
+REGLAS_TTL = float(os.getenv('REGLAS_TTL', 60))  # Segundos
+_reglas_revision = {'proxima': 0.0}
+_reglas_revision_lock = threading.Lock()
+
+def sincronizar_reglas_credito(forzar=False):
+    """Activar en este proceso la versión de reglas_credito marcada como activa, si cambió"""
+    with _reglas_revision_lock:
+        if not forzar and time.monotonic() < _reglas_revision['proxima']:
+            return reglas_activas()
+        _reglas_revision['proxima'] = time.monotonic() + REGLAS_TTL
     
-    for i, v in enumerate(valores):
-        plt.text(i, v + 0.1, str(v), ha='center', va='bottom', fontweight='bold')
+    conn = obtener_conexion()
+    if not conn:
+        return reglas_activas()
+    cursor = conn.cursor()
+    try:
+        version = version_reglas_activa(cursor)
+        if version is not None and version != reglas_activas().version:
+            reglas = activar_reglas(ReglasCredito.desde_registro(*obtener_reglas_credito(cursor, version)))
+            print(f"✅ Reglas de crédito v{reglas.version} activadas")
+    except Exception as e:
+        # Sin tabla o con reglas inválidas se siguen usando las reglas actuales
+        print(f"⚠️ No se pudieron sincronizar las reglas de crédito: {e}")
+    finally:
+        cursor.close()
+    return reglas_activas()
+
+def obtener_evaluador():
+    """Evaluador con las reglas activas más recientes"""
+    sincronizar_reglas_credito()
+    return EvaluadorCredito()
+
+@app.route('/charts/estados.<formato>')
+def grafico_estados_clientes(formato):
+    """
+    Gráfico de estados de clientes (png o svg), servido desde caché por huella de los conteos
+    Con ?v=<huella> vigente la imagen se puede cachear sin límite; sin ella se revalida con ETag
+    """
+    if formato not in FORMATOS_GRAFICO:
+        return jsonify({'error': f'Formato no válido: {formato} (use png o svg)'}), 404
     
-    plt.tight_layout()
+    conn = obtener_conexion()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
     
-    img = io.BytesIO()
-    plt.savefig(img, format='png', dpi=100, bbox_inches='tight')
-    img.seek(0)
-    graph_url = base64.b64encode(img.getvalue()).decode()
-    plt.close()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(SQL_ESTADOS_CLIENTES)
+        estados_clientes = cursor.fetchall()
+    finally:
+        cursor.close()
     
-    return graph_url
+    huella = huella_estados(estados_clientes)
+    etag = f'{huella}-{formato}'
+    if request.args.get('v') == huella:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'no-cache'
+    
+    # El navegador ya tiene esta versión: 304 sin dibujar ni leer la caché
+    if request.if_none_match.contains(etag):
+        respuesta = Response(status=304)
+    else:
+        _, contenido = grafico_estados(estados_clientes, formato, huella)
+        respuesta = Response(contenido, mimetype=FORMATOS_GRAFICO[formato])
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = cache_control
+    return respuesta
 
 # Rutas de la aplicación
 @app.route('/')
 def dashboard():
-    """Página principal del dashboard mejorado"""
-    conn = get_db_connection()
+    """Página principal del dashboard: las métricas y gráficos se cargan desde /api/dashboard/stats"""
+    return render_template('dashboard.html')
+
+@app.route('/api/dashboard/stats')
+def estadisticas_dashboard():
+    """
+    Métricas del dashboard en JSON con GET condicional
+    Periodo: ?periodo=mes|trimestre|año|rango con año, mes, trimestre o desde/hasta (AAAA-MM);
+    por defecto el mes de la fecha de referencia
+    El ETag es la versión de los datos y el periodo: si el navegador ya lo tiene, 304 sin ejecutar las consultas
+    """
+    try:
+        periodo = resolver_periodo(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 400
+    
+    conn = obtener_conexion()
     if not conn:
-        return "Error: No se pudo conectar a la base de datos", 500
+        return jsonify({'success': False, 'mensaje': 'Error de conexión a la base de datos'}), 500
     
     try:
-        cursor = conn.cursor(dictionary=True)
-        
-        # Estadísticas básicas
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE apto_prestamo != 'No'")
-        total_clientes = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT estado_actual, COUNT(*) as cantidad FROM clientes WHERE apto_prestamo != 'No' GROUP BY estado_actual")
-        estados_clientes = cursor.fetchall()
-        
-        # Total de clientes rechazados
-        cursor.execute("SELECT COUNT(*) as total FROM clientes WHERE apto_prestamo = 'No'")
-        total_rechazados = cursor.fetchone()['total']
-        
-        # Ingresos del mes (noviembre 2025)
-        cursor.execute("""
-            SELECT ROUND(SUM(monto), 2) as total 
-            FROM pagos 
-            WHERE estado = 'al_dia' AND mes = 11 AND año = 2025
-        """)
-        total_ingresos_mes = cursor.fetchone()['total'] or 0
-        
-        # Pagos al día este mes
-        cursor.execute("""
-            SELECT COUNT(*) as count 
-            FROM pagos 
-            WHERE estado = 'al_dia' AND mes = 11 AND año = 2025
-        """)
-        pagos_al_dia = cursor.fetchone()['count'] or 0
-        
-        # Pagos en retraso
-        cursor.execute("""
-            SELECT COUNT(*) as count, ROUND(SUM(monto), 2) as monto
-            FROM pagos 
-            WHERE estado IN ('retraso_leve', 'retraso_grave')
-        """)
-        retraso_data = cursor.fetchone()
-        pagos_pendientes = retraso_data['count'] or 0
-        pagos_retraso = pagos_pendientes
-        
-        # Impagos
-        cursor.execute("""
-            SELECT COUNT(*) as count, ROUND(SUM(monto), 2) as monto
-            FROM pagos 
-            WHERE estado = 'impago'
-        """)
-        impago_data = cursor.fetchone()
-        pagos_impago = impago_data['count'] or 0
-        
-        # Cartera morosa (retraso + impago)
-        cursor.execute("""
-            SELECT ROUND(SUM(monto), 2) as total
-            FROM pagos 
-            WHERE estado IN ('retraso_leve', 'retraso_grave', 'impago')
-        """)
-        monto_moroso = cursor.fetchone()['total'] or 0
-        
-        # Total cartera
-        cursor.execute("SELECT ROUND(SUM(monto), 2) as total FROM pagos")
-        monto_total_cartera = cursor.fetchone()['total'] or 0
-        
-        # Clientes con mayor riesgo (sin préstamo aprobado)
-        cursor.execute("""
-            SELECT c.id, c.nombre, c.email, c.estado_actual,
-                   COUNT(p.id) as total_pagos,
-                   SUM(CASE WHEN p.estado = 'impago' THEN 1 ELSE 0 END) as total_impagos,
-                   ROUND(SUM(CASE WHEN p.estado = 'impago' THEN p.monto ELSE 0 END), 2) as deuda_total
-            FROM clientes c
-            LEFT JOIN pagos p ON c.id = p.cliente_id
-            WHERE c.apto_prestamo != 'No'
-            GROUP BY c.id, c.nombre, c.email, c.estado_actual
-            HAVING total_impagos > 0 OR c.estado_actual = 'impago'
-            ORDER BY total_impagos DESC, deuda_total DESC
-            LIMIT 5
-        """)
-        clientes_riesgo = cursor.fetchall()
-        
-        # Clientes rechazados (No Prestar Nunca Más)
-        cursor.execute("""
-            SELECT c.id, c.nombre, c.email, c.telefono, c.estado_actual,
-                   c.calificacion_crediticia as puntuacion,
-                   SUM(CASE WHEN p.estado = 'impago' THEN p.monto ELSE 0 END) as deuda_total,
-                   CASE 
-                       WHEN c.estado_actual = 'impago' THEN 'Impago permanente'
-                       WHEN c.calificacion_crediticia < 30 THEN 'Muy alto riesgo'
-                       WHEN c.estado_actual = 'retraso_grave' THEN 'Moroso crónico'
-                       ELSE 'Incobrable'
-                   END as razon_rechazo
-            FROM clientes c
-            LEFT JOIN pagos p ON c.id = p.cliente_id
-            WHERE c.apto_prestamo = 'No'
-            GROUP BY c.id, c.nombre, c.email, c.telefono, c.estado_actual, c.calificacion_crediticia
-            ORDER BY c.calificacion_crediticia ASC
-        """)
-        clientes_rechazados = cursor.fetchall()
-        
-        return render_template('dashboard.html', 
-                             total_clientes=total_clientes,
-                             total_rechazados=total_rechazados,
-                             estados_clientes=estados_clientes,
-                             total_ingresos_mes=total_ingresos_mes,
-                             pagos_al_dia=pagos_al_dia,
-                             pagos_pendientes=pagos_pendientes,
-                             pagos_retraso=pagos_retraso,
-                             pagos_impago=pagos_impago,
-                             monto_moroso=monto_moroso,
-                             monto_total_cartera=monto_total_cartera,
-                             clientes_riesgo=clientes_riesgo,
-                             clientes_rechazados=clientes_rechazados)
+        # La versión se lee antes que las métricas: una escritura intermedia solo cambia el ETag de la próxima
+        version = version_datos_actual()
+        # Devolver la conexión de la petición antes de repartir las consultas: si se retuviera mientras
+        # espera a los hilos, muchas peticiones a la vez acapararían el pool y los hilos no conseguirían conexión
+        liberar_conexion(None)
+        etag = f'stats-{version}-{clave_periodo(periodo)}'
+        if request.if_none_match.contains(etag):
+            respuesta = Response(status=304)
+        else:
+            # Consultas en paralelo con conexiones propias; Server-Timing muestra cuál marca el camino crítico
+            estadisticas, tiempos = calcular_estadisticas(periodo)
+            respuesta = jsonify({'success': True, 'version': version, **estadisticas})
+            respuesta.headers['Server-Timing'] = server_timing(tiempos)
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        return respuesta
         
     except Exception as e:
-        print(f"Error en dashboard: {e}")
-        return f"Error: {e}", 500
-    finally:
-        conn.close()
+        print(f"Error en estadísticas del dashboard: {e}")
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
 
 @app.route('/clientes')
 def clientes():
     """Gestión de clientes"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
@@ -267,8 +438,8 @@ def clientes():
         estado_filtro = request.args.get('estado', '')
         
         # Construir consulta base
-        query = """
-            SELECT c.*, 
+        query = f"""
+            SELECT {COLUMNAS_CLIENTE}, 
                    COUNT(p.id) as total_pagos,
                    SUM(CASE WHEN p.estado = 'impago' THEN 1 ELSE 0 END) as total_impagos
             FROM clientes c
@@ -285,25 +456,26 @@ def clientes():
         return render_template('clientes.html', clientes=clientes)
         
     finally:
-        conn.close()
+        cursor.close()
 
 @app.route('/api/clientes', methods=['POST'])
 def agregar_cliente():
     """API para agregar cliente"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
         # Realizar evaluación crediticia
-        evaluador = EvaluadorCredito()
+        evaluador = obtener_evaluador()
         evaluacion = evaluador.evaluar_cliente(
             sueldo=float(data.get('sueldo', 0)),
             otros_ingresos=float(data.get('otros_ingresos', 0)),
             gastos_vivienda=float(data.get('gastos_vivienda', 0)),
             tiene_propiedad=data.get('tiene_propiedad', False),
             valor_propiedad=float(data.get('valor_propiedad', 0)) if data.get('tiene_propiedad') else 0,
-            estado_actual=data.get('estado_actual', 'al_dia')
+            estado_actual=data.get('estado_actual', 'al_dia'),
+            detalle=DETALLE_DESGLOSE  # Se guardan los códigos de motivo, no el texto
         )
         
         cursor.execute(
@@ -322,13 +494,15 @@ def agregar_cliente():
              data.get('tiene_propiedad', False),
              float(data.get('valor_propiedad', 0)) if data.get('tiene_propiedad') else 0,
              evaluacion['apto_prestamo'],
-             str(evaluacion),
+             serializar_evaluacion(evaluacion),
              evaluacion['puntuacion_final'],
              data.get('notas', ''),
              float(data.get('monto_solicitado', 0)))
         )
+        registrar_evaluacion(cursor, cursor.lastrowid, evaluacion, 'alta')
+        marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
         
         return jsonify({'success': True, 'mensaje': 'Cliente agregado correctamente'})
     except Exception as e:
@@ -338,15 +512,20 @@ def agregar_cliente():
 def eliminar_cliente(cliente_id):
     """API para eliminar cliente"""
     try:
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
-        # Primero eliminar los pagos del cliente
+        # Primero eliminar los pagos del cliente (y descontarlos del resumen)
+        previas = resumen_de_pagos(cursor, 'cliente_id = %s', (cliente_id,))
+        transiciones_previas = transiciones_de_cliente(cursor, cliente_id)
         cursor.execute('DELETE FROM pagos WHERE cliente_id = %s', (cliente_id,))
+        ajustar_resumen_pagos(cursor, previas, -1)
         # Luego eliminar el cliente
         cursor.execute('DELETE FROM clientes WHERE id = %s', (cliente_id,))
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(transiciones_previas, version, -1)
         
         return jsonify({'success': True, 'mensaje': 'Cliente eliminado correctamente'})
     except Exception as e:
@@ -356,37 +535,107 @@ def eliminar_cliente(cliente_id):
 def obtener_cliente(cliente_id):
     """API para obtener datos de un cliente específico"""
     try:
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor(dictionary=True)
         
         cursor.execute("SELECT * FROM clientes WHERE id = %s", (cliente_id,))
         cliente = cursor.fetchone()
-        conn.close()
         
         if cliente:
+            cliente['evaluacion_ia'] = leer_evaluacion(cliente.get('evaluacion_ia'))
             return jsonify({'success': True, 'data': cliente})
         else:
             return jsonify({'success': False, 'mensaje': 'Cliente no encontrado'})
     except Exception as e:
         return jsonify({'success': False, 'mensaje': str(e)})
 
+# Columnas del historial de evaluaciones que devuelve la API
+COLUMNAS_EVALUACION = """
+    e.id, e.fecha, e.origen, e.version_reglas, e.puntuacion, e.apto_prestamo,
+    e.score_ingresos, e.score_deudas, e.score_ratio, e.score_historial, e.score_propiedad, e.ratio_deuda
+"""
+
+def _fecha_parametro(valor, fin_del_dia=False):
+    """Fecha 'AAAA-MM-DD' o 'AAAA-MM-DD HH:MM[:SS]'; un día sin hora cubre el día completo si fin_del_dia"""
+    fecha = datetime.fromisoformat(valor)
+    if fin_del_dia and len(valor) == 10:
+        fecha += timedelta(days=1) - timedelta(microseconds=1)
+    return fecha
+
+@app.route('/api/clientes/<int:cliente_id>/evaluaciones')
+def historial_evaluaciones(cliente_id):
+    """
+    API con el historial de evaluaciones de un cliente (más recientes primero)
+    Parámetros:
+    - en: fecha; devuelve solo la evaluación vigente en ese momento
+    - desde / hasta: rango de fechas del historial
+    - limite: máximo de filas (por defecto 100, máximo 1000)
+    """
+    try:
+        conn = obtener_conexion()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            if request.args.get('en'):
+                # Evaluación vigente a una fecha: un solo salto en el índice (cliente_id, fecha)
+                cursor.execute(f"""
+                    SELECT {COLUMNAS_EVALUACION} FROM evaluaciones e
+                    WHERE e.cliente_id = %s AND e.fecha <= %s
+                    ORDER BY e.fecha DESC, e.id DESC
+                    LIMIT 1
+                """, (cliente_id, _fecha_parametro(request.args['en'], fin_del_dia=True)))
+                return jsonify({'success': True, 'evaluacion': cursor.fetchone()})
+            
+            # Última evaluación por el puntero de clientes (sin consulta de ventana)
+            cursor.execute(f"""
+                SELECT {COLUMNAS_EVALUACION} FROM clientes c
+                JOIN evaluaciones e ON e.id = c.ultima_evaluacion_id
+                WHERE c.id = %s
+            """, (cliente_id,))
+            ultima = cursor.fetchone()
+            
+            condiciones, params = ['e.cliente_id = %s'], [cliente_id]
+            if request.args.get('desde'):
+                condiciones.append('e.fecha >= %s')
+                params.append(_fecha_parametro(request.args['desde']))
+            if request.args.get('hasta'):
+                condiciones.append('e.fecha <= %s')
+                params.append(_fecha_parametro(request.args['hasta'], fin_del_dia=True))
+            limite = min(max(request.args.get('limite', 100, type=int), 1), 1000)
+            
+            cursor.execute(f"""
+                SELECT {COLUMNAS_EVALUACION} FROM evaluaciones e
+                WHERE {' AND '.join(condiciones)}
+                ORDER BY e.fecha DESC, e.id DESC
+                LIMIT %s
+            """, params + [limite])
+            evaluaciones = cursor.fetchall()
+        finally:
+            cursor.close()
+        
+        return jsonify({'success': True, 'ultima': ultima, 'total': len(evaluaciones), 'evaluaciones': evaluaciones})
+    except ValueError as e:
+        return jsonify({'success': False, 'mensaje': f'Fecha inválida: {e}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
+
 @app.route('/api/clientes/<int:cliente_id>', methods=['PUT'])
 def actualizar_cliente(cliente_id):
     """API para actualizar cliente"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
         # Realizar evaluación crediticia
-        evaluador = EvaluadorCredito()
+        evaluador = obtener_evaluador()
         evaluacion = evaluador.evaluar_cliente(
             sueldo=float(data.get('sueldo', 0)),
             otros_ingresos=float(data.get('otros_ingresos', 0)),
             gastos_vivienda=float(data.get('gastos_vivienda', 0)),
             tiene_propiedad=data.get('tiene_propiedad', False),
             valor_propiedad=float(data.get('valor_propiedad', 0)) if data.get('tiene_propiedad') else 0,
-            estado_actual=data.get('estado_actual', 'al_dia')
+            estado_actual=data.get('estado_actual', 'al_dia'),
+            detalle=DETALLE_DESGLOSE  # Se guardan los códigos de motivo, no el texto
         )
         
         cursor.execute(
@@ -406,14 +655,16 @@ def actualizar_cliente(cliente_id):
              data.get('tiene_propiedad', False),
              float(data.get('valor_propiedad', 0)) if data.get('tiene_propiedad') else 0,
              evaluacion['apto_prestamo'],
-             str(evaluacion),
+             serializar_evaluacion(evaluacion),
              evaluacion['puntuacion_final'],
              data.get('notas', ''),
              float(data.get('monto_solicitado', 0)),
              cliente_id)
         )
+        registrar_evaluacion(cursor, cliente_id, evaluacion, 'edicion')
+        marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
         
         return jsonify({'success': True, 'mensaje': 'Cliente actualizado correctamente'})
     except Exception as e:
@@ -422,7 +673,7 @@ def actualizar_cliente(cliente_id):
 @app.route('/cliente/<int:cliente_id>/pagos')
 def pagos_cliente(cliente_id):
     """Página de pagos específicos de un cliente"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
@@ -430,7 +681,7 @@ def pagos_cliente(cliente_id):
         cursor = conn.cursor(dictionary=True)
         
         # Obtener información del cliente
-        cursor.execute("SELECT * FROM clientes WHERE id = %s", (cliente_id,))
+        cursor.execute(f"SELECT {COLUMNAS_CLIENTE} FROM clientes c WHERE c.id = %s", (cliente_id,))
         cliente = cursor.fetchone()
         
         if not cliente:
@@ -481,14 +732,14 @@ def pagos_cliente(cliente_id):
     except Exception as e:
         return f"Error: {e}", 500
     finally:
-        conn.close()
+        cursor.close()
 
 @app.route('/api/cliente/<int:cliente_id>/pagos', methods=['POST'])
 def agregar_pago_cliente(cliente_id):
     """API para agregar pago a un cliente específico"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
         # Verificar que el cliente existe
@@ -500,8 +751,13 @@ def agregar_pago_cliente(cliente_id):
             'INSERT INTO pagos (cliente_id, mes, año, estado, monto, descripcion) VALUES (%s, %s, %s, %s, %s, %s)',
             (cliente_id, data['mes'], data['año'], data['estado'], data['monto'], data.get('descripcion', ''))
         )
+        pago_id = cursor.lastrowid
+        ajustar_resumen_pagos(cursor, resumen_de_pagos(cursor, 'id = %s', (pago_id,)))
+        aporte = aporte_markov_de_pago(cursor, pago_id)
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(aporte, version)
         
         return jsonify({'success': True, 'mensaje': 'Pago agregado correctamente'})
     except Exception as e:
@@ -512,15 +768,23 @@ def actualizar_estado_pago(pago_id):
     """API para actualizar solo el estado de un pago"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
+        previas = resumen_de_pagos(cursor, 'id = %s', (pago_id,))
+        aporte_previo = aporte_markov_de_pago(cursor, pago_id)
         cursor.execute(
             'UPDATE pagos SET estado = %s WHERE id = %s',
             (data['estado'], pago_id)
         )
+        ajustar_resumen_pagos(cursor, previas, -1)
+        ajustar_resumen_pagos(cursor, resumen_de_pagos(cursor, 'id = %s', (pago_id,)))
+        aporte_nuevo = aporte_markov_de_pago(cursor, pago_id)
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(aporte_previo, version, -1)
+        aplicar_aporte_markov(aporte_nuevo, version)
         
         return jsonify({'success': True, 'mensaje': 'Estado del pago actualizado correctamente'})
     except Exception as e:
@@ -529,7 +793,7 @@ def actualizar_estado_pago(pago_id):
 @app.route('/pagos')
 def pagos():
     """Página de gestión de pagos organizada por clientes"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
@@ -554,8 +818,8 @@ def pagos():
         
         pagos_data = cursor.fetchall()
         
-        # Fecha actual para cálculos
-        fecha_hoy = datetime(2025, 11, 10)
+        # Fecha actual para cálculos (FECHA_REFERENCIA permite fijarla para los datos de ejemplo)
+        fecha_hoy = fecha_referencia()
         
         # Agrupar pagos por cliente
         pagos_por_cliente = {}
@@ -687,22 +951,27 @@ def pagos():
                              fecha_hoy=fecha_hoy.strftime('%d de %B de %Y'))
         
     finally:
-        conn.close()
+        cursor.close()
 
 @app.route('/api/pagos', methods=['POST'])
 def agregar_pago():
     """API para agregar pago"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
         cursor.execute(
             'INSERT INTO pagos (cliente_id, mes, año, estado, monto, descripcion) VALUES (%s, %s, %s, %s, %s, %s)',
             (data['cliente_id'], data['mes'], data['año'], data['estado'], data['monto'], data.get('descripcion', ''))
         )
+        pago_id = cursor.lastrowid
+        ajustar_resumen_pagos(cursor, resumen_de_pagos(cursor, 'id = %s', (pago_id,)))
+        aporte = aporte_markov_de_pago(cursor, pago_id)
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(aporte, version)
         
         return jsonify({'success': True, 'mensaje': 'Pago agregado correctamente'})
     except Exception as e:
@@ -713,15 +982,23 @@ def actualizar_pago(pago_id):
     """API para actualizar pago"""
     try:
         data = request.get_json()
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
+        previas = resumen_de_pagos(cursor, 'id = %s', (pago_id,))
+        aporte_previo = aporte_markov_de_pago(cursor, pago_id)
         cursor.execute(
             'UPDATE pagos SET cliente_id=%s, mes=%s, año=%s, estado=%s, monto=%s, descripcion=%s WHERE id=%s',
             (data['cliente_id'], data['mes'], data['año'], data['estado'], data['monto'], data.get('descripcion', ''), pago_id)
         )
+        ajustar_resumen_pagos(cursor, previas, -1)
+        ajustar_resumen_pagos(cursor, resumen_de_pagos(cursor, 'id = %s', (pago_id,)))
+        aporte_nuevo = aporte_markov_de_pago(cursor, pago_id)
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(aporte_previo, version, -1)
+        aplicar_aporte_markov(aporte_nuevo, version)
         
         return jsonify({'success': True, 'mensaje': 'Pago actualizado correctamente'})
     except Exception as e:
@@ -731,12 +1008,17 @@ def actualizar_pago(pago_id):
 def eliminar_pago(pago_id):
     """API para eliminar pago"""
     try:
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor()
         
+        previas = resumen_de_pagos(cursor, 'id = %s', (pago_id,))
+        aporte_previo = aporte_markov_de_pago(cursor, pago_id)
         cursor.execute('DELETE FROM pagos WHERE id = %s', (pago_id,))
+        ajustar_resumen_pagos(cursor, previas, -1)
+        version = marcar_datos_modificados(cursor)
         conn.commit()
-        conn.close()
+        invalidar_contadores()
+        aplicar_aporte_markov(aporte_previo, version, -1)
         
         return jsonify({'success': True, 'mensaje': 'Pago eliminado correctamente'})
     except Exception as e:
@@ -754,6 +1036,11 @@ def evaluar_crediticio():
             if campo not in data:
                 return jsonify({'success': False, 'mensaje': f'Falta el campo {campo}'}), 400
         
+        detalle = data.get('detalle', DETALLE_COMPLETO)
+        error = detalle_no_valido(detalle)
+        if error:
+            return jsonify({'success': False, 'mensaje': error}), 400
+        
         # Obtener información del cliente
         cliente_id = data.get('cliente_id')
         sueldo = float(data.get('sueldo', 0))
@@ -763,7 +1050,7 @@ def evaluar_crediticio():
         valor_propiedad = float(data.get('valor_propiedad', 0)) if tiene_propiedad else 0
         
         # Obtener estado actual del cliente
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor(dictionary=True)
         
         estado_actual = 'pendiente'
@@ -774,17 +1061,17 @@ def evaluar_crediticio():
                 estado_actual = cliente['estado_actual']
         
         # Evaluar crediticio
-        evaluador = EvaluadorCredito()
+        evaluador = obtener_evaluador()
         evaluacion = evaluador.evaluar_cliente(
             sueldo=sueldo,
             otros_ingresos=otros_ingresos,
             gastos_vivienda=gastos_vivienda,
             tiene_propiedad=tiene_propiedad,
             valor_propiedad=valor_propiedad,
-            estado_actual=estado_actual
+            estado_actual=estado_actual,
+            detalle=detalle
         )
         
-        conn.close()
         
         return jsonify({
             'success': True,
@@ -797,85 +1084,253 @@ def evaluar_crediticio():
 @app.route('/predicciones')
 def predicciones():
     """Página de predicciones IA"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM clientes ORDER BY nombre")
+        cursor.execute(f"SELECT {COLUMNAS_CLIENTE} FROM clientes c ORDER BY c.nombre")
         clientes = cursor.fetchall()
         return render_template('predicciones.html', clientes=clientes)
     finally:
-        conn.close()
+        cursor.close()
+
+def detalle_no_valido(detalle):
+    """Mensaje de error si detalle no es un nivel válido (None si lo es)"""
+    if detalle not in NIVELES_DETALLE:
+        return f"detalle debe ser uno de: {', '.join(NIVELES_DETALLE)}"
+    return None
+
+def evaluar_safa(evaluador, cliente, estado_actual, detalle=DETALLE_DESGLOSE):
+    """Evaluación financiera (SAFA) de un registro de clientes con su último estado de pago"""
+    try:
+        return evaluador.evaluar_cliente(
+            sueldo=float(cliente.get('sueldo', 0) or 0),
+            otros_ingresos=float(cliente.get('otros_ingresos', 0) or 0),
+            gastos_vivienda=float(cliente.get('gastos_vivienda', 0) or 0),
+            tiene_propiedad=bool(cliente.get('tiene_propiedad')),
+            valor_propiedad=float(cliente.get('valor_propiedad', 0) or 0),
+            estado_actual=estado_actual,
+            detalle=detalle
+        )
+    except Exception as e:
+        return {'error': str(e)}
+
+def prediccion_markov(markov, estado_actual, meses=3):
+    """Predicción de Markov para un estado (idéntica para todos los clientes en ese estado)"""
+    predicciones, probabilidades = markov.predecir(estado_actual, meses)
+    return {
+        'estado_actual': estado_actual,
+        'nivel_riesgo': markov.calcular_riesgo(estado_actual),
+        'predicciones': predicciones,
+        'probabilidades': probabilidades,
+        'pronostico': markov.pronostico(estado_actual, meses)
+    }
 
 @app.route('/api/predecir/<int:cliente_id>')
 def predecir_cliente(cliente_id):
     """Realizar predicción para un cliente"""
+    detalle = request.args.get('detalle', DETALLE_DESGLOSE)
+    error = detalle_no_valido(detalle)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
     try:
-        conn = get_db_connection()
+        conn = obtener_conexion()
         cursor = conn.cursor(dictionary=True)
         
         # Obtener cliente
-        cursor.execute("SELECT * FROM clientes WHERE id = %s", (cliente_id,))
+        cursor.execute(f"SELECT {COLUMNAS_PREDICCION} FROM clientes c WHERE c.id = %s", (cliente_id,))
         cliente = cursor.fetchone()
         
         # Obtener último estado
         cursor.execute("""
             SELECT estado FROM pagos 
             WHERE cliente_id = %s 
-            ORDER BY año DESC, mes DESC 
+            ORDER BY año DESC, mes DESC, id DESC 
             LIMIT 1
         """, (cliente_id,))
         ultimo_pago = cursor.fetchone()
         
-        conn.close()
-        
         if not ultimo_pago:
             return jsonify({'error': 'No hay datos del cliente'})
         
         estado_actual = ultimo_pago['estado']
         
-        # Entrenar y predecir con Markov
-        datos = obtener_datos_entrenamiento()
-        markov = CadenaMarkovPagos()
-        markov.entrenar(datos)
-        predicciones, probabilidades = markov.predecir(estado_actual, 3)
-        nivel_riesgo = markov.calcular_riesgo(estado_actual)
-
+        # Predecir con el modelo de Markov compartido (sin reentrenar por petición)
+        resultado = prediccion_markov(obtener_modelo_markov(), estado_actual)
+        
         # Evaluación financiera (SAFA)
-        try:
-            evaluador = EvaluadorCredito()
-            sueldo = float(cliente.get('sueldo', 0) or 0)
-            otros_ingresos = float(cliente.get('otros_ingresos', 0) or 0)
-            gastos_vivienda = float(cliente.get('gastos_vivienda', 0) or 0)
-            tiene_propiedad = bool(cliente.get('tiene_propiedad'))
-            valor_propiedad = float(cliente.get('valor_propiedad', 0) or 0)
-
-            evaluacion = evaluador.evaluar_cliente(
-                sueldo=sueldo,
-                otros_ingresos=otros_ingresos,
-                gastos_vivienda=gastos_vivienda,
-                tiene_propiedad=tiene_propiedad,
-                valor_propiedad=valor_propiedad,
-                estado_actual=estado_actual
-            )
-        except Exception as e:
-            evaluacion = {'error': str(e)}
-
+        evaluacion = evaluar_safa(obtener_evaluador(), cliente, estado_actual, detalle)
+        
         return jsonify({
             'success': True,
             'cliente': cliente,
-            'estado_actual': estado_actual,
-            'nivel_riesgo': nivel_riesgo,
-            'predicciones': predicciones,
-            'probabilidades': probabilidades,
+            **resultado,
             'evaluacion': evaluacion
         })
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+# Columnas de clientes necesarias para predecir y evaluar (sin los campos de texto largos)
+COLUMNAS_PREDICCION = """
+    c.id, c.nombre, c.email, c.telefono, c.estado_actual, c.sueldo, c.otros_ingresos,
+    c.gastos_vivienda, c.tiene_propiedad, c.valor_propiedad, c.apto_prestamo,
+    c.calificacion_crediticia, c.monto_solicitado
+"""
+
+@app.route('/api/predecir/lote', methods=['GET', 'POST'])
+def predecir_lote():
+    """
+    Predicción Markov + evaluación SAFA para varios clientes en una sola petición
+    Filtros (JSON en POST o parámetros en GET):
+    - cliente_ids / ids: lista de ids (por defecto todos)
+    - estado: estado_actual del cliente
+    - detalle: nivel de detalle de la evaluación (puntuacion, desglose o completo; por defecto desglose)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('cliente_ids')
+        if ids is None and request.args.get('ids'):
+            ids = request.args.get('ids').split(',')
+        estado_filtro = data.get('estado') or request.args.get('estado', '')
+        detalle = data.get('detalle') or request.args.get('detalle', DETALLE_DESGLOSE)
+        
+        # Parámetros validados antes de consultar la base
+        error = detalle_no_valido(detalle)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        condiciones, params = [], []
+        if ids is not None:
+            try:
+                ids = [int(i) for i in ids]
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'Los ids de cliente deben ser números enteros'}), 400
+            if not ids:
+                return jsonify({'success': True, 'total': 0, 'resultados': {}})
+            condiciones.append(f"c.id IN ({', '.join(['%s'] * len(ids))})")
+            params.extend(ids)
+        if estado_filtro:
+            condiciones.append("c.estado_actual = %s")
+            params.append(estado_filtro)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        
+        conn = obtener_conexion()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute(f"SELECT {COLUMNAS_PREDICCION} FROM clientes c {where} ORDER BY c.nombre", params)
+        clientes = cursor.fetchall()
+        
+        # Último estado de pago de cada cliente en una sola consulta agrupada
+        cursor.execute(f"""
+            SELECT cliente_id, estado FROM (
+                SELECT p.cliente_id, p.estado,
+                       ROW_NUMBER() OVER (PARTITION BY p.cliente_id ORDER BY p.año DESC, p.mes DESC, p.id DESC) as orden
+                FROM pagos p
+                JOIN clientes c ON c.id = p.cliente_id
+                {where}
+            ) ultimos
+            WHERE orden = 1
+        """, params)
+        ultimos_estados = {fila['cliente_id']: fila['estado'] for fila in cursor.fetchall()}
+        
+        # Un solo modelo y una predicción por estado distinto
+        markov = obtener_modelo_markov()
+        por_estado = {estado: prediccion_markov(markov, estado) for estado in set(ultimos_estados.values())}
+        
+        evaluador = obtener_evaluador()
+        resultados = {}
+        for cliente in clientes:
+            estado_actual = ultimos_estados.get(cliente['id'])
+            if estado_actual is None:
+                resultados[cliente['id']] = {'success': False, 'cliente': cliente, 'error': 'No hay datos del cliente'}
+                continue
+            resultados[cliente['id']] = {
+                'success': True,
+                'cliente': cliente,
+                **por_estado[estado_actual],
+                'evaluacion': evaluar_safa(evaluador, cliente, estado_actual, detalle)
+            }
+        
+        return jsonify({'success': True, 'total': len(resultados), 'resultados': resultados})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/modelo-markov/refrescar', methods=['POST'])
+def refrescar_markov():
+    """API para forzar el reentrenamiento completo del modelo de Markov"""
+    try:
+        modelo = refrescar_modelo_markov()
+        return jsonify({
+            'success': True,
+            'mensaje': 'Modelo de Markov reentrenado',
+            'transiciones': modelo.total_transiciones()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
+
+@app.route('/api/reglas-credito', methods=['GET'])
+def obtener_reglas():
+    """API con las reglas de evaluación crediticia activas"""
+    reglas = sincronizar_reglas_credito(forzar=True)
+    return jsonify({'success': True, 'version': reglas.version, 'reglas': reglas.definicion})
+
+@app.route('/api/reglas-credito', methods=['POST'])
+def guardar_reglas():
+    """
+    API para publicar una nueva versión de las reglas (JSON con el formato de REGLAS_POR_DEFECTO)
+    Se valida compilándola antes de guardarla; con "activar": false queda guardada sin usarse
+    """
+    try:
+        data = request.get_json() or {}
+        definicion = data.get('reglas') or {k: v for k, v in data.items() if k not in ('activar', 'descripcion')}
+        reglas = ReglasCredito(definicion)
+        
+        conn = obtener_conexion()
+        cursor = conn.cursor()
+        try:
+            version = guardar_reglas_credito(cursor, reglas.como_json(), data.get('descripcion', ''))
+            if data.get('activar', True):
+                activar_version_reglas(cursor, version)
+            conn.commit()
+        finally:
+            cursor.close()
+        
+        if data.get('activar', True):
+            activar_reglas(ReglasCredito.desde_registro(version, reglas.como_json()))
+        return jsonify({'success': True, 'version': version, 'mensaje': f'Reglas v{version} guardadas'})
+    except ReglasInvalidasError as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
+
+@app.route('/api/reglas-credito/<int:version>/activar', methods=['POST'])
+def activar_reglas_version(version):
+    """API para activar una versión guardada de las reglas (p. ej. volver a una anterior)"""
+    try:
+        conn = obtener_conexion()
+        cursor = conn.cursor()
+        try:
+            registro = obtener_reglas_credito(cursor, version)
+            if registro is None:
+                return jsonify({'success': False, 'mensaje': 'Versión no encontrada'}), 404
+            reglas = ReglasCredito.desde_registro(*registro)
+            activar_version_reglas(cursor, version)
+            conn.commit()
+        finally:
+            cursor.close()
+        
+        activar_reglas(reglas)
+        return jsonify({'success': True, 'version': version, 'mensaje': f'Reglas v{version} activadas'})
+    except ReglasInvalidasError as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
+
 # Nuevas rutas para reportes
 @app.route('/reportes')
 def reportes():
@@ -885,14 +1340,14 @@ def reportes():
 @app.route('/reportes/clientes')
 def reporte_clientes():
     """Reporte detallado de clientes"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT c.*, 
+        cursor.execute(f"""
+            SELECT {COLUMNAS_CLIENTE}, 
                    COUNT(p.id) as total_pagos,
                    SUM(CASE WHEN p.estado = 'impago' THEN 1 ELSE 0 END) as total_impagos,
                    ROUND(SUM(CASE WHEN p.estado = 'impago' THEN p.monto ELSE 0 END), 2) as deuda_total
@@ -904,12 +1359,12 @@ def reporte_clientes():
         clientes = cursor.fetchall()
         return render_template('reporte_clientes.html', clientes=clientes)
     finally:
-        conn.close()
+        cursor.close()
 
 @app.route('/reportes/pagos')
 def reporte_pagos():
     """Reporte detallado de pagos"""
-    conn = get_db_connection()
+    conn = obtener_conexion()
     if not conn:
         return "Error de conexión", 500
     
@@ -924,117 +1379,267 @@ def reporte_pagos():
         pagos = cursor.fetchall()
         return render_template('reporte_pagos.html', pagos=pagos)
     finally:
-        conn.close()
+        cursor.close()
 
 
-def generar_excel_pagos():
-    """Genera un Excel detallado con todos los pagos (cliente, monto, fecha, estado, descripción)."""
-    conn = get_db_connection()
+# Filas por fetchmany al exportar (la memoria depende del lote, no del total de pagos)
+TAMANO_LOTE_EXPORTACION = int(os.getenv('EXPORTACION_LOTE', 5000))
+
+def _estilos_excel_pagos(wb):
+    """Estilos con nombre del informe de pagos: se registran una vez y las celdas solo los referencian"""
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+    
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    for estilo in [
+        NamedStyle(name='pagos_encabezado', font=Font(bold=True, color='FFFFFF', size=11),
+                   fill=PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid'),
+                   alignment=Alignment(horizontal='center', vertical='center'), border=border),
+        NamedStyle(name='pagos_texto', border=border),
+        NamedStyle(name='pagos_centro', alignment=Alignment(horizontal='center'), border=border),
+        NamedStyle(name='pagos_fecha', number_format='DD/MM/YYYY', border=border),
+        NamedStyle(name='pagos_monto', number_format='€#,##0.00', border=border),
+    ]:
+        wb.add_named_style(estilo)
+
+def generar_excel_pagos(destino):
+    """
+    Escribe en destino (ruta o archivo) un Excel con todos los pagos (cliente, monto, fecha, estado, descripción).
+    Lee los pagos por lotes con fetchmany y escribe en modo write_only, así la memoria no crece con el total.
+    Retorna la cantidad de pagos escritos.
+    """
+    # openpyxl solo se carga cuando se genera un informe
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    
+    conn = obtener_conexion()
     if not conn:
         raise RuntimeError('No se pudo conectar a la base de datos')
 
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor(dictionary=True)
         cursor.execute("""
-            SELECT p.id as pago_id, p.cliente_id, p.mes, p.año, p.monto, p.estado, p.descripcion, p.fecha_pago,
-                   c.nombre as cliente_nombre, c.email as cliente_email, c.telefono as cliente_telefono
+            SELECT p.id as pago_id, p.cliente_id, c.nombre as cliente_nombre, c.email as cliente_email,
+                   c.telefono as cliente_telefono, p.mes, p.año, p.fecha_pago, p.monto, p.estado, p.descripcion
             FROM pagos p
             JOIN clientes c ON p.cliente_id = c.id
             ORDER BY p.año DESC, p.mes DESC, c.nombre
         """)
 
-        pagos = cursor.fetchall()
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Pagos Detallados'
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('Pagos Detallados')
+        _estilos_excel_pagos(wb)
 
-        # Estilos
-        header_font = Font(bold=True, color='FFFFFF', size=11)
-        header_fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        align_center = Alignment(horizontal='center', vertical='center')
-        thin = Side(style='thin')
-        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        # Ajustar anchos (en write_only deben definirse antes de escribir filas)
+        widths = [10, 10, 30, 30, 15, 8, 8, 15, 12, 15, 40]
+        for i, w in enumerate(widths, 1):
+            ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
 
         headers = [
             'Pago ID', 'Cliente ID', 'Nombre Cliente', 'Email', 'Teléfono', 'Mes', 'Año', 'Fecha Pago', 'Monto', 'Estado', 'Descripción'
         ]
+        encabezado = []
+        for title in headers:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.style = 'pagos_encabezado'
+            encabezado.append(cell)
+        ws.append(encabezado)
 
-        for col_idx, title in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=title)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = align_center
-            cell.border = border
-
-        # Rellenar filas
-        fila = 2
-        for p in pagos:
-            ws.cell(row=fila, column=1, value=p.get('pago_id'))
-            ws.cell(row=fila, column=2, value=p.get('cliente_id'))
-            ws.cell(row=fila, column=3, value=p.get('cliente_nombre'))
-            ws.cell(row=fila, column=4, value=p.get('cliente_email'))
-            ws.cell(row=fila, column=5, value=p.get('cliente_telefono'))
-            ws.cell(row=fila, column=6, value=p.get('mes'))
-            ws.cell(row=fila, column=7, value=p.get('año'))
-
-            # Fecha de pago: si el campo fecha_pago existe (TIMESTAMP), usarlo; si no, crear con día 15
-            fecha_pago = p.get('fecha_pago')
-            if fecha_pago is None:
-                try:
-                    fecha_pago = datetime(p.get('año') or 1, p.get('mes') or 1, 15)
-                except Exception:
-                    fecha_pago = None
-
-            cell_fecha = ws.cell(row=fila, column=8, value=fecha_pago)
-            if fecha_pago:
-                cell_fecha.number_format = 'DD/MM/YYYY'
-
-            cell_monto = ws.cell(row=fila, column=9, value=float(p.get('monto') or 0))
-            cell_monto.number_format = '€#,##0.00'
+        # Una celda con estilo por columna, reutilizada en cada fila (append la serializa en el acto)
+        estilos = ['pagos_centro', 'pagos_centro', 'pagos_texto', 'pagos_texto', 'pagos_texto', 'pagos_centro',
+                   'pagos_centro', 'pagos_fecha', 'pagos_monto', 'pagos_texto', 'pagos_texto']
+        celdas = []
+        for estilo in estilos:
+            cell = WriteOnlyCell(ws)
+            cell.style = estilo
+            celdas.append(cell)
 
-            ws.cell(row=fila, column=10, value=p.get('estado'))
-            ws.cell(row=fila, column=11, value=p.get('descripcion'))
+        total = 0
+        while True:
+            filas = cursor.fetchmany(TAMANO_LOTE_EXPORTACION)
+            if not filas:
+                break
+            for pago_id, cliente_id, nombre, email, telefono, mes, año, fecha_pago, monto, estado, descripcion in filas:
+                # Fecha de pago: si el campo fecha_pago existe (TIMESTAMP), usarlo; si no, crear con día 15
+                if fecha_pago is None:
+                    try:
+                        fecha_pago = datetime(año or 1, mes or 1, 15)
+                    except Exception:
+                        fecha_pago = None
 
-            # Aplicar estilo de borde a toda la fila
-            for col in range(1, len(headers) + 1):
-                c = ws.cell(row=fila, column=col)
-                c.border = border
-                if col in (1,2,6,7):
-                    c.alignment = Alignment(horizontal='center')
+                valores = (pago_id, cliente_id, nombre, email, telefono, mes, año,
+                           fecha_pago, float(monto or 0), estado, descripcion)
+                for cell, valor in zip(celdas, valores):
+                    cell.value = valor
+                ws.append(celdas)
+            total += len(filas)
 
-            fila += 1
+        wb.save(destino)
+        return total
 
-        # Ajustar anchos
-        widths = [10, 10, 30, 30, 15, 8, 8, 15, 12, 15, 40]
-        for i, w in enumerate(widths, 1):
-            ws.column_dimensions[openpyxl.utils.get_column_letter(i)].width = w
+    finally:
+        cursor.close()
 
-        # Guardar en buffer
-        excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
+MIMETYPE_EXCEL = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
 
-        return excel_buffer
+# Informes generados en segundo plano y guardados en disco por versión de datos
+ESPERA_DESCARGA_INFORME = float(os.getenv('INFORMES_ESPERA', 120))  # Segundos que espera una descarga directa
+cola_informes = ColaInformes()
 
+def version_datos_actual():
+    """Sello de datos de clientes y pagos (cambia con cada escritura)"""
+    conn = obtener_conexion()
+    if not conn:
+        raise RuntimeError('No se pudo conectar a la base de datos')
+    cursor = conn.cursor()
+    try:
+        return version_datos(cursor)
     finally:
         cursor.close()
-        conn.close()
 
+def _en_contexto_app(generar):
+    """Los trabajos corren fuera de la petición: cada uno toma su propio contexto (y conexión del pool)"""
+    def generar_en_contexto(destino):
+        with app.app_context():
+            generar(destino)
+    return generar_en_contexto
+
+cola_informes.registrar('pagos', _en_contexto_app(generar_excel_pagos), version_datos_actual)
+
+def _nombre_descarga(trabajo):
+    terminado = datetime.fromtimestamp(trabajo['terminado'])
+    return f"INFORME_{trabajo['informe'].upper()}_{terminado.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+def _enviar_informe(trabajo):
+    """Respuesta con el archivo de un trabajo listo"""
+    ruta = cola_informes.archivo(trabajo['id'])
+    if ruta is None:
+        # Los datos cambiaron y el archivo se reemplazó por una versión más nueva
+        return jsonify({'error': 'El informe ya no está disponible, vuelva a solicitarlo'}), 410
+    return send_file(ruta, mimetype=MIMETYPE_EXCEL, as_attachment=True, download_name=_nombre_descarga(trabajo))
+
+def _respuesta_trabajo(trabajo):
+    """Trabajo encolado con las URLs para consultar su estado y descargarlo (202 mientras no termina)"""
+    url_estado = f"/api/informes/trabajos/{trabajo['id']}"
+    respuesta = jsonify({
+        'success': True,
+        'trabajo': trabajo,
+        'url_estado': url_estado,
+        'url_descarga': f"{url_estado}/descarga"
+    })
+    if trabajo['estado'] == LISTO:
+        return respuesta, 200
+    return respuesta, 202, {'Location': url_estado, 'Retry-After': '2'}
+
+def _descargar_informe(nombre):
+    """
+    Compatibilidad con las descargas directas (enlaces y window.location): siempre responden el archivo
+    Se encola (o se reutiliza) el informe y se espera hasta INFORMES_ESPERA segundos; si no termina a
+    tiempo se responde 503 con Retry-After y el trabajo sigue en la cola para el próximo intento
+    """
+    try:
+        trabajo = cola_informes.solicitar(nombre)
+        if trabajo['estado'] != LISTO:
+            liberar_conexion(None)  # No retener una conexión del pool mientras se espera
+            trabajo = cola_informes.esperar(trabajo['id'], timeout=ESPERA_DESCARGA_INFORME)
+    except FuturoTimeoutError:
+        return jsonify({
+            'error': 'El informe todavía se está generando, intente de nuevo en unos segundos',
+            'url_estado': f"/api/informes/trabajos/{trabajo['id']}"
+        }), 503, {'Retry-After': '5'}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if trabajo['estado'] != LISTO:
+        return jsonify({'error': trabajo['error']}), 500
+    return _enviar_informe(trabajo)
+
+@app.route('/api/informes/<nombre>', methods=['POST'])
+def solicitar_informe(nombre):
+    """
+    Encolar la generación de un informe (pagos, librerias)
+    Si ya existe para la versión actual de los datos se devuelve listo al instante (200); si no, 202
+    """
+    if nombre not in cola_informes.informes:
+        return jsonify({'success': False, 'mensaje': 'Informe no encontrado'}), 404
+    try:
+        trabajo = cola_informes.solicitar(nombre)
+    except Exception as e:
+        return jsonify({'success': False, 'mensaje': str(e)}), 500
+    
+    return _respuesta_trabajo(trabajo)
+
+@app.route('/api/informes/trabajos/<trabajo_id>')
+def estado_informe(trabajo_id):
+    """Estado de un trabajo de informe: pendiente, en_proceso, listo o error"""
+    trabajo = cola_informes.estado(trabajo_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'mensaje': 'Trabajo no encontrado'}), 404
+    return jsonify({'success': True, 'trabajo': trabajo})
+
+@app.route('/api/informes/trabajos/<trabajo_id>/descarga')
+def descargar_trabajo_informe(trabajo_id):
+    """Descargar el archivo de un trabajo terminado"""
+    trabajo = cola_informes.estado(trabajo_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'mensaje': 'Trabajo no encontrado'}), 404
+    if trabajo['estado'] != LISTO:
+        return jsonify({'success': False, 'mensaje': 'El informe todavía no está listo', 'trabajo': trabajo}), 409
+    return _enviar_informe(trabajo)
 
 @app.route('/api/descargar-informe-pagos')
 def descargar_informe_pagos():
     """Endpoint para descargar informe de pagos en Excel con detalles (nombre, monto, fecha)."""
+    return _descargar_informe('pagos')
+
+@app.route('/api/export/<recurso>')
+def exportar_datos(recurso):
+    """
+    Exportación masiva de pagos o clientes, enviada por partes
+    Parámetros:
+    - format: csv (por defecto), ndjson o parquet
+    - estado, año, mes, cliente: filtros opcionales (en clientes, año y mes son de la fecha de registro)
+    """
+    if recurso not in EXPORTACIONES:
+        return jsonify({'error': f'Recurso no exportable: {recurso}'}), 404
+    
+    formato = request.args.get('format', 'csv').lower()
     try:
-        excel_buffer = generar_excel_pagos()
-        return send_file(
-            excel_buffer,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'INFORME_PAGOS_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        )
+        verificar_formato(formato)
+        filtros = validar_filtros(request.args)
+    except FormatoNoDisponibleError as e:
+        return jsonify({'error': str(e)}), 501
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        conn = obtener_conexion()
+        if not conn:
+            raise RuntimeError('No se pudo conectar a la base de datos')
+        sql, parametros = consulta_exportacion(recurso, filtros)
+        cursor = conn.cursor()
+        cursor.execute(sql, parametros)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    serializar, mimetype, extension = FORMATOS[formato]
+    
+    def generar():
+        try:
+            yield from serializar(EXPORTACIONES[recurso]['columnas'], leer_por_lotes(cursor, TAMANO_LOTE_EXPORTACION))
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                # Si el cliente cortó la descarga quedan filas sin leer: el pool descarta esa conexión
+                pass
+    
+    nombre = f'{recurso}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    # stream_with_context mantiene la conexión de la petición hasta enviar el último lote
+    return Response(
+        stream_with_context(generar()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nombre}'}
+    )
 
 # Rutas de configuración y perfil
 @app.route('/configuracion')
@@ -1052,148 +1657,53 @@ def ayuda():
     """Página de ayuda"""
     return render_template('ayuda.html')
 
-def generar_excel_librerias():
-    """Genera un archivo Excel con análisis de librerías"""
-    
-    # Datos de librerías analizadas
-    librerias_info = {
-        'Flask': {
-            'version': '3.1.2',
-            'usado_en': ['app.py'],
-            'uso': 'Framework web (rutas, templates, request/response)',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        },
-        'pandas': {
-            'version': '2.3.3',
-            'usado_en': ['app.py'],
-            'uso': 'Análisis de datos, lectura SQL a DataFrame',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        },
-        'numpy': {
-            'version': '2.3.4',
-            'usado_en': ['modelos_ia.py'],
-            'uso': 'Importado - cálculos numéricos',
-            'estado': '⚠ Opcional',
-            'riesgo': 'Bajo'
-        },
-        'scikit-learn': {
-            'version': '1.7.2',
-            'usado_en': ['modelos_ia.py'],
-            'uso': 'Machine Learning (RandomForest)',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        },
-        'mysql-connector-python': {
-            'version': '9.5.0',
-            'usado_en': ['database.py'],
-            'uso': 'Conexión a base de datos MySQL',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        },
-        'matplotlib': {
-            'version': '3.10.7',
-            'usado_en': ['app.py'],
-            'uso': 'Generación de gráficos PNG',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        },
-        'python-dotenv': {
-            'version': '1.2.1',
-            'usado_en': ['app.py', 'database.py'],
-            'uso': 'Cargar variables de entorno',
-            'estado': '✓ Necesaria',
-            'riesgo': 'Bajo'
-        }
-    }
-    
-    wb = openpyxl.Workbook()
-    wb.remove(wb.active)
-    
-    # Hoja 1: Resumen
-    ws = wb.create_sheet('📋 Resumen', 0)
-    
-    ws['A1'] = 'ANÁLISIS DE LIBRERÍAS - SISTEMA CONTADOR'
-    ws['A1'].font = Font(bold=True, size=14, color='FFFFFF')
-    ws['A1'].fill = PatternFill(start_color='203864', end_color='203864', fill_type='solid')
-    ws.merge_cells('A1:E1')
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
-    
-    ws['A2'] = f'Generado: {datetime.now().strftime("%d de %B de %Y, %H:%M")}'
-    ws['A2'].font = Font(italic=True, size=10)
-    
-    fila = 4
-    metricas = [
-        ('Total librerías', '7'),
-        ('Librerías necesarias', '7'),
-        ('Librerías opcionales', '1'),
-        ('Estado', '✓ Operativo'),
-        ('Warnings', '0/8 ✓ Resueltos')
-    ]
-    
-    for label, valor in metricas:
-        ws[f'A{fila}'] = label
-        ws[f'B{fila}'] = valor
-        ws[f'B{fila}'].font = Font(bold=True)
-        fila += 1
-    
-    # Hoja 2: Librerías detalladas
-    ws_libs = wb.create_sheet('📦 Librerías', 1)
-    
-    headers = ['Librería', 'Versión', 'Usado en', 'Descripción', 'Estado']
-    for col, header in enumerate(headers, 1):
-        cell = ws_libs.cell(row=1, column=col)
-        cell.value = header
-        cell.font = Font(bold=True, color='FFFFFF', size=11)
-        cell.fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    fila = 2
-    for lib_name, lib_data in librerias_info.items():
-        ws_libs.cell(row=fila, column=1).value = lib_name
-        ws_libs.cell(row=fila, column=2).value = lib_data['version']
-        ws_libs.cell(row=fila, column=3).value = ', '.join(lib_data['usado_en'])
-        ws_libs.cell(row=fila, column=4).value = lib_data['uso']
-        ws_libs.cell(row=fila, column=5).value = lib_data['estado']
-        
-        if '✓' in lib_data['estado']:
-            ws_libs.cell(row=fila, column=5).fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-        else:
-            ws_libs.cell(row=fila, column=5).fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-        
-        fila += 1
-    
-    ws_libs.column_dimensions['A'].width = 20
-    ws_libs.column_dimensions['B'].width = 12
-    ws_libs.column_dimensions['C'].width = 20
-    ws_libs.column_dimensions['D'].width = 40
-    ws_libs.column_dimensions['E'].width = 15
-    
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 20
-    
-    # Guardar en buffer
-    excel_buffer = io.BytesIO()
-    wb.save(excel_buffer)
-    excel_buffer.seek(0)
-    
-    return excel_buffer
+def generar_excel_librerias(destino):
+    """Escribir en destino el informe de librerías, con el análisis medido de analisis_dependencias"""
+    from generar_informe_librerias import crear_excel  # Importa openpyxl
+    crear_excel(analizar_proyecto(), destino)
+
+# El informe de librerías se vuelve a generar solo si cambian requirements.txt o las fuentes
+cola_informes.registrar('librerias', generar_excel_librerias, huella_proyecto)
 
 @app.route('/api/descargar-informe-librerias')
 def descargar_informe_librerias():
     """API para descargar informe de librerías en Excel"""
+    return _descargar_informe('librerias')
+
+@app.cli.command('reconstruir-resumen')
+def comando_reconstruir_resumen():
+    """Recalcular la tabla resumen_pagos a partir de pagos"""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ No se pudo conectar a la base de datos")
+        return
+    
+    cursor = conn.cursor()
     try:
-        excel_buffer = generar_excel_librerias()
-        
-        return send_file(
-            excel_buffer,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=f'INFORME_LIBRERIAS_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        )
+        filas = reconstruir_resumen_pagos(cursor)
+        marcar_datos_modificados(cursor)
+        conn.commit()
+        invalidar_contadores()
+        print(f"✅ Resumen de pagos reconstruido ({filas} filas)")
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        conn.rollback()
+        print(f"❌ Error reconstruyendo resumen: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+
+@app.cli.command('recalificar')
+@click.option('--bloque', default=TAMANO_BLOQUE, show_default=True, help='Clientes por lectura y por transacción')
+def comando_recalificar(bloque):
+    """Recalificar a todos los clientes con su último estado de pago"""
+    print("🔄 Recalificando cartera...")
+    try:
+        resultado = recalificar_cartera(bloque)
+        invalidar_contadores()
+        print(f"✅ {resultado['procesados']:,} clientes evaluados, {resultado['actualizados']:,} actualizados "
+              f"en {resultado['segundos']}s")
+    except Exception as e:
+        print(f"❌ Error recalificando: {e}")
 
 def abrir_navegador():
     """Abrir navegador automáticamente después de 2 segundos"""
@@ -1210,6 +1720,10 @@ if __name__ == '__main__':
         # Abrir navegador en hilo separado
         threading.Thread(target=abrir_navegador).start()
         
+        # Recalificación diaria opcional (RECALIFICACION_HORA); solo en el proceso que sirve peticiones
+        if os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+            iniciar_programador(al_terminar=invalidar_contadores)
+        
         # Ejecutar servidor
         app.run(debug=True, host='0.0.0.0', port=5000)
     else:
@@ -1,8 +1,13 @@
 # sistema_contador/database.py
 import mysql.connector
 import os
+import ast
+import json
 from dotenv import load_dotenv
 import random
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
 
 load_dotenv()
@@ -15,14 +20,588 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'sistema_contador')
 }
 
+# Configuración del pool de conexiones
+POOL_CONFIG = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),              # Conexiones que se mantienen abiertas
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),  # Conexiones extra temporales en picos
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),          # Segundos de espera por una conexión libre
+    'recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),          # Segundos antes de renovar una conexión
+    'pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1'        # Verificar la conexión al prestarla
+}
+
+class PoolAgotadoError(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+class ConexionPool:
+    """Conexión prestada por el pool: close() la devuelve en lugar de cerrarla"""
+    
+    def __init__(self, pool, conn, creada):
+        self._pool = pool
+        self._conn = conn
+        self._creada = creada
+    
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise mysql.connector.InterfaceError("La conexión ya fue devuelta al pool")
+        return getattr(self._conn, nombre)
+    
+    def close(self):
+        """Devolver la conexión al pool (idempotente)"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn, self._creada)
+
+class PoolConexiones:
+    """Pool de conexiones MySQL con desborde, reciclaje y verificación al prestar"""
+    
+    def __init__(self, config, pool_size=5, max_overflow=10, timeout=30, recycle=1800, pre_ping=True):
+        self.config = config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._libres = deque()
+        self._lock = threading.Lock()
+        self._cupos = threading.BoundedSemaphore(pool_size + max_overflow)
+    
+    def obtener(self):
+        """Prestar una conexión; reutiliza una libre o abre una nueva"""
+        if not self._cupos.acquire(timeout=self.timeout):
+            raise PoolAgotadoError(
+                f"Sin conexiones libres tras {self.timeout}s "
+                f"(pool_size={self.pool_size}, max_overflow={self.max_overflow})"
+            )
+        try:
+            while True:
+                with self._lock:
+                    if not self._libres:
+                        break
+                    conn, creada = self._libres.pop()
+                if self._es_valida(conn, creada):
+                    return ConexionPool(self, conn, creada)
+                self._descartar(conn)
+            
+            conn = mysql.connector.connect(**self.config)
+            return ConexionPool(self, conn, time.monotonic())
+        except Exception:
+            self._cupos.release()
+            raise
+    
+    def devolver(self, conn, creada):
+        """Recibir una conexión prestada; las de desborde o vencidas se cierran"""
+        try:
+            try:
+                # Descartar cualquier transacción abierta para no filtrar estado
+                conn.rollback()
+            except Exception:
+                self._descartar(conn)
+                return
+            
+            with self._lock:
+                if len(self._libres) < self.pool_size and not self._vencida(creada):
+                    self._libres.append((conn, creada))
+                    return
+            self._descartar(conn)
+        finally:
+            self._cupos.release()
+    
+    def cerrar(self):
+        """Cerrar todas las conexiones libres"""
+        with self._lock:
+            libres, self._libres = list(self._libres), deque()
+        for conn, _ in libres:
+            self._descartar(conn)
+    
+    def _vencida(self, creada):
+        return self.recycle > 0 and time.monotonic() - creada > self.recycle
+    
+    def _es_valida(self, conn, creada):
+        if self._vencida(creada):
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+    
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def obtener_pool():
+    """Pool compartido del proceso (se crea en el primer uso)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexiones(DB_CONFIG, **POOL_CONFIG)
+    return _pool
+
 def get_db_connection():
-    """Obtener conexión a MySQL"""
+    """Obtener conexión a MySQL desde el pool (close() la devuelve al pool)"""
     try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except mysql.connector.Error as e:
+        return obtener_pool().obtener()
+    except (mysql.connector.Error, PoolAgotadoError) as e:
         print(f"Error de conexión: {e}")
         return None
 
+# Comportamiento de pago según el estado del cliente: probabilidad de cada estado de pago mensual
+# (compartido por los datos de ejemplo y por generar_datos_prueba.py)
+COMPORTAMIENTO_PAGOS = {
+    'al_dia': [('al_dia', 0.8), ('retraso_leve', 0.2)],
+    'retraso_leve': [('al_dia', 0.4), ('retraso_leve', 0.4), ('retraso_grave', 0.2)],
+    'retraso_grave': [('retraso_leve', 0.2), ('retraso_grave', 0.5), ('impago', 0.3)],
+    'impago': [('retraso_grave', 0.1), ('impago', 0.9)]
+}
+
+# Monto base de la cuota para cada mes (enero a diciembre)
+MONTOS_BASE = [2500, 2800, 3000, 2200, 2600, 2400, 2900, 2700, 3100, 2300, 2650, 2850]
+
+def elegir_estado_pago(estado_cliente, rand):
+    """Estado de un pago mensual para un valor uniforme rand en [0, 1)"""
+    acumulado = 0.0
+    opciones = COMPORTAMIENTO_PAGOS.get(estado_cliente, COMPORTAMIENTO_PAGOS['impago'])
+    for estado_pago, probabilidad in opciones:
+        acumulado += probabilidad
+        if rand < acumulado:
+            return estado_pago
+    return opciones[-1][0]
+
+def resumen_de_pagos(cursor, condicion, params=()):
+    """
+    Agrupar por (año, mes, estado) los pagos que cumplen la condición
+    Retorna filas (año, mes, estado, cantidad, monto) listas para ajustar_resumen_pagos
+    Requiere un cursor normal (no dictionary)
+    """
+    cursor.execute(f"""
+        SELECT año, mes, estado, COUNT(*), COALESCE(SUM(monto), 0)
+        FROM pagos
+        WHERE ({condicion})
+          AND año IS NOT NULL AND mes IS NOT NULL AND estado IS NOT NULL
+        GROUP BY año, mes, estado
+        FOR UPDATE
+    """, params)
+    return cursor.fetchall()
+
+def ajustar_resumen_pagos(cursor, filas, signo=1):
+    """
+    Sumar (signo=1) o restar (signo=-1) filas de resumen_de_pagos en resumen_pagos
+    Debe ejecutarse en la misma transacción que la escritura sobre pagos
+    """
+    deltas = [
+        (año, mes, estado, signo * cantidad, signo * monto)
+        for año, mes, estado, cantidad, monto in filas
+    ]
+    if deltas:
+        cursor.executemany("""
+            INSERT INTO resumen_pagos (año, mes, estado, cantidad, monto)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad),
+                                    monto = monto + VALUES(monto)
+        """, deltas)
+
+def reconstruir_resumen_pagos(cursor):
+    """Recalcular resumen_pagos desde cero a partir de la tabla pagos"""
+    cursor.execute("DELETE FROM resumen_pagos")
+    cursor.execute("""
+        INSERT INTO resumen_pagos (año, mes, estado, cantidad, monto)
+        SELECT año, mes, estado, COUNT(*), COALESCE(SUM(monto), 0)
+        FROM pagos
+        WHERE año IS NOT NULL AND mes IS NOT NULL AND estado IS NOT NULL
+        GROUP BY año, mes, estado
+    """)
+    return cursor.rowcount
+
+def marcar_datos_modificados(cursor):
+    """
+    Incrementar la versión de datos (invalida los informes en caché)
+    Debe ejecutarse justo antes del commit de la escritura, en la misma transacción
+    Retorna: la versión de esta escritura (la fila queda bloqueada hasta el commit)
+    """
+    cursor.execute("UPDATE version_datos SET version = version + 1, actualizado = NOW() WHERE id = 1")
+    return version_datos(cursor)
+
+def version_datos(cursor):
+    """Versión actual de los datos de clientes y pagos"""
+    cursor.execute("SELECT version FROM version_datos WHERE id = 1")
+    fila = cursor.fetchone()
+    return fila[0] if fila else 0
+
+def version_reglas_activa(cursor):
+    """Versión de las reglas de crédito activas en la base (None si se usan las de por defecto)"""
+    cursor.execute("SELECT MAX(version) FROM reglas_credito WHERE activa")
+    fila = cursor.fetchone()
+    return fila[0] if fila else None
+
+def obtener_reglas_credito(cursor, version=None):
+    """(version, definicion JSON) de las reglas activas o de una versión concreta; None si no hay"""
+    if version is None:
+        cursor.execute("SELECT version, definicion FROM reglas_credito WHERE activa ORDER BY version DESC LIMIT 1")
+    else:
+        cursor.execute("SELECT version, definicion FROM reglas_credito WHERE version = %s", (version,))
+    fila = cursor.fetchone()
+    return (fila[0], fila[1]) if fila else None
+
+def guardar_reglas_credito(cursor, definicion_json, descripcion=''):
+    """Registrar una nueva versión de reglas (sin activarla); retorna el número de versión"""
+    cursor.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM reglas_credito FOR UPDATE")
+    version = cursor.fetchone()[0]
+    cursor.execute(
+        'INSERT INTO reglas_credito (version, definicion, descripcion) VALUES (%s, %s, %s)',
+        (version, definicion_json, descripcion)
+    )
+    return version
+
+def activar_version_reglas(cursor, version):
+    """Dejar activa solo la versión indicada; retorna False si no existe"""
+    cursor.execute("SELECT 1 FROM reglas_credito WHERE version = %s", (version,))
+    if cursor.fetchone() is None:
+        return False
+    cursor.execute("UPDATE reglas_credito SET activa = (version = %s)", (version,))
+    return True
+
+def _migracion_tablas_base(cursor):
+    """Tablas clientes y pagos, con las columnas agregadas a bases antiguas"""
+    # Crear tabla clientes si no existe
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            email VARCHAR(100),
+            telefono VARCHAR(20),
+            direccion VARCHAR(255),
+            estado_actual VARCHAR(20) DEFAULT 'al_dia',
+            fecha_registro DATE DEFAULT (CURRENT_DATE),
+            sueldo DECIMAL(10,2) DEFAULT 0,
+            otros_ingresos DECIMAL(10,2) DEFAULT 0,
+            gastos_vivienda DECIMAL(10,2) DEFAULT 0,
+            tiene_propiedad BOOLEAN DEFAULT FALSE,
+            valor_propiedad DECIMAL(12,2) DEFAULT 0,
+            apto_prestamo VARCHAR(20) DEFAULT 'pendiente',
+            evaluacion_ia TEXT,
+            calificacion_crediticia DECIMAL(3,1) DEFAULT 0,
+            fecha_evaluacion DATETIME,
+            notas TEXT,
+            monto_solicitado DECIMAL(12,2) DEFAULT 0
+        )
+    """)
+    
+    # Agregar columnas faltantes si es necesario
+    cursor.execute("SHOW COLUMNS FROM clientes")
+    columnas_existentes = [row[0] for row in cursor.fetchall()]
+    
+    columnas_necesarias = {
+        'telefono': 'VARCHAR(20)',
+        'direccion': 'VARCHAR(255)',
+        'sueldo': 'DECIMAL(10,2) DEFAULT 0',
+        'otros_ingresos': 'DECIMAL(10,2) DEFAULT 0',
+        'gastos_vivienda': 'DECIMAL(10,2) DEFAULT 0',
+        'tiene_propiedad': 'BOOLEAN DEFAULT FALSE',
+        'valor_propiedad': 'DECIMAL(12,2) DEFAULT 0',
+        'apto_prestamo': 'VARCHAR(20) DEFAULT "pendiente"',
+        'evaluacion_ia': 'TEXT',
+        'calificacion_crediticia': 'DECIMAL(3,1) DEFAULT 0',
+        'fecha_evaluacion': 'DATETIME',
+        'notas': 'TEXT',
+        'monto_solicitado': 'DECIMAL(12,2) DEFAULT 0'
+    }
+    
+    for columna, tipo in columnas_necesarias.items():
+        if columna not in columnas_existentes:
+            try:
+                cursor.execute(f"ALTER TABLE clientes ADD COLUMN {columna} {tipo}")
+                print(f"✅ Columna '{columna}' agregada")
+            except Exception as e:
+                print(f"⚠️  No se pudo agregar columna '{columna}': {e}")
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pagos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            cliente_id INT,
+            mes INT,
+            año INT,
+            estado VARCHAR(20),
+            monto DECIMAL(10,2),
+            descripcion TEXT,
+            fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+        )
+    """)
+
+def _migracion_resumen_pagos(cursor):
+    """Tabla resumen_pagos poblada a partir de los pagos existentes"""
+    # Resumen de pagos por (año, mes, estado), mantenido en cada escritura
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_pagos (
+            año INT NOT NULL,
+            mes INT NOT NULL,
+            estado VARCHAR(20) NOT NULL,
+            cantidad INT NOT NULL DEFAULT 0,
+            monto DECIMAL(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (año, mes, estado)
+        )
+    """)
+    reconstruir_resumen_pagos(cursor)
+
+def _crear_indice(cursor, tabla, nombre, columnas):
+    """Crear un índice si todavía no existe (tolera índices creados a mano)"""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (tabla, nombre))
+    if cursor.fetchone():
+        return
+    cursor.execute(f"CREATE INDEX {nombre} ON {tabla} ({columnas})")
+    print(f"✅ Índice '{nombre}' creado en {tabla}")
+
+def _migracion_indices_pagos(cursor):
+    """Índices compuestos para las consultas de pagos en app.py"""
+    # Historial por cliente ordenado por periodo (entrenamiento Markov, último estado, pagos del cliente)
+    _crear_indice(cursor, 'pagos', 'idx_pagos_cliente_periodo', 'cliente_id, año, mes, estado')
+    # Filtros por estado y búsqueda de clientes con impagos
+    _crear_indice(cursor, 'pagos', 'idx_pagos_estado_cliente', 'estado, cliente_id')
+    # Listados y reportes ordenados por periodo
+    _crear_indice(cursor, 'pagos', 'idx_pagos_periodo', 'año, mes')
+
+def _migracion_indices_clientes(cursor):
+    """Índices para filtros y orden de clientes en app.py"""
+    # Dashboard: conteos por apto_prestamo agrupados por estado_actual
+    _crear_indice(cursor, 'clientes', 'idx_clientes_apto_estado', 'apto_prestamo, estado_actual')
+    # Filtro por estado en /clientes y clientes en riesgo
+    _crear_indice(cursor, 'clientes', 'idx_clientes_estado', 'estado_actual')
+    # Listados ordenados por nombre
+    _crear_indice(cursor, 'clientes', 'idx_clientes_nombre', 'nombre')
+
+def _migracion_reglas_credito(cursor):
+    """Versiones de las reglas de evaluación crediticia (JSON de evaluacion_credito.REGLAS_POR_DEFECTO)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reglas_credito (
+            version INT PRIMARY KEY,
+            definicion MEDIUMTEXT NOT NULL,
+            activa BOOLEAN NOT NULL DEFAULT FALSE,
+            descripcion VARCHAR(255),
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_reglas_activa (activa)
+        )
+    """)
+
+def serializar_evaluacion(evaluacion):
+    """Evaluación (dict de EvaluadorCredito) como texto JSON para la columna evaluacion_ia"""
+    return json.dumps(evaluacion, ensure_ascii=False, separators=(',', ':'))
+
+def leer_evaluacion(valor):
+    """Evaluación guardada en evaluacion_ia como dict (None si está vacía o no es válida)"""
+    if not valor:
+        return None
+    if isinstance(valor, dict):
+        return valor
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode('utf-8')
+    try:
+        return json.loads(valor)
+    except ValueError:
+        return None
+
+def _evaluacion_antigua_a_json(texto):
+    """Convertir una evaluación guardada como str(dict) al formato JSON (None si no se puede leer)"""
+    if not texto:
+        return None
+    try:
+        json.loads(texto)
+        return texto  # Ya es JSON
+    except ValueError:
+        pass
+    try:
+        # Solo literales de Python: no ejecuta código
+        evaluacion = ast.literal_eval(texto)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return serializar_evaluacion(evaluacion) if isinstance(evaluacion, dict) else None
+
+def _migracion_evaluacion_json(cursor, tamano_lote=1000):
+    """Pasar clientes.evaluacion_ia de TEXT con str(dict) a una columna JSON nativa"""
+    ultimo_id = 0
+    convertidas = descartadas = 0
+    while True:
+        cursor.execute("""
+            SELECT id, evaluacion_ia FROM clientes
+            WHERE id > %s AND evaluacion_ia IS NOT NULL
+            ORDER BY id LIMIT %s
+        """, (ultimo_id, tamano_lote))
+        filas = cursor.fetchall()
+        if not filas:
+            break
+        cambios = [(_evaluacion_antigua_a_json(texto), cliente_id) for cliente_id, texto in filas]
+        cursor.executemany("UPDATE clientes SET evaluacion_ia = %s WHERE id = %s", cambios)
+        convertidas += sum(1 for json_texto, _ in cambios if json_texto is not None)
+        descartadas += sum(1 for json_texto, _ in cambios if json_texto is None)
+        ultimo_id = filas[-1][0]
+    
+    cursor.execute("ALTER TABLE clientes MODIFY evaluacion_ia JSON")
+    print(f"✅ evaluacion_ia convertida a JSON ({convertidas} filas, {descartadas} ilegibles descartadas)")
+
+# Componentes de la evaluación que se guardan en el historial (columnas de evaluaciones)
+COMPONENTES_EVALUACION = ['score_ingresos', 'score_deudas', 'score_ratio', 'score_historial', 'score_propiedad', 'ratio_deuda']
+
+SQL_INSERTAR_EVALUACION = f"""
+    INSERT INTO evaluaciones (cliente_id, fecha, origen, version_reglas, puntuacion, apto_prestamo,
+                              {', '.join(COMPONENTES_EVALUACION)})
+    VALUES (%s, NOW(), %s, %s, %s, %s, {', '.join(['%s'] * len(COMPONENTES_EVALUACION))})
+"""
+
+def _fila_evaluacion(cliente_id, evaluacion, origen):
+    detalle = evaluacion.get('detalle', {})
+    return (
+        cliente_id, origen, evaluacion.get('version_reglas', 0),
+        evaluacion['puntuacion_final'], evaluacion['apto_prestamo'],
+        *(detalle.get(componente) for componente in COMPONENTES_EVALUACION)
+    )
+
+def registrar_evaluacion(cursor, cliente_id, evaluacion, origen='edicion'):
+    """
+    Agregar una evaluación al historial y apuntar clientes.ultima_evaluacion_id a ella
+    Debe ejecutarse en la misma transacción que la escritura sobre clientes
+    """
+    cursor.execute(SQL_INSERTAR_EVALUACION, _fila_evaluacion(cliente_id, evaluacion, origen))
+    cursor.execute(
+        'UPDATE clientes SET ultima_evaluacion_id = %s WHERE id = %s',
+        (cursor.lastrowid, cliente_id)
+    )
+
+def registrar_evaluaciones(cursor, evaluaciones, origen='recalificacion'):
+    """
+    Versión por lotes de registrar_evaluacion: evaluaciones es una lista de (cliente_id, evaluacion)
+    El puntero se actualiza con una sola consulta agrupada sobre los clientes del lote
+    """
+    if not evaluaciones:
+        return
+    cursor.executemany(SQL_INSERTAR_EVALUACION, [
+        _fila_evaluacion(cliente_id, evaluacion, origen) for cliente_id, evaluacion in evaluaciones
+    ])
+    ids = [cliente_id for cliente_id, _ in evaluaciones]
+    marcadores = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"""
+        UPDATE clientes c
+        JOIN (
+            SELECT cliente_id, MAX(id) AS id FROM evaluaciones
+            WHERE cliente_id IN ({marcadores})
+            GROUP BY cliente_id
+        ) u ON u.cliente_id = c.id
+        SET c.ultima_evaluacion_id = u.id
+    """, ids)
+
+def _migracion_historial_evaluaciones(cursor):
+    """Historial de evaluaciones (solo inserciones) y puntero a la última en clientes"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS evaluaciones (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            cliente_id INT NOT NULL,
+            fecha DATETIME NOT NULL,
+            origen ENUM('alta', 'edicion', 'recalificacion', 'migracion') NOT NULL,
+            version_reglas INT NOT NULL DEFAULT 0,
+            puntuacion DECIMAL(5,2) NOT NULL,
+            apto_prestamo VARCHAR(20) NOT NULL,
+            score_ingresos DECIMAL(5,2),
+            score_deudas DECIMAL(5,2),
+            score_ratio DECIMAL(5,2),
+            score_historial DECIMAL(5,2),
+            score_propiedad DECIMAL(5,2),
+            ratio_deuda DECIMAL(5,2),
+            -- Historial por cliente y consultas "a una fecha" sin leer la fila completa
+            INDEX idx_evaluaciones_cliente_fecha (cliente_id, fecha, puntuacion, apto_prestamo),
+            FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
+        )
+    """)
+    
+    cursor.execute("SHOW COLUMNS FROM clientes LIKE 'ultima_evaluacion_id'")
+    if cursor.fetchone() is None:
+        cursor.execute("ALTER TABLE clientes ADD COLUMN ultima_evaluacion_id BIGINT NULL")
+    
+    # La evaluación vigente de cada cliente pasa a ser la primera fila de su historial
+    cursor.execute("""
+        INSERT INTO evaluaciones (cliente_id, fecha, origen, version_reglas, puntuacion, apto_prestamo,
+                                  score_ingresos, score_deudas, score_ratio, score_historial,
+                                  score_propiedad, ratio_deuda)
+        SELECT c.id, c.fecha_evaluacion, 'migracion',
+               COALESCE(c.evaluacion_ia->>'$.version_reglas', 0),
+               c.calificacion_crediticia, COALESCE(c.apto_prestamo, 'pendiente'),
+               c.evaluacion_ia->>'$.detalle.score_ingresos',
+               c.evaluacion_ia->>'$.detalle.score_deudas',
+               c.evaluacion_ia->>'$.detalle.score_ratio',
+               c.evaluacion_ia->>'$.detalle.score_historial',
+               c.evaluacion_ia->>'$.detalle.score_propiedad',
+               c.evaluacion_ia->>'$.detalle.ratio_deuda'
+        FROM clientes c
+        WHERE c.fecha_evaluacion IS NOT NULL AND c.ultima_evaluacion_id IS NULL
+    """)
+    cursor.execute("""
+        UPDATE clientes c
+        JOIN (SELECT cliente_id, MAX(id) AS id FROM evaluaciones GROUP BY cliente_id) u ON u.cliente_id = c.id
+        SET c.ultima_evaluacion_id = u.id
+    """)
+
+def _migracion_version_datos(cursor):
+    """Contador de versión de datos para la caché de informes"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS version_datos (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            actualizado DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT IGNORE INTO version_datos (id, version) VALUES (1, 0)")
+
+# Migraciones numeradas: cada una se aplica una sola vez y queda registrada en schema_version.
+# Para cambiar el esquema se agrega una nueva entrada al final; nunca se editan las ya publicadas.
+MIGRACIONES = [
+    (1, 'Tablas base clientes y pagos', _migracion_tablas_base),
+    (2, 'Tabla resumen_pagos', _migracion_resumen_pagos),
+    (3, 'Índices de pagos', _migracion_indices_pagos),
+    (4, 'Índices de clientes', _migracion_indices_clientes),
+    (5, 'Tabla reglas_credito', _migracion_reglas_credito),
+    (6, 'evaluacion_ia como JSON', _migracion_evaluacion_json),
+    (7, 'Historial de evaluaciones', _migracion_historial_evaluaciones),
+    (8, 'Versión de datos para informes', _migracion_version_datos),
+]
+
+def version_esquema(cursor):
+    """Versión actual del esquema (0 si nunca se migró)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            descripcion VARCHAR(255),
+            aplicada_en DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+def aplicar_migraciones(conn, cursor):
+    """Aplicar en orden las migraciones pendientes; retorna la versión final"""
+    actual = version_esquema(cursor)
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        print(f"🔧 Aplicando migración {version}: {descripcion}")
+        migracion(cursor)
+        cursor.execute(
+            'INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)',
+            (version, descripcion)
+        )
+        # El DDL de MySQL confirma implícitamente; se confirma cada migración por separado
+        conn.commit()
+        actual = version
+    return actual
+
 def init_database():
     """Inicializar la base de datos con datos de ejemplo"""
     conn = get_db_connection()
@@ -32,75 +611,12 @@ def init_database():
     cursor = conn.cursor()
     
     try:
-        # Crear tabla clientes si no existe
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS clientes (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                email VARCHAR(100),
-                telefono VARCHAR(20),
-                direccion VARCHAR(255),
-                estado_actual VARCHAR(20) DEFAULT 'al_dia',
-                fecha_registro DATE DEFAULT (CURRENT_DATE),
-                sueldo DECIMAL(10,2) DEFAULT 0,
-                otros_ingresos DECIMAL(10,2) DEFAULT 0,
-                gastos_vivienda DECIMAL(10,2) DEFAULT 0,
-                tiene_propiedad BOOLEAN DEFAULT FALSE,
-                valor_propiedad DECIMAL(12,2) DEFAULT 0,
-                apto_prestamo VARCHAR(20) DEFAULT 'pendiente',
-                evaluacion_ia TEXT,
-                calificacion_crediticia DECIMAL(3,1) DEFAULT 0,
-                fecha_evaluacion DATETIME,
-                notas TEXT,
-                monto_solicitado DECIMAL(12,2) DEFAULT 0
-            )
-        """)
-        
-        # Agregar columnas faltantes si es necesario
-        cursor.execute("SHOW COLUMNS FROM clientes")
-        columnas_existentes = [row[0] for row in cursor.fetchall()]
-        
-        columnas_necesarias = {
-            'telefono': 'VARCHAR(20)',
-            'direccion': 'VARCHAR(255)',
-            'sueldo': 'DECIMAL(10,2) DEFAULT 0',
-            'otros_ingresos': 'DECIMAL(10,2) DEFAULT 0',
-            'gastos_vivienda': 'DECIMAL(10,2) DEFAULT 0',
-            'tiene_propiedad': 'BOOLEAN DEFAULT FALSE',
-            'valor_propiedad': 'DECIMAL(12,2) DEFAULT 0',
-            'apto_prestamo': 'VARCHAR(20) DEFAULT "pendiente"',
-            'evaluacion_ia': 'TEXT',
-            'calificacion_crediticia': 'DECIMAL(3,1) DEFAULT 0',
-            'fecha_evaluacion': 'DATETIME',
-            'notas': 'TEXT',
-            'monto_solicitado': 'DECIMAL(12,2) DEFAULT 0'
-        }
-        
-        for columna, tipo in columnas_necesarias.items():
-            if columna not in columnas_existentes:
-                try:
-                    cursor.execute(f"ALTER TABLE clientes ADD COLUMN {columna} {tipo}")
-                    print(f"✅ Columna '{columna}' agregada")
-                except Exception as e:
-                    print(f"⚠️  No se pudo agregar columna '{columna}': {e}")
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pagos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                cliente_id INT,
-                mes INT,
-                año INT,
-                estado VARCHAR(20),
-                monto DECIMAL(10,2),
-                descripcion TEXT,
-                fecha_pago TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (cliente_id) REFERENCES clientes(id) ON DELETE CASCADE
-            )
-        """)
+        # Crear o actualizar el esquema (solo una consulta de versión si ya está al día)
+        aplicar_migraciones(conn, cursor)
         
         # Insertar datos de ejemplo si no existen
-        cursor.execute("SELECT COUNT(*) FROM clientes")
-        if cursor.fetchone()[0] == 0:
+        cursor.execute("SELECT 1 FROM clientes LIMIT 1")
+        if cursor.fetchone() is None:
             print("📝 Insertando datos de ejemplo...")
             
             clientes_ejemplo = [
@@ -125,38 +641,14 @@ def init_database():
                 
                 # Generar pagos de ejemplo para los últimos 12 meses
                 año_actual = 2024
-                montos_base = [2500, 2800, 3000, 2200, 2600, 2400, 2900, 2700, 3100, 2300, 2650, 2850]
                 
                 for mes in range(1, 13):
                     # Variar el monto ligeramente
-                    monto = montos_base[mes-1] * random.uniform(0.9, 1.1)
+                    monto = MONTOS_BASE[mes-1] * random.uniform(0.9, 1.1)
                     monto = round(monto, 2)
                     
                     # Patrón de comportamiento basado en estado del cliente
-                    if estado == 'al_dia':
-                        # 80% al día, 20% retraso leve
-                        estado_pago = 'al_dia' if random.random() < 0.8 else 'retraso_leve'
-                    elif estado == 'retraso_leve':
-                        # 40% al día, 40% retraso leve, 20% retraso grave
-                        rand = random.random()
-                        if rand < 0.4:
-                            estado_pago = 'al_dia'
-                        elif rand < 0.8:
-                            estado_pago = 'retraso_leve'
-                        else:
-                            estado_pago = 'retraso_grave'
-                    elif estado == 'retraso_grave':
-                        # 20% retraso leve, 50% retraso grave, 30% impago
-                        rand = random.random()
-                        if rand < 0.2:
-                            estado_pago = 'retraso_leve'
-                        elif rand < 0.7:
-                            estado_pago = 'retraso_grave'
-                        else:
-                            estado_pago = 'impago'
-                    else:  # impago
-                        # 10% retraso grave, 90% impago
-                        estado_pago = 'retraso_grave' if random.random() < 0.1 else 'impago'
+                    estado_pago = elegir_estado_pago(estado, random.random())
                     
                     descripcion = f"Pago mensual {mes}/{año_actual}"
                     
@@ -164,6 +656,8 @@ def init_database():
                         'INSERT INTO pagos (cliente_id, mes, año, estado, monto, descripcion) VALUES (%s, %s, %s, %s, %s, %s)',
                         (cliente_id, mes, año_actual, estado_pago, monto, descripcion)
                     )
+            
+            reconstruir_resumen_pagos(cursor)
         
         conn.commit()
         print("✅ Base de datos lista")
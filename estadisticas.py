@@ -0,0 +1,232 @@
+# sistema_contador/estadisticas.py
+"""
+Métricas del dashboard
+Se calculan en el servidor y se envían como JSON compacto; el navegador arma las tarjetas,
+listas y gráficos a partir de ese payload.
+
+Son cuatro consultas independientes que corren a la vez, cada una con su conexión del pool:
+- agregados: una sola pasada con SUM(CASE ...) sobre resumen_pagos y clientes
+- periodo: los meses del periodo elegido y del anterior, leídos de resumen_pagos por su clave
+  (año, mes); el costo depende del largo del periodo, no de cuánta historia haya
+- clientes_riesgo y clientes_rechazados: las dos listas
+
+Las listas de clientes van como {'columnas': [...], 'filas': [[...], ...]} para no repetir
+los nombres de campo en cada fila.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+from database import POOL_CONFIG, get_db_connection
+from periodos import meses_del_periodo, periodo_anterior, periodo_json, texto_mes
+
+# Consultas del dashboard a la vez (4 por petición). Cada hilo usa una conexión del pool mientras consulta,
+# así que DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW debe ser mayor que DASHBOARD_HILOS para dejar conexiones
+# al resto de la aplicación
+HILOS_DASHBOARD = int(os.getenv('DASHBOARD_HILOS', 8))
+
+if HILOS_DASHBOARD >= POOL_CONFIG['pool_size'] + POOL_CONFIG['max_overflow']:
+    print(f"⚠️ DASHBOARD_HILOS={HILOS_DASHBOARD} no deja conexiones libres: el pool admite "
+          f"{POOL_CONFIG['pool_size'] + POOL_CONFIG['max_overflow']} (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)")
+
+SQL_ESTADOS_CLIENTES = """
+    SELECT estado_actual, COUNT(*) as cantidad FROM clientes
+    WHERE apto_prestamo != 'No'
+    GROUP BY estado_actual
+    ORDER BY estado_actual
+"""
+
+SQL_CLIENTES_RIESGO = """
+    SELECT c.id, c.nombre, c.email, c.estado_actual,
+           COUNT(p.id) as total_pagos,
+           SUM(CASE WHEN p.estado = 'impago' THEN 1 ELSE 0 END) as total_impagos,
+           ROUND(SUM(CASE WHEN p.estado = 'impago' THEN p.monto ELSE 0 END), 2) as deuda_total
+    FROM clientes c
+    LEFT JOIN pagos p ON c.id = p.cliente_id
+    WHERE c.apto_prestamo != 'No'
+    GROUP BY c.id, c.nombre, c.email, c.estado_actual
+    HAVING total_impagos > 0 OR c.estado_actual = 'impago'
+    ORDER BY total_impagos DESC, deuda_total DESC
+    LIMIT 5
+"""
+
+SQL_CLIENTES_RECHAZADOS = """
+    SELECT c.id, c.nombre, c.email, c.telefono, c.estado_actual,
+           c.calificacion_crediticia as puntuacion,
+           SUM(CASE WHEN p.estado = 'impago' THEN p.monto ELSE 0 END) as deuda_total,
+           CASE
+               WHEN c.estado_actual = 'impago' THEN 'Impago permanente'
+               WHEN c.calificacion_crediticia < 30 THEN 'Muy alto riesgo'
+               WHEN c.estado_actual = 'retraso_grave' THEN 'Moroso crónico'
+               ELSE 'Incobrable'
+           END as razon_rechazo
+    FROM clientes c
+    LEFT JOIN pagos p ON c.id = p.cliente_id
+    WHERE c.apto_prestamo = 'No'
+    GROUP BY c.id, c.nombre, c.email, c.telefono, c.estado_actual, c.calificacion_crediticia
+    ORDER BY c.calificacion_crediticia ASC
+"""
+
+# Totales de pagos (desde el resumen año/mes/estado) y conteos de clientes por estado en una sola consulta.
+# El lado de pagos siempre devuelve una fila; el LEFT JOIN la repite por cada estado de cliente.
+SQL_AGREGADOS = """
+    SELECT r.*, c.estado_actual, c.aptos, c.rechazados
+    FROM (
+        SELECT COALESCE(SUM(monto), 0) as monto_total_cartera,
+               COALESCE(SUM(CASE WHEN estado IN ('retraso_leve', 'retraso_grave', 'impago') THEN monto END), 0) as monto_moroso,
+               COALESCE(SUM(CASE WHEN estado IN ('retraso_leve', 'retraso_grave') THEN cantidad END), 0) as pagos_retraso,
+               COALESCE(SUM(CASE WHEN estado = 'impago' THEN cantidad END), 0) as pagos_impago
+        FROM resumen_pagos
+    ) r
+    LEFT JOIN (
+        SELECT estado_actual,
+               SUM(CASE WHEN apto_prestamo != 'No' THEN 1 ELSE 0 END) as aptos,
+               SUM(CASE WHEN apto_prestamo = 'No' THEN 1 ELSE 0 END) as rechazados
+        FROM clientes
+        GROUP BY estado_actual
+    ) c ON 1 = 1
+    ORDER BY c.estado_actual
+"""
+
+# Meses de un rango: el filtro por año usa la clave primaria, el de año * 100 + mes recorta los extremos
+SQL_PERIODO = """
+    SELECT año, mes, estado, cantidad, monto
+    FROM resumen_pagos
+    WHERE año BETWEEN %s AND %s
+      AND año * 100 + mes BETWEEN %s AND %s
+"""
+
+_ejecutor = ThreadPoolExecutor(max_workers=HILOS_DASHBOARD, thread_name_prefix='dashboard')
+
+def _valor_json(valor):
+    """Decimal y fechas de MySQL a tipos JSON"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+def _tabla(filas):
+    """Filas de un cursor dictionary en formato columnas + filas"""
+    columnas = list(filas[0].keys()) if filas else []
+    return {
+        'columnas': columnas,
+        'filas': [[_valor_json(fila[columna]) for columna in columnas] for fila in filas]
+    }
+
+def _consultar(obtener_conexion, sql, params=()):
+    """
+    Ejecutar una consulta con su propia conexión del pool
+    Retorna: (filas, {'conexion': ms esperando la conexión, 'consulta': ms de ejecución y lectura})
+    """
+    inicio = time.perf_counter()
+    conn = obtener_conexion()
+    if not conn:
+        raise RuntimeError('No se pudo conectar a la base de datos')
+    conectado = time.perf_counter()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        conn.close()  # Devuelve la conexión al pool
+    fin = time.perf_counter()
+    return filas, {'conexion': (conectado - inicio) * 1000, 'consulta': (fin - conectado) * 1000}
+
+def _resumir_agregados(filas):
+    """Métricas de la consulta de agregados (una fila por estado de cliente)"""
+    pagos = filas[0]
+    # Sin clientes el LEFT JOIN deja una única fila con aptos NULL
+    clientes = [fila for fila in filas if fila['aptos'] is not None]
+    return {
+        'total_clientes': int(sum(fila['aptos'] for fila in clientes)),
+        'total_rechazados': int(sum(fila['rechazados'] for fila in clientes)),
+        'estados': {fila['estado_actual']: int(fila['aptos']) for fila in clientes if fila['aptos']},
+        'pagos_retraso': int(pagos['pagos_retraso']),
+        'pagos_impago': int(pagos['pagos_impago']),
+        'monto_moroso': round(float(pagos['monto_moroso']), 2),
+        'monto_total_cartera': round(float(pagos['monto_total_cartera']), 2)
+    }
+
+def _parametros_periodo(desde, hasta):
+    (año_desde, mes_desde), (año_hasta, mes_hasta) = desde, hasta
+    return (año_desde, año_hasta, año_desde * 100 + mes_desde, año_hasta * 100 + mes_hasta)
+
+def _resumir_periodo(filas, periodo):
+    """
+    Totales de un periodo a partir de las filas (año, mes, estado) del resumen
+    ingresos y pagos_al_dia son los pagos al día; 'meses' trae los ingresos de cada mes (0 si no hubo)
+    """
+    meses = meses_del_periodo(periodo)
+    incluidos = set(meses)
+    por_estado = {}
+    ingresos_por_mes = dict.fromkeys(meses, 0.0)
+    for fila in filas:
+        año_mes = (fila['año'], fila['mes'])
+        if año_mes not in incluidos:
+            continue
+        totales = por_estado.setdefault(fila['estado'], {'cantidad': 0, 'monto': 0.0})
+        totales['cantidad'] += int(fila['cantidad'])
+        totales['monto'] += float(fila['monto'])
+        if fila['estado'] == 'al_dia':
+            ingresos_por_mes[año_mes] += float(fila['monto'])
+
+    for totales in por_estado.values():
+        totales['monto'] = round(totales['monto'], 2)
+    al_dia = por_estado.get('al_dia', {'cantidad': 0, 'monto': 0.0})
+    return {
+        **periodo_json(periodo),
+        'ingresos': al_dia['monto'],
+        'pagos_al_dia': al_dia['cantidad'],
+        'por_estado': por_estado,
+        'meses': [[texto_mes(año_mes), round(monto, 2)] for año_mes, monto in ingresos_por_mes.items()]
+    }
+
+def calcular_estadisticas(periodo, obtener_conexion=get_db_connection):
+    """
+    Métricas del dashboard para un periodo (ver periodos.resolver_periodo), comparado con el anterior
+    Las cuatro consultas se lanzan juntas en el pool de hilos
+    Retorna: (dict serializable a JSON, tiempos en ms por consulta más 'total')
+    """
+    inicio = time.perf_counter()
+    anterior = periodo_anterior(periodo)
+    consultas = {
+        'agregados': (SQL_AGREGADOS, ()),
+        # El periodo anterior termina justo antes del elegido: una sola lectura cubre los dos
+        'periodo': (SQL_PERIODO, _parametros_periodo(anterior['desde'], periodo['hasta'])),
+        'clientes_riesgo': (SQL_CLIENTES_RIESGO, ()),
+        'clientes_rechazados': (SQL_CLIENTES_RECHAZADOS, ())
+    }
+    futuros = {
+        nombre: _ejecutor.submit(_consultar, obtener_conexion, sql, params)
+        for nombre, (sql, params) in consultas.items()
+    }
+
+    filas, tiempos = {}, {}
+    for nombre, futuro in futuros.items():
+        filas[nombre], tiempos[nombre] = futuro.result()
+    tiempos['total'] = (time.perf_counter() - inicio) * 1000
+
+    estadisticas = _resumir_agregados(filas['agregados'])
+    estadisticas['periodo'] = _resumir_periodo(filas['periodo'], periodo)
+    estadisticas['periodo_anterior'] = _resumir_periodo(filas['periodo'], anterior)
+    estadisticas['clientes_riesgo'] = _tabla(filas['clientes_riesgo'])
+    estadisticas['clientes_rechazados'] = _tabla(filas['clientes_rechazados'])
+    return estadisticas, tiempos
+
+def server_timing(tiempos):
+    """Cabecera Server-Timing: espera de conexión y consulta de cada una, y el total (camino crítico)"""
+    partes = []
+    for nombre, tiempo in tiempos.items():
+        if nombre == 'total':
+            partes.append(f'total;dur={tiempo:.1f}')
+        else:
+            partes.append(f'{nombre};dur={tiempo["consulta"]:.1f}')
+            partes.append(f'{nombre}-conexion;dur={tiempo["conexion"]:.1f}')
+    return ', '.join(partes)
@@ -4,15 +4,324 @@ Sistema de Evaluación de Crédito con IA
 Evalúa la aptitud de un cliente para acceder a un préstamo
 Método: Sistema de Análisis Financiero Automático (SAFA) + Markov Chain Analysis
 Moneda: Bolivianos (Bs.)
+
+Los umbrales, puntajes, pesos y mensajes salen de un conjunto de reglas (REGLAS_POR_DEFECTO,
+un archivo JSON o la tabla reglas_credito) que se compila una vez en tablas de búsqueda.
 """
 
+import bisect
+import copy
+import json
+import os
+import threading
+
+import numpy as np
+
+# Reglas de evaluación (mismo formato que el JSON de REGLAS_CREDITO_ARCHIVO y la tabla reglas_credito)
+# Cada factor por tramos: valor < umbrales[i] (o <= si umbral_incluido) -> puntajes[i]; por encima del último -> puntajes[-1]
+# Los mensajes y mejoras usan los mismos tramos salvo que mensajes_umbral_incluido diga otra cosa
+REGLAS_POR_DEFECTO = {
+    'version': 0,
+    'pesos': {
+        'ingresos': 0.35,
+        'deudas': 0.35,
+        'ratio': 0.20,
+        'historial': 0.10,
+        'propiedad': 0.10  # Propiedad como garantía
+    },
+    'ingresos': {
+        'umbrales': [1000, 2000, 3000, 5000],
+        'puntajes': [20, 40, 60, 80, 100],
+        'cero': 0,  # Sin ingresos
+        'mensajes': [
+            ['negativa', "❌ Ingresos insuficientes (< {maximo} Bs.). No hay capacidad de pago comprobada."],
+            ['negativa', "❌ Ingresos muy bajos (< {maximo} Bs.). Riesgo de incapacidad de pago."],
+            ['positiva', "⚠️ Ingresos moderados (≥ {minimo} Bs.). Hay capacidad de pago pero limitada."],
+            ['positiva', "✅ Ingresos buenos (≥ {minimo} Bs.). Capacidad de pago adecuada."],
+            ['positiva', "✅ Ingresos sólidos (≥ {minimo} Bs.). Capacidad fuerte de pago."]
+        ],
+        'mejora': {
+            'tramos': [0, 1, 2],
+            'texto': "💡 AUMENTAR INGRESOS: Busca fuentes adicionales de ingreso para mejorar capacidad de pago."
+        }
+    },
+    'deudas': {
+        'umbrales': [300, 600, 1000, 1500],
+        'puntajes': [90, 75, 50, 30, 10],
+        'cero': 100,  # Sin gastos de vivienda
+        'mensajes_umbral_incluido': True,  # El puntaje cambia en < 300; el mensaje dice "≤ 300"
+        'mensajes': [
+            ['positiva', "✅ Gastos bajos (≤ {maximo} Bs.). Mucho margen disponible para nuevas obligaciones."],
+            ['positiva', "✅ Gastos controlados (≤ {maximo} Bs.). Buen margen para asumir préstamo."],
+            ['positiva', "⚠️ Gastos moderados (≤ {maximo} Bs.). Margen disponible aceptable."],
+            ['negativa', "❌ Gastos altos (> {minimo} Bs.). Poco margen para nuevas obligaciones."],
+            ['negativa', "❌ Gastos muy altos (> {minimo} Bs.). NO hay margen para préstamo."]
+        ],
+        'mejora': {
+            'tramos': [3, 4],
+            'texto': "💡 REDUCIR GASTOS: Disminuir gastos de vivienda mejorará tu margen disponible."
+        }
+    },
+    'ratio': {
+        'umbrales': [0.25, 0.40, 0.60, 0.80],
+        'puntajes': [100, 80, 60, 40, 20],
+        'umbral_incluido': True,  # 0.40 (40%) es el máximo recomendado
+        'mensajes': [
+            ['positiva', "✅ Ratio excelente ({porcentaje:.1f}%). Puede asumir fácilmente un préstamo."],
+            ['positiva', "✅ Ratio adecuado ({porcentaje:.1f}%). Capacidad de pago comprobada."],
+            ['positiva', "⚠️ Ratio moderado ({porcentaje:.1f}%). Puede prestar pero con cautela."],
+            ['negativa', "❌ Ratio alto ({porcentaje:.1f}%). Muy poco margen para nuevas obligaciones."],
+            ['negativa', "❌ Ratio crítico ({porcentaje:.1f}%). NO tiene capacidad para asumir deuda."]
+        ],
+        'mejora': {
+            'tramos': [2, 3, 4],
+            'texto': "💡 MEJORAR RATIO: Reduce gastos o aumenta ingresos para llegar a ratio < 40%."
+        }
+    },
+    'historial': {
+        'puntajes': {
+            'al_dia': 100,
+            'retraso_leve': 60,
+            'retraso_grave': 30,
+            'impago': 0,
+            'pendiente': 50
+        },
+        'defecto': 50,
+        'mensajes': {
+            'al_dia': ['positiva', "✅ Historial perfecto. Cliente al día en todos sus compromisos."],
+            'retraso_leve': ['positiva', "⚠️ Historial con retrasos leves. Muestra capacidad pero con inconsistencias."],
+            'retraso_grave': ['negativa', "❌ Historial problemático. Retrasos graves indican incumplimiento habitual."],
+            'impago': ['negativa', "❌ Historial crítico. Deudas impagas demuestran falta de capacidad o disposición de pago."]
+        }
+    },
+    'propiedad': {
+        'con': 100,
+        'sin': 30,
+        # Los tramos de valor solo eligen el mensaje
+        'umbrales': [20000, 50000],
+        'umbral_incluido': False,
+        'mensajes': [
+            ['positiva', "⚠️ Propiedad registrada (Bs. {valor:,.2f}). Ayuda pero con valor limitado."],
+            ['positiva', "✅ Propiedad registrada (Bs. {valor:,.2f}). Reduce riesgo del préstamo."],
+            ['positiva', "✅ Propiedad valiosa (Bs. {valor:,.2f}). Garantía sólida para el préstamo."]
+        ],
+        'mejora_sin': "💡 SIN PROPIEDAD: Adquirir una propiedad mejoraría significativamente tu perfil crediticio."
+    },
+    # Aptitud por puntuación final: < 50 -> niveles[0], < 70 -> niveles[1], >= 70 -> niveles[2]
+    'aptitud': {
+        'umbrales': [50, 70],
+        'niveles': [
+            {'apto': "No ✗", 'riesgo': "Alto", 'color': "danger"},
+            {'apto': "Condicionado", 'riesgo': "Moderado", 'color': "warning"},
+            {'apto': "Sí ✓", 'riesgo': "Bajo", 'color': "success"}
+        ]
+    },
+    'veredicto': {
+        'apto': "🎉 APTO PARA PRÉSTAMO: Reunes todos los requisitos para acceder a financiamiento.",
+        'no_apto': "🚫 NO APTO PARA PRÉSTAMO: No reúnes los requisitos mínimos en este momento.",
+        'condicionado': "⏳ APTO CONDICIONADO: Puedes acceder a préstamo pero con limitaciones."
+    }
+}
+
+# Niveles de detalle de EvaluadorCredito.evaluar_cliente
+DETALLE_PUNTUACION = 'puntuacion'  # Puntuación y aptitud
+DETALLE_DESGLOSE = 'desglose'      # + detalle por factor y códigos de motivo (lo que se guarda)
+DETALLE_COMPLETO = 'completo'      # + recomendaciones en texto
+NIVELES_DETALLE = (DETALLE_PUNTUACION, DETALLE_DESGLOSE, DETALLE_COMPLETO)
+
+class ReglasInvalidasError(ValueError):
+    """El conjunto de reglas no tiene el formato esperado"""
+
+def _redondear(valores, decimales=2):
+    """
+    round() de Python aplicado a un array, con el mismo resultado que el camino escalar
+    np.round solo difiere cerca de los empates (...5), que se recalculan con round()
+    """
+    valores = np.asarray(valores, dtype=float)
+    resultado = np.round(valores, decimales)
+    escalados = valores * 10 ** decimales
+    with np.errstate(invalid='ignore'):
+        cerca_de_empate = np.abs(escalados - np.floor(escalados) - 0.5) <= 1e-9 * np.maximum(1.0, np.abs(escalados))
+    for i in np.flatnonzero(cerca_de_empate):
+        resultado[i] = round(float(valores[i]), decimales)
+    return resultado
+
+def _numero(valor):
+    """Umbral como texto para los mensajes (1000.0 -> '1000')"""
+    return str(int(valor)) if float(valor).is_integer() else str(valor)
+
+class Tramos:
+    """Factor por tramos compilado: umbrales ordenados y puntajes, consultados por búsqueda binaria"""
+    
+    def __init__(self, nombre, umbrales, puntajes=None, umbral_incluido=False, cero=None, mensajes=None,
+                 mensajes_incluido=None):
+        try:
+            self.umbrales = [float(u) for u in umbrales]
+            self.puntajes = [float(p) for p in puntajes] if puntajes is not None else None
+            self.cero = float(cero) if cero is not None else None
+        except (TypeError, ValueError):
+            raise ReglasInvalidasError(f"'{nombre}': umbrales y puntajes deben ser numéricos")
+        if any(a >= b for a, b in zip(self.umbrales, self.umbrales[1:])):
+            raise ReglasInvalidasError(f"'{nombre}': los umbrales deben ser estrictamente crecientes")
+        tramos = len(self.umbrales) + 1
+        if self.puntajes is not None and len(self.puntajes) != tramos:
+            raise ReglasInvalidasError(f"'{nombre}': se esperaban {tramos} puntajes")
+        if mensajes is not None and len(mensajes) != tramos:
+            raise ReglasInvalidasError(f"'{nombre}': se esperaban {tramos} mensajes")
+        
+        self.nombre = nombre
+        self.umbral_incluido = bool(umbral_incluido)
+        self.mensajes = [tuple(m) for m in mensajes] if mensajes is not None else None
+        self._buscar = bisect.bisect_left if self.umbral_incluido else bisect.bisect_right
+        self._lado = 'left' if self.umbral_incluido else 'right'
+        if mensajes_incluido is None:
+            mensajes_incluido = self.umbral_incluido
+        self._buscar_mensaje = bisect.bisect_left if mensajes_incluido else bisect.bisect_right
+        self.umbrales_array = np.array(self.umbrales)
+        self.puntajes_array = np.array(self.puntajes) if self.puntajes is not None else None
+    
+    def tramo(self, valor):
+        """Índice del tramo de un valor"""
+        return self._buscar(self.umbrales, valor)
+    
+    def tramo_mensaje(self, valor):
+        """Índice del tramo de mensaje (y de mejora) de un valor"""
+        return self._buscar_mensaje(self.umbrales, valor)
+    
+    def tramos(self, valores):
+        """Índices de tramo de un array de valores"""
+        return np.searchsorted(self.umbrales_array, valores, side=self._lado)
+    
+    def puntaje(self, valor):
+        if self.cero is not None and valor == 0:
+            return self._entero(self.cero)
+        return self._entero(self.puntajes[self.tramo(valor)])
+    
+    def puntajes_lote(self, valores):
+        puntajes = self.puntajes_array[self.tramos(valores)]
+        if self.cero is not None:
+            puntajes = np.where(valores == 0, self.cero, puntajes)
+        return puntajes
+    
+    def mensaje(self, indice, **valores):
+        """(tipo, texto) del tramo, con {minimo}/{maximo} del tramo y los valores dados"""
+        tipo, plantilla = self.mensajes[indice]
+        minimo = _numero(self.umbrales[indice - 1]) if indice > 0 else ''
+        maximo = _numero(self.umbrales[indice]) if indice < len(self.umbrales) else ''
+        return tipo, plantilla.format(minimo=minimo, maximo=maximo, **valores)
+    
+    @staticmethod
+    def _entero(valor):
+        return int(valor) if valor.is_integer() else valor
+
+class ReglasCredito:
+    """Conjunto de reglas compilado (inmutable una vez creado)"""
+    
+    FACTORES = ['ingresos', 'deudas', 'ratio', 'historial', 'propiedad']
+    
+    def __init__(self, definicion):
+        if not isinstance(definicion, dict):
+            raise ReglasInvalidasError('Las reglas deben ser un objeto JSON')
+        # Lo que falte se toma de las reglas por defecto
+        completa = copy.deepcopy(REGLAS_POR_DEFECTO)
+        completa.update(copy.deepcopy(definicion))
+        self.definicion = completa
+        self.version = completa.get('version', 0)
+        
+        try:
+            pesos = completa['pesos']
+            self.pesos = tuple(float(pesos[factor]) for factor in self.FACTORES)
+        except (KeyError, TypeError, ValueError):
+            raise ReglasInvalidasError(f"'pesos' debe tener un número para {', '.join(self.FACTORES)}")
+        
+        self.ingresos = self._tramos('ingresos')
+        self.deudas = self._tramos('deudas')
+        self.ratio = self._tramos('ratio')
+        self.mejoras = {
+            nombre: (set(completa[nombre]['mejora']['tramos']), completa[nombre]['mejora']['texto'])
+            for nombre in ['ingresos', 'deudas', 'ratio'] if completa[nombre].get('mejora')
+        }
+        
+        historial = completa['historial']
+        self.puntajes_historial = {estado: float(p) for estado, p in historial['puntajes'].items()}
+        self.puntaje_historial_defecto = float(historial.get('defecto', 50))
+        self.mensajes_historial = {estado: tuple(m) for estado, m in historial.get('mensajes', {}).items()}
+        
+        propiedad = completa['propiedad']
+        self.puntaje_con_propiedad = float(propiedad['con'])
+        self.puntaje_sin_propiedad = float(propiedad['sin'])
+        self.propiedad = Tramos('propiedad', propiedad.get('umbrales', []),
+                                umbral_incluido=propiedad.get('umbral_incluido', False),
+                                mensajes=propiedad.get('mensajes'))
+        self.mejora_sin_propiedad = propiedad.get('mejora_sin')
+        
+        aptitud = completa['aptitud']
+        self.aptitud = Tramos('aptitud', aptitud['umbrales'])
+        self.niveles = [(n['apto'], n['riesgo'], n['color']) for n in aptitud['niveles']]
+        if len(self.niveles) != len(self.aptitud.umbrales) + 1:
+            raise ReglasInvalidasError(f"'aptitud': se esperaban {len(self.aptitud.umbrales) + 1} niveles")
+        self.veredicto = completa['veredicto']
+    
+    def _tramos(self, nombre):
+        regla = self.definicion.get(nombre)
+        if not isinstance(regla, dict) or 'umbrales' not in regla or 'puntajes' not in regla:
+            raise ReglasInvalidasError(f"'{nombre}' debe tener umbrales y puntajes")
+        return Tramos(nombre, regla['umbrales'], regla['puntajes'],
+                      umbral_incluido=regla.get('umbral_incluido', False),
+                      cero=regla.get('cero'), mensajes=regla.get('mensajes'),
+                      mensajes_incluido=regla.get('mensajes_umbral_incluido'))
+    
+    @classmethod
+    def desde_json(cls, texto):
+        try:
+            return cls(json.loads(texto))
+        except json.JSONDecodeError as e:
+            raise ReglasInvalidasError(f'JSON inválido: {e}')
+    
+    @classmethod
+    def desde_registro(cls, version, definicion_json):
+        """Reglas guardadas en la tabla reglas_credito (la versión de la fila manda)"""
+        reglas = cls.desde_json(definicion_json)
+        if reglas.version != version:
+            reglas.definicion['version'] = reglas.version = version
+        return reglas
+    
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(ruta, encoding='utf-8') as f:
+            return cls.desde_json(f.read())
+    
+    def como_json(self):
+        return json.dumps(self.definicion, ensure_ascii=False)
+
+# Reglas activas del proceso: se reemplazan enteras (los evaluadores ya creados conservan las suyas)
+_reglas_activas = ReglasCredito(REGLAS_POR_DEFECTO)
+_reglas_lock = threading.Lock()
+
+def reglas_activas():
+    return _reglas_activas
+
+def activar_reglas(reglas):
+    """Activar un conjunto de reglas (ReglasCredito, dict o texto JSON); retorna el compilado"""
+    global _reglas_activas
+    if isinstance(reglas, str):
+        reglas = ReglasCredito.desde_json(reglas)
+    elif not isinstance(reglas, ReglasCredito):
+        reglas = ReglasCredito(reglas)
+    with _reglas_lock:
+        _reglas_activas = reglas
+    return reglas
+
+if os.getenv('REGLAS_CREDITO_ARCHIVO'):
+    activar_reglas(ReglasCredito.desde_archivo(os.getenv('REGLAS_CREDITO_ARCHIVO')))
+
 class EvaluadorCredito:
-    def __init__(self):
+    def __init__(self, reglas=None):
+        # Reglas compiladas (por defecto las activas al crear el evaluador)
+        self.reglas = reglas or reglas_activas()
+        
         # Pesos para cada factor de evaluación
-        self.peso_ingresos = 0.35
-        self.peso_deudas = 0.35
-        self.peso_ratio_deuda = 0.20
-        self.peso_historial = 0.10
+        self.peso_ingresos, self.peso_deudas, self.peso_ratio_deuda, self.peso_historial, self.peso_propiedad = self.reglas.pesos
     
     def calcular_ratio_deuda(self, ingresos_mensuales, gastos_mensuales):
         """
@@ -29,159 +338,143 @@ class EvaluadorCredito:
         """
         Evalúa la solidez de los ingresos (0-100)
         """
-        ingresos_totales = sueldo + otros_ingresos
-        
-        if ingresos_totales == 0:
-            return 0
-        elif ingresos_totales < 1000:
-            return 20
-        elif ingresos_totales < 2000:
-            return 40
-        elif ingresos_totales < 3000:
-            return 60
-        elif ingresos_totales < 5000:
-            return 80
-        else:
-            return 100
+        return self.reglas.ingresos.puntaje(sueldo + otros_ingresos)
     
     def evaluar_deudas(self, gastos_vivienda):
         """
         Evalúa la situación de deudas/gastos (0-100)
         Menor deuda = Mayor puntuación
         """
-        if gastos_vivienda == 0:
-            return 100
-        elif gastos_vivienda < 300:
-            return 90
-        elif gastos_vivienda < 600:
-            return 75
-        elif gastos_vivienda < 1000:
-            return 50
-        elif gastos_vivienda < 1500:
-            return 30
-        else:
-            return 10
+        return self.reglas.deudas.puntaje(gastos_vivienda)
     
     def evaluar_ratio_deuda(self, ratio):
         """
         Evalúa el ratio deuda/ingresos (0-100)
-        0.40 (40%) es el máximo recomendado
         """
-        if ratio <= 0.25:
-            return 100
-        elif ratio <= 0.40:
-            return 80
-        elif ratio <= 0.60:
-            return 60
-        elif ratio <= 0.80:
-            return 40
-        else:
-            return 20
+        return self.reglas.ratio.puntaje(ratio)
     
     def evaluar_historial_pagos(self, estado_actual):
         """
         Evalúa el historial de pagos basado en el estado actual (0-100)
         """
-        estado_scores = {
-            'al_dia': 100,
-            'retraso_leve': 60,
-            'retraso_grave': 30,
-            'impago': 0,
-            'pendiente': 50
-        }
-        return estado_scores.get(estado_actual, 50)
+        puntaje = self.reglas.puntajes_historial.get(estado_actual, self.reglas.puntaje_historial_defecto)
+        return Tramos._entero(puntaje)
     
-    def generar_recomendaciones(self, puntuacion, ingresos, gastos, ratio, tiene_propiedad, valor_propiedad, estado_actual):
+    def evaluar_propiedad(self, tiene_propiedad, valor_propiedad):
         """
-        Genera recomendaciones DETALLADAS basadas en cada aspecto de la evaluación
-        Explica POR QUÉ sí o por qué NO se puede prestar
+        Evalúa la propiedad como garantía (0-100)
         """
-        recomendaciones_positivas = []  # Por qué SÍ prestar
-        recomendaciones_negativas = []  # Por qué NO prestar
-        recomendaciones_mejora = []     # Cómo mejorar
-        
-        # ===== ANÁLISIS DE INGRESOS =====
-        if ingresos >= 5000:
-            recomendaciones_positivas.append("✅ Ingresos sólidos (≥ 5000 Bs.). Capacidad fuerte de pago.")
-        elif ingresos >= 3000:
-            recomendaciones_positivas.append("✅ Ingresos buenos (≥ 3000 Bs.). Capacidad de pago adecuada.")
-        elif ingresos >= 2000:
-            recomendaciones_positivas.append("⚠️ Ingresos moderados (≥ 2000 Bs.). Hay capacidad de pago pero limitada.")
-        elif ingresos >= 1000:
-            recomendaciones_negativas.append("❌ Ingresos muy bajos (< 2000 Bs.). Riesgo de incapacidad de pago.")
-        else:
-            recomendaciones_negativas.append("❌ Ingresos insuficientes (< 1000 Bs.). No hay capacidad de pago comprobada.")
-        
-        # ===== ANÁLISIS DE GASTOS =====
-        if gastos <= 300:
-            recomendaciones_positivas.append("✅ Gastos bajos (≤ 300 Bs.). Mucho margen disponible para nuevas obligaciones.")
-        elif gastos <= 600:
-            recomendaciones_positivas.append("✅ Gastos controlados (≤ 600 Bs.). Buen margen para asumir préstamo.")
-        elif gastos <= 1000:
-            recomendaciones_positivas.append("⚠️ Gastos moderados (≤ 1000 Bs.). Margen disponible aceptable.")
-        elif gastos <= 1500:
-            recomendaciones_negativas.append("❌ Gastos altos (> 1000 Bs.). Poco margen para nuevas obligaciones.")
-        else:
-            recomendaciones_negativas.append("❌ Gastos muy altos (> 1500 Bs.). NO hay margen para préstamo.")
-        
-        # ===== ANÁLISIS DE RATIO DEUDA/INGRESOS =====
-        ratio_porcentaje = ratio * 100
-        if ratio <= 0.25:
-            recomendaciones_positivas.append(f"✅ Ratio excelente ({ratio_porcentaje:.1f}%). Puede asumir fácilmente un préstamo.")
-        elif ratio <= 0.40:
-            recomendaciones_positivas.append(f"✅ Ratio adecuado ({ratio_porcentaje:.1f}%). Capacidad de pago comprobada.")
-        elif ratio <= 0.60:
-            recomendaciones_positivas.append(f"⚠️ Ratio moderado ({ratio_porcentaje:.1f}%). Puede prestar pero con cautela.")
-        elif ratio <= 0.80:
-            recomendaciones_negativas.append(f"❌ Ratio alto ({ratio_porcentaje:.1f}%). Muy poco margen para nuevas obligaciones.")
-        else:
-            recomendaciones_negativas.append(f"❌ Ratio crítico ({ratio_porcentaje:.1f}%). NO tiene capacidad para asumir deuda.")
+        if tiene_propiedad and valor_propiedad > 0:
+            return Tramos._entero(self.reglas.puntaje_con_propiedad)
+        return Tramos._entero(self.reglas.puntaje_sin_propiedad)
+    
+    def nivel_aptitud(self, puntuacion):
+        """(apto, riesgo, color) según la puntuación final"""
+        return self.reglas.niveles[self.reglas.aptitud.tramo(puntuacion)]
+    
+    def codigos_recomendacion(self, puntuacion, ingresos, gastos, ratio, tiene_propiedad, valor_propiedad, estado_actual):
+        """
+        Motivos de la evaluación como códigos compactos ('factor:tramo'), en el orden en que se muestran
+        Es lo único que se guarda; el texto se genera con renderizar_recomendaciones cuando hace falta
+        """
+        reglas = self.reglas
+        motivos = {
+            'positiva': [],  # Por qué SÍ prestar
+            'negativa': [],  # Por qué NO prestar
+        }
+        motivos_mejora = []  # Cómo mejorar
+        
+        # ===== ANÁLISIS DE INGRESOS, GASTOS Y RATIO DEUDA/INGRESOS =====
+        tramos = {
+            'ingresos': reglas.ingresos.tramo_mensaje(ingresos),
+            'deudas': reglas.deudas.tramo_mensaje(gastos),
+            'ratio': reglas.ratio.tramo_mensaje(ratio)
+        }
+        for nombre, indice in tramos.items():
+            factor = getattr(reglas, nombre)
+            if factor.mensajes:
+                motivos[factor.mensajes[indice][0]].append(f'{nombre}:{indice}')
         
         # ===== ANÁLISIS DE HISTORIAL DE PAGOS =====
-        if estado_actual == 'al_dia':
-            recomendaciones_positivas.append("✅ Historial perfecto. Cliente al día en todos sus compromisos.")
-        elif estado_actual == 'retraso_leve':
-            recomendaciones_positivas.append("⚠️ Historial con retrasos leves. Muestra capacidad pero con inconsistencias.")
-        elif estado_actual == 'retraso_grave':
-            recomendaciones_negativas.append("❌ Historial problemático. Retrasos graves indican incumplimiento habitual.")
-        elif estado_actual == 'impago':
-            recomendaciones_negativas.append("❌ Historial crítico. Deudas impagas demuestran falta de capacidad o disposición de pago.")
+        if estado_actual in reglas.mensajes_historial:
+            motivos[reglas.mensajes_historial[estado_actual][0]].append(f'historial:{estado_actual}')
         
         # ===== ANÁLISIS DE PROPIEDAD =====
         if tiene_propiedad and valor_propiedad > 0:
-            if valor_propiedad >= 50000:
-                recomendaciones_positivas.append(f"✅ Propiedad valiosa (Bs. {valor_propiedad:,.2f}). Garantía sólida para el préstamo.")
-            elif valor_propiedad >= 20000:
-                recomendaciones_positivas.append(f"✅ Propiedad registrada (Bs. {valor_propiedad:,.2f}). Reduce riesgo del préstamo.")
-            else:
-                recomendaciones_positivas.append(f"⚠️ Propiedad registrada (Bs. {valor_propiedad:,.2f}). Ayuda pero con valor limitado.")
-        else:
-            recomendaciones_mejora.append("💡 SIN PROPIEDAD: Adquirir una propiedad mejoraría significativamente tu perfil crediticio.")
+            if reglas.propiedad.mensajes:
+                indice = reglas.propiedad.tramo_mensaje(valor_propiedad)
+                motivos[reglas.propiedad.mensajes[indice][0]].append(f'propiedad:{indice}')
+        elif reglas.mejora_sin_propiedad:
+            motivos_mejora.append('mejora:propiedad')
         
         # ===== RECOMENDACIONES DE MEJORA =====
-        if ingresos < 3000:
-            recomendaciones_mejora.append("💡 AUMENTAR INGRESOS: Busca fuentes adicionales de ingreso para mejorar capacidad de pago.")
-        
-        if gastos > 1000:
-            recomendaciones_mejora.append("💡 REDUCIR GASTOS: Disminuir gastos de vivienda mejorará tu margen disponible.")
-        
-        if ratio > 0.40:
-            recomendaciones_mejora.append("💡 MEJORAR RATIO: Reduce gastos o aumenta ingresos para llegar a ratio < 40%.")
+        for nombre, indice in tramos.items():
+            if nombre in reglas.mejoras and indice in reglas.mejoras[nombre][0]:
+                motivos_mejora.append(f'mejora:{nombre}')
         
         # ===== VEREDICTO FINAL =====
-        if len(recomendaciones_negativas) == 0 and puntuacion >= 70:
-            recomendaciones_positivas.insert(0, "🎉 APTO PARA PRÉSTAMO: Reunes todos los requisitos para acceder a financiamiento.")
-        elif len(recomendaciones_negativas) > 0 and puntuacion < 50:
-            recomendaciones_negativas.insert(0, "🚫 NO APTO PARA PRÉSTAMO: No reúnes los requisitos mínimos en este momento.")
+        motivos_positivos = motivos['positiva']
+        motivos_negativos = motivos['negativa']
+        nivel = reglas.aptitud.tramo(puntuacion)
+        if len(motivos_negativos) == 0 and nivel == len(reglas.niveles) - 1:
+            motivos_positivos.insert(0, 'veredicto:apto')
+        elif len(motivos_negativos) > 0 and nivel == 0:
+            motivos_negativos.insert(0, 'veredicto:no_apto')
         else:
-            recomendaciones_positivas.insert(0, "⏳ APTO CONDICIONADO: Puedes acceder a préstamo pero con limitaciones.")
+            motivos_positivos.insert(0, 'veredicto:condicionado')
         
-        # Combinar todas las recomendaciones en orden
-        todas_las_recomendaciones = recomendaciones_positivas + recomendaciones_negativas + recomendaciones_mejora
-        
-        return todas_las_recomendaciones
+        # Combinar todos los motivos en orden
+        return motivos_positivos + motivos_negativos + motivos_mejora
+    
+    def renderizar_recomendaciones(self, codigos, porcentaje=0.0, valor_propiedad=0.0):
+        """
+        Texto de las recomendaciones a partir de los códigos de motivo
+        Los códigos que estas reglas no conocen (p. ej. de otra versión) se omiten
+        """
+        reglas = self.reglas
+        textos = []
+        for codigo in codigos:
+            factor, _, clave = codigo.partition(':')
+            try:
+                if factor in ('ingresos', 'deudas', 'ratio'):
+                    texto = getattr(reglas, factor).mensaje(int(clave), porcentaje=porcentaje)[1]
+                elif factor == 'historial':
+                    texto = reglas.mensajes_historial[clave][1]
+                elif factor == 'propiedad':
+                    texto = reglas.propiedad.mensaje(int(clave), valor=valor_propiedad)[1]
+                elif factor == 'mejora':
+                    texto = reglas.mejora_sin_propiedad if clave == 'propiedad' else reglas.mejoras[clave][1]
+                elif factor == 'veredicto':
+                    texto = reglas.veredicto[clave]
+                else:
+                    continue
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+            if texto:
+                textos.append(texto)
+        return textos
+    
+    def recomendaciones_de(self, evaluacion):
+        """Texto de las recomendaciones de una evaluación guardada (con 'motivos' y 'detalle')"""
+        detalle = evaluacion.get('detalle', {})
+        return self.renderizar_recomendaciones(
+            evaluacion.get('motivos', []),
+            porcentaje=detalle.get('ratio_deuda', 0.0),
+            valor_propiedad=detalle.get('valor_propiedad', 0.0)
+        )
+    
+    def generar_recomendaciones(self, puntuacion, ingresos, gastos, ratio, tiene_propiedad, valor_propiedad, estado_actual):
+        """
+        Genera recomendaciones DETALLADAS basadas en cada aspecto de la evaluación
+        Explica POR QUÉ sí o por qué NO se puede prestar
+        """
+        codigos = self.codigos_recomendacion(
+            puntuacion, ingresos, gastos, ratio, tiene_propiedad, valor_propiedad, estado_actual
+        )
+        return self.renderizar_recomendaciones(codigos, porcentaje=ratio * 100, valor_propiedad=valor_propiedad)
     
-    def evaluar_cliente(self, sueldo, otros_ingresos, gastos_vivienda, tiene_propiedad, valor_propiedad, estado_actual):
+    def evaluar_cliente(self, sueldo, otros_ingresos, gastos_vivienda, tiene_propiedad, valor_propiedad, estado_actual,
+                        detalle=DETALLE_COMPLETO):
         """
         Realiza evaluación integral del cliente
         Retorna: puntuación (0-100), apto (Sí/No), evaluación detallada
@@ -193,7 +486,12 @@ class EvaluadorCredito:
         - tiene_propiedad: Boolean - ¿Tiene casa/terreno/propiedad?
         - valor_propiedad: Valor de la propiedad en Bs. (0 si no tiene)
         - estado_actual: Estado de pagos actual del cliente
+        - detalle: 'puntuacion' (solo puntuación y aptitud), 'desglose' (+ detalle por factor y
+          códigos de motivo) o 'completo' (+ recomendaciones en texto, por defecto)
         """
+        if detalle not in NIVELES_DETALLE:
+            raise ValueError(f"detalle debe ser uno de: {', '.join(NIVELES_DETALLE)}")
+        
         # Calcular ingresos y gastos
         ingresos_mensuales = sueldo + otros_ingresos
         gastos_mensuales = gastos_vivienda
@@ -206,37 +504,35 @@ class EvaluadorCredito:
         score_historial = self.evaluar_historial_pagos(estado_actual)
         
         # Evaluar propiedad (es un factor de seguridad importante)
-        score_propiedad = 100 if tiene_propiedad and valor_propiedad > 0 else 30
+        score_propiedad = self.evaluar_propiedad(tiene_propiedad, valor_propiedad)
         
         # Calcular puntuación ponderada
-        # Agregamos el peso de la propiedad (10%)
         puntuacion_final = (
             score_ingresos * self.peso_ingresos +
             score_deudas * self.peso_deudas +
             score_ratio * self.peso_ratio_deuda +
             score_historial * self.peso_historial +
-            score_propiedad * 0.10  # 10% - Propiedad como garantía
+            score_propiedad * self.peso_propiedad
         )
         
         # Determinar apto para préstamo
-        if puntuacion_final >= 70:
-            apto = "Sí ✓"
-            riesgo = "Bajo"
-            color = "success"
-        elif puntuacion_final >= 50:
-            apto = "Condicionado"
-            riesgo = "Moderado"
-            color = "warning"
-        else:
-            apto = "No ✗"
-            riesgo = "Alto"
-            color = "danger"
-        
-        # Generar recomendaciones
-        recomendaciones = self.generar_recomendaciones(
-            puntuacion_final, 
-            ingresos_mensuales, 
-            gastos_mensuales, 
+        apto, riesgo, color = self.nivel_aptitud(puntuacion_final)
+        
+        evaluacion = {
+            'puntuacion_final': round(puntuacion_final, 2),
+            'apto_prestamo': apto,
+            'nivel_riesgo': riesgo,
+            'color': color,
+            'version_reglas': self.reglas.version
+        }
+        if detalle == DETALLE_PUNTUACION:
+            return evaluacion
+        
+        # Motivos de la evaluación (códigos; el texto solo se genera con detalle completo)
+        motivos = self.codigos_recomendacion(
+            puntuacion_final,
+            ingresos_mensuales,
+            gastos_mensuales,
             ratio_deuda,
             tiene_propiedad,
             valor_propiedad,
@@ -244,11 +540,7 @@ class EvaluadorCredito:
         )
         
         # Construir evaluación detallada
-        evaluacion = {
-            'puntuacion_final': round(puntuacion_final, 2),
-            'apto_prestamo': apto,
-            'nivel_riesgo': riesgo,
-            'color': color,
+        evaluacion.update({
             'tipo_ia': 'SAFA (Sistema de Análisis Financiero Automático) + Markov Chain',
             'moneda': 'Bs.',
             'detalle': {
@@ -263,8 +555,93 @@ class EvaluadorCredito:
                 'tiene_propiedad': tiene_propiedad,
                 'valor_propiedad': round(valor_propiedad, 2) if tiene_propiedad else 0
             },
-            'recomendaciones': recomendaciones,
+            'motivos': motivos,
             'margen_disponible': round(ingresos_mensuales - gastos_mensuales, 2)
-        }
+        })
         
+        if detalle == DETALLE_COMPLETO:
+            # Mismo texto que se obtiene después desde la evaluación guardada
+            evaluacion['recomendaciones'] = self.recomendaciones_de(evaluacion)
         return evaluacion
+    
+    def evaluar_lote(self, datos=None, **columnas):
+        """
+        Evalúa muchos clientes a la vez con operaciones vectorizadas
+        Produce los mismos valores que evaluar_cliente, sin recomendaciones
+        
+        Parámetros:
+        - datos: DataFrame de pandas o diccionario de columnas (opcional)
+        - columnas: arrays sueltos; tienen prioridad sobre las de datos
+        Columnas: sueldo, otros_ingresos, gastos_vivienda, tiene_propiedad, valor_propiedad, estado_actual
+        
+        Retorna: diccionario de arrays de NumPy (o DataFrame si se recibió un DataFrame)
+        """
+        reglas = self.reglas
+        fuente = {}
+        if datos is not None:
+            fuente.update({nombre: datos[nombre] for nombre in datos.keys()})
+        fuente.update(columnas)
+        
+        sueldo = np.asarray(fuente['sueldo'], dtype=float)
+        n = len(sueldo)
+        otros_ingresos = np.asarray(fuente.get('otros_ingresos', np.zeros(n)), dtype=float)
+        gastos_vivienda = np.asarray(fuente.get('gastos_vivienda', np.zeros(n)), dtype=float)
+        tiene_propiedad = np.asarray(fuente.get('tiene_propiedad', np.zeros(n, dtype=bool)), dtype=bool)
+        valor_propiedad = np.asarray(fuente.get('valor_propiedad', np.zeros(n)), dtype=float)
+        estado_actual = np.asarray(fuente.get('estado_actual', np.full(n, 'pendiente')), dtype=object)
+        
+        # Calcular ingresos y gastos
+        ingresos_mensuales = sueldo + otros_ingresos
+        gastos_mensuales = gastos_vivienda
+        
+        # Evaluar cada componente con búsqueda binaria sobre los tramos compilados
+        score_ingresos = reglas.ingresos.puntajes_lote(ingresos_mensuales)
+        score_deudas = reglas.deudas.puntajes_lote(gastos_vivienda)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio_deuda = np.where(
+                ingresos_mensuales <= 0, 1.0,
+                np.minimum(gastos_mensuales / ingresos_mensuales, 1.0)
+            )
+        score_ratio = reglas.ratio.puntajes_lote(ratio_deuda)
+        score_historial = np.select(
+            [estado_actual == estado for estado in reglas.puntajes_historial],
+            list(reglas.puntajes_historial.values()),
+            default=reglas.puntaje_historial_defecto
+        )
+        score_propiedad = np.where(
+            tiene_propiedad & (valor_propiedad > 0),
+            reglas.puntaje_con_propiedad, reglas.puntaje_sin_propiedad
+        )
+        
+        # Calcular puntuación ponderada (mismo orden de operaciones que evaluar_cliente)
+        puntuacion_final = (
+            score_ingresos * self.peso_ingresos +
+            score_deudas * self.peso_deudas +
+            score_ratio * self.peso_ratio_deuda +
+            score_historial * self.peso_historial +
+            score_propiedad * self.peso_propiedad
+        )
+        
+        # Determinar apto para préstamo
+        nivel = reglas.aptitud.tramos(puntuacion_final)
+        aptos, riesgos, colores = (np.array(columna, dtype=object) for columna in zip(*reglas.niveles))
+        
+        resultado = {
+            'puntuacion_final': _redondear(puntuacion_final),
+            'apto_prestamo': aptos[nivel],
+            'nivel_riesgo': riesgos[nivel],
+            'color': colores[nivel],
+            'ingresos_mensuales': _redondear(ingresos_mensuales),
+            'gastos_mensuales': _redondear(gastos_mensuales),
+            'ratio_deuda': _redondear(ratio_deuda * 100),
+            'score_ingresos': score_ingresos,
+            'score_deudas': score_deudas,
+            'score_ratio': score_ratio,
+            'score_historial': score_historial,
+            'score_propiedad': score_propiedad,
+            'margen_disponible': _redondear(ingresos_mensuales - gastos_mensuales)
+        }
+        
+        if hasattr(datos, 'columns'):
+            return type(datos)(resultado, index=datos.index)
+        return resultado
@@ -0,0 +1,283 @@
+# sistema_contador/exportacion.py
+"""
+Exportación masiva de pagos y clientes en CSV, NDJSON y Parquet
+Las consultas se leen por lotes con fetchmany y cada formato se serializa como un generador
+de bytes, así la respuesta se envía por partes y la memoria depende del lote, no del total.
+
+Las columnas booleanas salen como true/false en CSV y NDJSON (y como bool en Parquet).
+
+Parquet requiere pyarrow (dependencia opcional, ver requirements-opcional.txt): cada grupo de
+filas se arma a partir de RecordBatch de Arrow, sin pasar por pandas.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+FILAS_POR_GRUPO_PARQUET = int(os.getenv('EXPORTACION_GRUPO_PARQUET', 100_000))  # Filas por row group
+
+ESTADOS_VALIDOS = ('al_dia', 'retraso_leve', 'retraso_grave', 'impago')
+
+# Columnas exportadas por tabla: (nombre, tipo). Los tipos se traducen a CSV/JSON/Arrow más abajo.
+EXPORTACIONES = {
+    'pagos': {
+        'tabla': 'pagos',
+        'alias': 'p',
+        'columnas': [
+            ('id', 'entero'), ('cliente_id', 'entero'), ('año', 'entero'), ('mes', 'entero'),
+            ('estado', 'texto'), ('monto', 'decimal(10,2)'), ('descripcion', 'texto'),
+            ('fecha_pago', 'fecha_hora')
+        ],
+        'filtros': {
+            'estado': 'p.estado = %s',
+            'año': 'p.año = %s',
+            'mes': 'p.mes = %s',
+            'cliente': 'p.cliente_id = %s'
+        }
+    },
+    'clientes': {
+        'tabla': 'clientes',
+        'alias': 'c',
+        'columnas': [
+            ('id', 'entero'), ('nombre', 'texto'), ('email', 'texto'), ('telefono', 'texto'),
+            ('direccion', 'texto'), ('estado_actual', 'texto'), ('fecha_registro', 'fecha'),
+            ('sueldo', 'decimal(10,2)'), ('otros_ingresos', 'decimal(10,2)'), ('gastos_vivienda', 'decimal(10,2)'),
+            ('tiene_propiedad', 'booleano'), ('valor_propiedad', 'decimal(12,2)'), ('apto_prestamo', 'texto'),
+            ('calificacion_crediticia', 'decimal(3,1)'), ('fecha_evaluacion', 'fecha_hora'),
+            ('notas', 'texto'), ('monto_solicitado', 'decimal(12,2)')
+        ],
+        # En clientes, año y mes se refieren a la fecha de registro
+        'filtros': {
+            'estado': 'c.estado_actual = %s',
+            'año': 'YEAR(c.fecha_registro) = %s',
+            'mes': 'MONTH(c.fecha_registro) = %s',
+            'cliente': 'c.id = %s'
+        }
+    }
+}
+
+class FormatoNoDisponibleError(Exception):
+    """El formato pedido necesita una dependencia que no está instalada"""
+
+def validar_filtros(parametros):
+    """
+    Filtros de exportación a partir de los parámetros de la petición (estado, año, mes, cliente)
+    Retorna: diccionario solo con los filtros presentes; ValueError si alguno no es válido
+    """
+    filtros = {}
+    estado = parametros.get('estado')
+    if estado:
+        if estado not in ESTADOS_VALIDOS:
+            raise ValueError(f"Estado no válido: {estado}")
+        filtros['estado'] = estado
+
+    for nombre in ('año', 'mes', 'cliente'):
+        valor = parametros.get(nombre)
+        if valor in (None, ''):
+            continue
+        try:
+            filtros[nombre] = int(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"El filtro '{nombre}' debe ser un número entero")
+
+    if 'mes' in filtros and not 1 <= filtros['mes'] <= 12:
+        raise ValueError("El mes debe estar entre 1 y 12")
+    return filtros
+
+def consulta_exportacion(recurso, filtros):
+    """SQL y parámetros de la exportación, ordenada por id para leer siguiendo la clave primaria"""
+    spec = EXPORTACIONES[recurso]
+    alias = spec['alias']
+    columnas = ', '.join(f"{alias}.{nombre}" for nombre, _ in spec['columnas'])
+
+    condiciones = []
+    parametros = []
+    for nombre, valor in filtros.items():
+        condiciones.append(spec['filtros'][nombre])
+        parametros.append(valor)
+
+    sql = f"SELECT {columnas} FROM {spec['tabla']} {alias}"
+    if condiciones:
+        sql += " WHERE " + " AND ".join(condiciones)
+    sql += f" ORDER BY {alias}.id"
+    return sql, tuple(parametros)
+
+def leer_por_lotes(cursor, tamano):
+    """Generador de listas de filas leídas con fetchmany"""
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            return
+        yield filas
+
+def _indices_booleanos(columnas):
+    return [i for i, (_, tipo) in enumerate(columnas) if tipo == 'booleano']
+
+def _como_booleanos(filas, indices):
+    """MySQL devuelve BOOLEAN como 0/1: convertir esas columnas a bool"""
+    if not indices:
+        return filas
+    convertidas = []
+    for fila in filas:
+        fila = list(fila)
+        for i in indices:
+            if fila[i] is not None:
+                fila[i] = bool(fila[i])
+        convertidas.append(fila)
+    return convertidas
+
+def _como_texto_booleano(filas, indices):
+    """Booleanos de CSV con el mismo texto que JSON: true/false"""
+    if not indices:
+        return filas
+    convertidas = []
+    for fila in filas:
+        fila = list(fila)
+        for i in indices:
+            if fila[i] is not None:
+                fila[i] = 'true' if fila[i] else 'false'
+        convertidas.append(fila)
+    return convertidas
+
+def exportar_csv(columnas, lotes):
+    """CSV con encabezado, un bloque de bytes por lote"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([nombre for nombre, _ in columnas])
+    yield buffer.getvalue().encode('utf-8')
+
+    booleanos = _indices_booleanos(columnas)
+    for filas in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_como_texto_booleano(filas, booleanos))
+        yield buffer.getvalue().encode('utf-8')
+
+def _valor_json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+def exportar_ndjson(columnas, lotes):
+    """Un objeto JSON por línea, un bloque de bytes por lote"""
+    nombres = [nombre for nombre, _ in columnas]
+    booleanos = _indices_booleanos(columnas)
+    for filas in lotes:
+        lineas = [
+            json.dumps(dict(zip(nombres, fila)), ensure_ascii=False, default=_valor_json)
+            for fila in _como_booleanos(filas, booleanos)
+        ]
+        lineas.append('')
+        yield '\n'.join(lineas).encode('utf-8')
+
+def _pyarrow():
+    """Importar pyarrow solo cuando se pide Parquet"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise FormatoNoDisponibleError("El formato parquet requiere pyarrow (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+def esquema_arrow(columnas):
+    """Esquema de Arrow para las columnas de EXPORTACIONES"""
+    pa, _ = _pyarrow()
+    campos = []
+    for nombre, tipo in columnas:
+        if tipo == 'entero':
+            tipo_arrow = pa.int64()
+        elif tipo == 'booleano':
+            tipo_arrow = pa.bool_()
+        elif tipo == 'fecha':
+            tipo_arrow = pa.date32()
+        elif tipo == 'fecha_hora':
+            tipo_arrow = pa.timestamp('s')
+        elif tipo.startswith('decimal('):
+            precision, escala = (int(parte) for parte in tipo[len('decimal('):-1].split(','))
+            tipo_arrow = pa.decimal128(precision, escala)
+        else:
+            tipo_arrow = pa.string()
+        campos.append(pa.field(nombre, tipo_arrow))
+    return pa.schema(campos)
+
+class _SalidaPorPartes:
+    """Archivo de solo escritura que acumula lo escrito hasta que se retira con vaciar()"""
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+def exportar_parquet(columnas, lotes, filas_por_grupo=FILAS_POR_GRUPO_PARQUET):
+    """
+    Parquet escrito por grupos de filas: los lotes se convierten en RecordBatch y, al juntar
+    filas_por_grupo filas, se escriben como un row group y se envían sus bytes
+    """
+    pa, pq = _pyarrow()
+    esquema = esquema_arrow(columnas)
+    booleanos = _indices_booleanos(columnas)
+    salida = _SalidaPorPartes()
+    writer = pq.ParquetWriter(salida, esquema, compression='snappy')
+
+    def escribir_grupo(batches):
+        tabla = pa.Table.from_batches(batches, schema=esquema)
+        writer.write_table(tabla, row_group_size=tabla.num_rows)
+
+    pendientes = []
+    filas_pendientes = 0
+    for filas in lotes:
+        valores = list(zip(*_como_booleanos(filas, booleanos)))
+        pendientes.append(pa.RecordBatch.from_arrays(
+            [pa.array(columna, type=campo.type) for columna, campo in zip(valores, esquema)],
+            schema=esquema
+        ))
+        filas_pendientes += len(filas)
+        if filas_pendientes >= filas_por_grupo:
+            escribir_grupo(pendientes)
+            pendientes = []
+            filas_pendientes = 0
+            yield salida.vaciar()
+
+    if pendientes:
+        escribir_grupo(pendientes)
+    writer.close()
+    yield salida.vaciar()
+
+# formato -> (serializador, mimetype, extensión)
+FORMATOS = {
+    'csv': (exportar_csv, 'text/csv', 'csv'),
+    'ndjson': (exportar_ndjson, 'application/x-ndjson', 'ndjson'),
+    'parquet': (exportar_parquet, 'application/vnd.apache.parquet', 'parquet'),
+}
+
+def verificar_formato(formato):
+    """ValueError si el formato no existe; FormatoNoDisponibleError si falta su dependencia"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no válido: {formato} (use {', '.join(FORMATOS)})")
+    if formato == 'parquet':
+        _pyarrow()
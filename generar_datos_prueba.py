@@ -0,0 +1,247 @@
+# sistema_contador/generar_datos_prueba.py
+"""
+Generador de datos sintéticos para pruebas de carga
+Produce clientes y pagos con el mismo comportamiento por estado que los datos de ejemplo
+(COMPORTAMIENTO_PAGOS en database.py), de forma determinista a partir de una semilla.
+
+Uso:
+    python generar_datos_prueba.py --escala 1 --formato db        # 10.000 clientes directo a MySQL
+    python generar_datos_prueba.py --escala 100 --formato csv     # 1.000.000 clientes en CSV
+    python generar_datos_prueba.py --clientes 50000 --meses 24 --semilla 7
+"""
+
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from database import COMPORTAMIENTO_PAGOS, MONTOS_BASE, get_db_connection, reconstruir_resumen_pagos
+from database import marcar_datos_modificados
+
+ESTADOS = ['al_dia', 'retraso_leve', 'retraso_grave', 'impago']
+
+# Distribución de estados de cliente (la misma proporción que los 10 clientes de ejemplo)
+DISTRIBUCION_CLIENTES = [0.5, 0.2, 0.2, 0.1]
+
+CLIENTES_POR_ESCALA = 10_000
+CLIENTES_POR_BLOQUE = 50_000  # Fijo: cada bloque usa su propia semilla derivada
+
+COLUMNAS_CLIENTES = [
+    'id', 'nombre', 'email', 'estado_actual', 'sueldo', 'otros_ingresos',
+    'gastos_vivienda', 'tiene_propiedad', 'valor_propiedad', 'monto_solicitado'
+]
+COLUMNAS_PAGOS = ['cliente_id', 'mes', 'año', 'estado', 'monto', 'descripcion']
+
+def _matriz_acumulada():
+    """Probabilidades acumuladas (estado cliente x estado pago) desde COMPORTAMIENTO_PAGOS"""
+    matriz = np.zeros((len(ESTADOS), len(ESTADOS)))
+    for i, estado in enumerate(ESTADOS):
+        for estado_pago, probabilidad in COMPORTAMIENTO_PAGOS[estado]:
+            matriz[i, ESTADOS.index(estado_pago)] = probabilidad
+    acumulada = np.cumsum(matriz, axis=1)
+    acumulada[:, -1] = 1.0  # Evitar huecos por redondeo
+    return acumulada
+
+def generar_bloque(indice, id_inicial, cantidad, meses, año_inicio, semilla):
+    """
+    Generar un bloque de clientes y sus pagos como arrays de NumPy
+    El resultado depende solo de (semilla, indice), no del orden de ejecución
+    """
+    rng = np.random.default_rng([semilla, indice])
+    ids = np.arange(id_inicial, id_inicial + cantidad, dtype=np.int64)
+
+    # Clientes
+    estado_cliente = rng.choice(len(ESTADOS), size=cantidad, p=DISTRIBUCION_CLIENTES)
+    sueldo = np.round(rng.uniform(800, 8000, cantidad), 2)
+    otros_ingresos = np.where(rng.random(cantidad) < 0.3, np.round(rng.uniform(100, 1500, cantidad), 2), 0.0)
+    gastos_vivienda = np.round(rng.uniform(0, 2000, cantidad), 2)
+    tiene_propiedad = rng.random(cantidad) < 0.3
+    valor_propiedad = np.where(tiene_propiedad, np.round(rng.uniform(10_000, 150_000, cantidad), 2), 0.0)
+    monto_solicitado = np.round(rng.uniform(1_000, 50_000, cantidad), 2)
+
+    clientes = {
+        'id': ids,
+        'estado_actual': estado_cliente,
+        'sueldo': sueldo,
+        'otros_ingresos': otros_ingresos,
+        'gastos_vivienda': gastos_vivienda,
+        'tiene_propiedad': tiene_propiedad,
+        'valor_propiedad': valor_propiedad,
+        'monto_solicitado': monto_solicitado
+    }
+
+    # Pagos: una fila por cliente y mes, estado muestreado según el estado del cliente
+    periodo = np.arange(meses)
+    mes = (periodo % 12) + 1
+    año = año_inicio + periodo // 12
+
+    acumulada = _matriz_acumulada()[estado_cliente]           # (cantidad, 4)
+    u = rng.random((cantidad, meses))
+    estado_pago = (u[:, :, None] >= acumulada[:, None, :]).sum(axis=2)
+
+    base = np.asarray(MONTOS_BASE, dtype=float)[mes - 1]
+    monto = np.round(base[None, :] * rng.uniform(0.9, 1.1, (cantidad, meses)), 2)
+
+    pagos = {
+        'cliente_id': np.repeat(ids, meses),
+        'mes': np.tile(mes, cantidad),
+        'año': np.tile(año, cantidad),
+        'estado': estado_pago.ravel(),
+        'monto': monto.ravel()
+    }
+    return clientes, pagos
+
+def _filas_clientes(clientes):
+    ids = clientes['id'].tolist()
+    return [
+        (i, f'Cliente {i}', f'cliente{i}@email.com', ESTADOS[e], s, o, g, int(t), v, m)
+        for i, e, s, o, g, t, v, m in zip(
+            ids,
+            clientes['estado_actual'].tolist(),
+            clientes['sueldo'].tolist(),
+            clientes['otros_ingresos'].tolist(),
+            clientes['gastos_vivienda'].tolist(),
+            clientes['tiene_propiedad'].tolist(),
+            clientes['valor_propiedad'].tolist(),
+            clientes['monto_solicitado'].tolist()
+        )
+    ]
+
+def _filas_pagos(pagos):
+    return [
+        (c, m, a, ESTADOS[e], monto, f'Pago mensual {m}/{a}')
+        for c, m, a, e, monto in zip(
+            pagos['cliente_id'].tolist(),
+            pagos['mes'].tolist(),
+            pagos['año'].tolist(),
+            pagos['estado'].tolist(),
+            pagos['monto'].tolist()
+        )
+    ]
+
+def _bloques(total_clientes, id_inicial, meses, año_inicio, semilla):
+    for indice, desplazamiento in enumerate(range(0, total_clientes, CLIENTES_POR_BLOQUE)):
+        cantidad = min(CLIENTES_POR_BLOQUE, total_clientes - desplazamiento)
+        yield generar_bloque(indice, id_inicial + desplazamiento, cantidad, meses, año_inicio, semilla)
+
+def escribir_csv(directorio, total_clientes, id_inicial, meses, año_inicio, semilla):
+    """Escribir clientes.csv y pagos.csv listos para LOAD DATA INFILE"""
+    os.makedirs(directorio, exist_ok=True)
+    ruta_clientes = os.path.join(directorio, 'clientes.csv')
+    ruta_pagos = os.path.join(directorio, 'pagos.csv')
+    total_pagos = 0
+
+    with open(ruta_clientes, 'w', newline='', encoding='utf-8') as f_clientes, \
+         open(ruta_pagos, 'w', newline='', encoding='utf-8') as f_pagos:
+        w_clientes = csv.writer(f_clientes)
+        w_pagos = csv.writer(f_pagos)
+
+        for clientes, pagos in _bloques(total_clientes, id_inicial, meses, año_inicio, semilla):
+            w_clientes.writerows(_filas_clientes(clientes))
+            filas = _filas_pagos(pagos)
+            w_pagos.writerows(filas)
+            total_pagos += len(filas)
+
+    print(f"✅ {ruta_clientes} ({total_clientes:,} clientes)")
+    print(f"✅ {ruta_pagos} ({total_pagos:,} pagos)")
+    print("\n📥 Carga en MySQL:")
+    print(f"  LOAD DATA LOCAL INFILE '{os.path.abspath(ruta_clientes)}' INTO TABLE clientes")
+    print("    CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'")
+    print(f"    ({', '.join(COLUMNAS_CLIENTES)});")
+    print(f"  LOAD DATA LOCAL INFILE '{os.path.abspath(ruta_pagos)}' INTO TABLE pagos")
+    print("    CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'")
+    print(f"    ({', '.join(COLUMNAS_PAGOS)});")
+    print("  Luego: flask --app app reconstruir-resumen")
+    return total_pagos
+
+def escribir_db(total_clientes, id_inicial, meses, año_inicio, semilla, lote):
+    """Insertar directamente en MySQL con executemany, una transacción por bloque"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('No se pudo conectar a la base de datos')
+
+    cursor = conn.cursor()
+    sql_clientes = (
+        f"INSERT INTO clientes ({', '.join(COLUMNAS_CLIENTES)}) "
+        f"VALUES ({', '.join(['%s'] * len(COLUMNAS_CLIENTES))})"
+    )
+    sql_pagos = (
+        f"INSERT INTO pagos ({', '.join(COLUMNAS_PAGOS)}) "
+        f"VALUES ({', '.join(['%s'] * len(COLUMNAS_PAGOS))})"
+    )
+    total_pagos = 0
+
+    try:
+        for clientes, pagos in _bloques(total_clientes, id_inicial, meses, año_inicio, semilla):
+            filas_clientes = _filas_clientes(clientes)
+            for i in range(0, len(filas_clientes), lote):
+                cursor.executemany(sql_clientes, filas_clientes[i:i + lote])
+
+            filas_pagos = _filas_pagos(pagos)
+            for i in range(0, len(filas_pagos), lote):
+                cursor.executemany(sql_pagos, filas_pagos[i:i + lote])
+
+            conn.commit()
+            total_pagos += len(filas_pagos)
+            print(f"  ... {int(clientes['id'][-1]) - id_inicial + 1:,} clientes, {total_pagos:,} pagos")
+
+        print("🔄 Reconstruyendo resumen_pagos...")
+        reconstruir_resumen_pagos(cursor)
+        marcar_datos_modificados(cursor)
+        conn.commit()
+        return total_pagos
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def siguiente_id_cliente():
+    """Primer id libre en clientes (los ids se asignan explícitamente)"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('No se pudo conectar a la base de datos')
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM clientes")
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar clientes y pagos sintéticos para pruebas de carga')
+    parser.add_argument('--escala', type=float, default=1.0,
+                        help=f'Factor de escala: clientes = {CLIENTES_POR_ESCALA:,} x escala (por defecto 1)')
+    parser.add_argument('--clientes', type=int, help='Cantidad exacta de clientes (ignora --escala)')
+    parser.add_argument('--meses', type=int, default=12, help='Pagos mensuales por cliente (por defecto 12)')
+    parser.add_argument('--año-inicio', dest='año_inicio', type=int, default=2024, help='Año del primer pago')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla para resultados reproducibles')
+    parser.add_argument('--formato', choices=['db', 'csv'], default='db', help='Destino de los datos')
+    parser.add_argument('--directorio', default='datos_prueba', help='Carpeta de salida para --formato csv')
+    parser.add_argument('--lote', type=int, default=5_000, help='Filas por executemany en --formato db')
+    parser.add_argument('--id-inicial', dest='id_inicial', type=int,
+                        help='Primer id de cliente (por defecto MAX(id)+1 en db, 1 en csv)')
+    args = parser.parse_args()
+
+    total_clientes = args.clientes if args.clientes is not None else int(CLIENTES_POR_ESCALA * args.escala)
+    inicio = time.perf_counter()
+
+    print(f"📝 Generando {total_clientes:,} clientes x {args.meses} meses (semilla {args.semilla})...")
+    if args.formato == 'csv':
+        id_inicial = args.id_inicial or 1
+        total_pagos = escribir_csv(args.directorio, total_clientes, id_inicial,
+                                   args.meses, args.año_inicio, args.semilla)
+    else:
+        id_inicial = args.id_inicial or siguiente_id_cliente()
+        total_pagos = escribir_db(total_clientes, id_inicial, args.meses,
+                                  args.año_inicio, args.semilla, args.lote)
+
+    segundos = time.perf_counter() - inicio
+    print(f"✅ {total_clientes:,} clientes y {total_pagos:,} pagos en {segundos:.1f}s "
+          f"({(total_clientes + total_pagos) / max(segundos, 1e-9):,.0f} filas/s)")
+
+if __name__ == '__main__':
+    main()
@@ -1,261 +1,22 @@
 """
 Script para generar un informe en Excel sobre análisis de librerías del proyecto
-Autor: GitHub Copilot
-Fecha: 11 de noviembre de 2025
+Los datos salen de analisis_dependencias.py: imports encontrados en las fuentes, versiones
+instaladas frente a requirements.txt y tiempos/memoria de import medidos en un intérprete limpio.
 """
 
+import argparse
+import os
+
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
-from datetime import datetime
-
-# Datos de librerías analizadas
-librerias_info = {
-    'Flask': {
-        'version': '3.1.2',
-        'usado_en': ['app.py'],
-        'uso': 'Framework web (rutas, templates, request/response, g)',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Es el core de la aplicación web.',
-        'instalado': 'Sí',
-        'warning': 'No'
-    },
-    'pandas': {
-        'version': '2.3.3',
-        'usado_en': ['app.py'],
-        'uso': 'Análisis de datos, lectura SQL a DataFrame (pd.read_sql)',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Usada para procesar datos históricos.',
-        'instalado': 'Sí',
-        'warning': 'No'
-    },
-    'numpy': {
-        'version': '2.3.4',
-        'usado_en': ['modelos_ia.py'],
-        'uso': 'Importado pero no utilizado explícitamente',
-        'estado': '⚠ Opcional',
-        'riesgo': 'Bajo (sin uso actual)',
-        'recomendacion': 'Considerar eliminar si no se usa. Si piensas vectorizar cálculos ML, mantener.',
-        'instalado': 'Sí',
-        'warning': 'Posible - no usado'
-    },
-    'scikit-learn': {
-        'version': '1.7.2',
-        'usado_en': ['modelos_ia.py'],
-        'uso': 'RandomForestClassifier para predicción ML (PredictorML)',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Usada en clase PredictorML.',
-        'instalado': 'Sí',
-        'warning': 'No'
-    },
-    'mysql-connector-python': {
-        'version': '9.5.0',
-        'usado_en': ['database.py'],
-        'uso': 'Conexión a base de datos MySQL (get_db_connection, init_database)',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Esencial para BD.',
-        'instalado': 'Sí',
-        'warning': 'No'
-    },
-    'matplotlib': {
-        'version': '3.10.7',
-        'usado_en': ['app.py'],
-        'uso': 'Generación de gráficos PNG embebidos en templates',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Usada en generar_grafico_estados().',
-        'instalado': 'Sí',
-        'warning': 'No'
-    },
-    'python-dotenv': {
-        'version': '1.2.1',
-        'usado_en': ['app.py', 'database.py'],
-        'uso': 'Cargar variables de entorno (.env) para configuración',
-        'estado': '✓ Necesaria',
-        'riesgo': 'Bajo',
-        'recomendacion': 'Mantener. Esencial para seguridad (DB creds, SECRET_KEY).',
-        'instalado': 'Sí',
-        'warning': 'No'
-    }
-}
 
-# Warnings detectados y resueltos
-warnings_resueltos = [
-    {
-        'archivo': 'database.py',
-        'linea': 4,
-        'import': 'from dotenv import load_dotenv',
-        'problema': 'Import en amarillo - librería no instalada en .venv',
-        'solucion': 'Instalar python-dotenv==1.2.1',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install python-dotenv'
-    },
-    {
-        'archivo': 'app.py',
-        'linea': 1,
-        'import': 'from flask import Flask, render_template, ...',
-        'problema': 'Imports en amarillo - Flask no instalado en .venv',
-        'solucion': 'Instalar Flask==3.1.2',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install Flask'
-    },
-    {
-        'archivo': 'app.py',
-        'linea': 6,
-        'import': 'import pandas as pd',
-        'problema': 'Import en amarillo - pandas no instalado en .venv',
-        'solucion': 'Instalar pandas==2.3.3',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install pandas'
-    },
-    {
-        'archivo': 'app.py',
-        'linea': 7,
-        'import': 'import matplotlib.pyplot as plt',
-        'problema': 'Import en amarillo - matplotlib no instalado en .venv',
-        'solucion': 'Instalar matplotlib==3.10.7',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install matplotlib'
-    },
-    {
-        'archivo': 'modelos_ia.py',
-        'linea': 1,
-        'import': 'import numpy as np',
-        'problema': 'Import en amarillo - numpy no instalado en .venv',
-        'solucion': 'Instalar numpy==2.3.4',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install numpy'
-    },
-    {
-        'archivo': 'modelos_ia.py',
-        'linea': 2,
-        'import': 'from sklearn.ensemble import RandomForestClassifier',
-        'problema': 'Import en amarillo - scikit-learn no instalado en .venv',
-        'solucion': 'Instalar scikit-learn==1.7.2',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install scikit-learn'
-    },
-    {
-        'archivo': 'database.py',
-        'linea': 1,
-        'import': 'import mysql.connector',
-        'problema': 'Import en amarillo - mysql-connector-python no instalado en .venv',
-        'solucion': 'Instalar mysql-connector-python==9.5.0',
-        'estado': '✓ RESUELTO',
-        'accion_tomada': 'pip install mysql-connector-python'
-    }
-]
-
-# Problemas encontrados
-problemas = [
-    {
-        'tipo': 'Incompatibilidad',
-        'archivo': 'test_evaluacion.py',
-        'linea': '23, 38, 50',
-        'descripcion': 'Llamadas a evaluar_cliente() con parámetro "otras_deudas" que no existe en la firma',
-        'severidad': 'ALTA',
-        'impacto': 'El test falla al ejecutarse (TypeError)',
-        'solucion': 'Remover parámetro "otras_deudas" de las llamadas o extender firma del método'
-    },
-    {
-        'tipo': 'Versiones no fijadas',
-        'archivo': 'requirements.txt',
-        'linea': 'Todas',
-        'descripcion': 'Archivo original sin versiones especificadas - instalaciones no reproducibles',
-        'severidad': 'MEDIA',
-        'impacto': 'Posibles breaking changes entre versiones',
-        'solucion': 'Fijar versiones (completado: pip freeze > requirements.txt)'
-    },
-    {
-        'tipo': 'Dependencia no usada',
-        'archivo': 'modelos_ia.py',
-        'linea': 1,
-        'descripcion': 'numpy importado pero no utilizado en el código',
-        'severidad': 'BAJA',
-        'impacto': 'Peso innecesario en instalación (~50MB)',
-        'solucion': 'Eliminar "import numpy as np" si no se planea usar; o usar explícitamente'
-    }
-]
+from analisis_dependencias import DIRECTORIO_PROYECTO, analizar_proyecto, hallazgos
 
-# Recomendaciones
-recomendaciones = [
-    {
-        'prioridad': 'CRÍTICA',
-        'area': 'Testing',
-        'descripcion': 'Corregir test_evaluacion.py: remover parámetro "otras_deudas" no existente',
-        'pasos': [
-            '1. Abrir test_evaluacion.py',
-            '2. Buscar todas las llamadas a evaluar_cliente()',
-            '3. Remover "otras_deudas=..." de los 3 test cases',
-            '4. Ejecutar: python test_evaluacion.py'
-        ],
-        'tiempo_estimado': '5 minutos'
-    },
-    {
-        'prioridad': 'ALTA',
-        'area': 'Reproducibilidad',
-        'descripcion': 'Mantener requirements.txt con versiones fijadas (ya completado)',
-        'pasos': [
-            '✓ Completado: requirements.txt actualizado con versiones exactas',
-            'En futuro: ejecutar "pip freeze > requirements.txt" después de cambios'
-        ],
-        'tiempo_estimado': '0 minutos (completado)'
-    },
-    {
-        'prioridad': 'MEDIA',
-        'area': 'Optimización',
-        'descripcion': 'Evaluar si numpy realmente es necesario',
-        'pasos': [
-            '1. Revisar si hay planes para vectorización en modelos_ia.py',
-            '2. Si no hay uso actual, considerar eliminar: remover "import numpy"',
-            '3. Si se planea usar, mantener pero add comentario explicativo'
-        ],
-        'tiempo_estimado': '10 minutos'
-    },
-    {
-        'prioridad': 'MEDIA',
-        'area': 'Calidad',
-        'descripcion': 'Añadir requirements-dev.txt para herramientas de desarrollo',
-        'pasos': [
-            'Crear archivo requirements-dev.txt con:',
-            '  - pytest (testing)',
-            '  - flake8 (linting)',
-            '  - mypy (type checking)',
-            '  - black (code formatting)'
-        ],
-        'tiempo_estimado': '15 minutos'
-    },
-    {
-        'prioridad': 'BAJA',
-        'area': 'Seguridad',
-        'descripcion': 'Crear .env.example con variables esperadas (sin valores sensibles)',
-        'pasos': [
-            'Crear archivo .env.example con:',
-            '  DB_HOST=localhost',
-            '  DB_USER=root',
-            '  DB_PASSWORD=',
-            '  DB_NAME=sistema_contador',
-            '  SECRET_KEY=cambiar_en_produccion'
-        ],
-        'tiempo_estimado': '5 minutos'
-    },
-    {
-        'prioridad': 'BAJA',
-        'area': 'ML/IA',
-        'descripcion': 'Serializar modelo RandomForest para reutilización (en producción)',
-        'pasos': [
-            '1. Añadir import: from sklearn.externals import joblib',
-            '2. Guardar modelo: joblib.dump(modelo, "modelo_predictor.pkl")',
-            '3. Cargar modelo: modelo = joblib.load("modelo_predictor.pkl")',
-            '4. Evitar entrenar en cada request'
-        ],
-        'tiempo_estimado': '30 minutos'
-    }
-]
+RELLENO_VERDE = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
+RELLENO_AMARILLO = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
+RELLENO_ROJO = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
+RELLENO_SEVERIDAD = {'ALTA': RELLENO_ROJO, 'MEDIA': RELLENO_AMARILLO, 'BAJA': RELLENO_VERDE}
 
 def estilo_encabezado():
     """Estilo para encabezados de tabla"""
@@ -294,8 +55,47 @@ def aplicar_estilo(celda, estilo_dict):
     if 'border' in estilo_dict:
         celda.border = estilo_dict['border']
 
-def crear_excel():
-    """Crea el archivo Excel con el informe"""
+def escribir_tabla(ws, encabezados, filas, anchos):
+    """Encabezado con estilo, filas con bordes y anchos de columna"""
+    for col, encabezado in enumerate(encabezados, 1):
+        celda = ws.cell(row=1, column=col)
+        celda.value = encabezado
+        aplicar_estilo(celda, estilo_encabezado())
+    
+    normal = estilo_celda_normal()
+    for fila, valores in enumerate(filas, 2):
+        for col, valor in enumerate(valores, 1):
+            celda = ws.cell(row=fila, column=col)
+            celda.value = valor
+            aplicar_estilo(celda, normal)
+    
+    for col, ancho in enumerate(anchos, 1):
+        ws.column_dimensions[get_column_letter(col)].width = ancho
+
+def _ms(valor):
+    return None if valor is None else round(valor, 1)
+
+def _estado(dep):
+    """Texto de estado de una dependencia según lo medido"""
+    if dep['version_instalada'] is None:
+        return '✗ No instalada'
+    if dep['error']:
+        return '✗ Falla al importar'
+    if dep['solo_pruebas']:
+        return '⚠ Solo pruebas'
+    if not dep['en_requirements']:
+        return '⚠ Falta en requirements'
+    if dep['version_requerida'] and dep['version_requerida'] != dep['version_instalada']:
+        return '⚠ Versión distinta'
+    return '✓ OK'
+
+def crear_excel(analisis=None, archivo_salida=None):
+    """Crea el archivo Excel con el informe (archivo_salida: ruta o archivo abierto)"""
+    analisis = analisis or analizar_proyecto()
+    archivo_salida = archivo_salida or os.path.join(DIRECTORIO_PROYECTO, 'INFORME_LIBRERIAS.xlsx')
+    dependencias = sorted(analisis['dependencias'], key=lambda d: -(d['ms'] or 0))
+    observaciones = hallazgos(analisis)
+    arranque = analisis['arranque']
     
     wb = openpyxl.Workbook()
     wb.remove(wb.active)  # Remover hoja por defecto
@@ -309,64 +109,35 @@ def crear_excel():
     ws_resumen.merge_cells('A1:D1')
     ws_resumen['A1'].alignment = Alignment(horizontal='center', vertical='center')
     
-    ws_resumen['A2'] = f'Fecha de análisis: {datetime.now().strftime("%d de %B de %Y, %H:%M")}'
+    ws_resumen['A2'] = f"Medido el {analisis['fecha']} con Python {analisis['python']} (huella {analisis['huella']})"
     ws_resumen['A2'].font = Font(italic=True, size=10)
     
-    # Métricas generales
     fila = 4
     ws_resumen[f'A{fila}'] = 'MÉTRICAS GENERALES'
     ws_resumen[f'A{fila}'].font = Font(bold=True, size=12, color='FFFFFF')
     ws_resumen[f'A{fila}'].fill = PatternFill(start_color='4472C4', end_color='4472C4', fill_type='solid')
     ws_resumen.merge_cells(f'A{fila}:D{fila}')
     
-    fila += 1
+    de_aplicacion = [d for d in dependencias if not d['solo_pruebas']]
+    diferibles = [d for d in dependencias if d['diferible'] and (d['ms'] or 0) >= analisis['umbral_pesada_ms']]
     metricas = [
-        ('Total de librerías en requirements.txt', '7'),
-        ('Total de librerías instaladas', '28 (incluidas dependencias)'),
-        ('Librerías necesarias', '7'),
-        ('Librerías opcionales', '1 (numpy)'),
-        ('Warnings resueltos', '8/8 ✓'),
-        ('Problemas encontrados', '3'),
-        ('Estado del proyecto', '✓ OPERATIVO')
+        ('Librerías en requirements.txt', len(analisis['requirements'])),
+        ('Librerías instaladas (incluidas dependencias)', analisis['instaladas']),
+        ('Librerías importadas por la aplicación', len(de_aplicacion)),
+        (f"Arranque de {arranque['modulo']}.py (ms)", _ms(arranque['ms'])),
+        (f"Memoria al importar {arranque['modulo']}.py (MB)", arranque['memoria_mb']),
+        (f"Módulos cargados por {arranque['modulo']}.py", arranque['modulos']),
+        (f"Pesadas (≥ {analisis['umbral_pesada_ms']:.0f} ms) que pueden diferirse", len(diferibles)),
+        ('Hallazgos', len(observaciones))
     ]
     
+    fila += 1
     for metrica, valor in metricas:
         ws_resumen[f'A{fila}'] = metrica
         ws_resumen[f'B{fila}'] = valor
         ws_resumen[f'B{fila}'].font = Font(bold=True)
         fila += 1
     
-    # Status de warnings
-    fila += 1
-    ws_resumen[f'A{fila}'] = 'ESTADO DE WARNINGS'
-    ws_resumen[f'A{fila}'].font = Font(bold=True, size=12, color='FFFFFF')
-    ws_resumen[f'A{fila}'].fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-    ws_resumen.merge_cells(f'A{fila}:D{fila}')
-    
-    fila += 1
-    ws_resumen[f'A{fila}'] = '✓ TODOS LOS IMPORTS RESUELTOS'
-    ws_resumen[f'A{fila}'].font = Font(bold=True, size=11, color='FFFFFF')
-    ws_resumen[f'A{fila}'].fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-    ws_resumen.merge_cells(f'A{fila}:D{fila}')
-    
-    fila += 1
-    ws_resumen[f'A{fila}'] = 'Los siguientes imports que aparecían en amarillo han sido resueltos:'
-    fila += 1
-    
-    imports_amarillo = [
-        'mysql.connector (database.py)',
-        'dotenv (app.py, database.py)',
-        'flask (app.py)',
-        'pandas (app.py)',
-        'matplotlib (app.py)',
-        'numpy (modelos_ia.py)',
-        'sklearn (modelos_ia.py)'
-    ]
-    
-    for imp in imports_amarillo:
-        ws_resumen[f'A{fila}'] = f'  ✓ {imp}'
-        fila += 1
-    
     ws_resumen.column_dimensions['A'].width = 50
     ws_resumen.column_dimensions['B'].width = 30
     ws_resumen.column_dimensions['C'].width = 30
@@ -374,200 +145,84 @@ def crear_excel():
     
     # ============ HOJA 2: LIBRERÍAS DETALLADAS ============
     ws_libs = wb.create_sheet('📦 Librerías Detalladas', 1)
-    
-    # Encabezado
-    encabezados = ['Librería', 'Versión', 'Usado en', 'Descripción de Uso', 'Estado', 'Riesgo', 'Recomendación']
-    for col, encabezado in enumerate(encabezados, 1):
-        celda = ws_libs.cell(row=1, column=col)
-        celda.value = encabezado
-        aplicar_estilo(celda, estilo_encabezado())
-    
-    # Datos
-    fila = 2
-    for lib_name, lib_data in librerias_info.items():
-        ws_libs.cell(row=fila, column=1).value = lib_name
-        ws_libs.cell(row=fila, column=2).value = lib_data['version']
-        ws_libs.cell(row=fila, column=3).value = ', '.join(lib_data['usado_en'])
-        ws_libs.cell(row=fila, column=4).value = lib_data['uso']
-        ws_libs.cell(row=fila, column=5).value = lib_data['estado']
-        ws_libs.cell(row=fila, column=6).value = lib_data['riesgo']
-        ws_libs.cell(row=fila, column=7).value = lib_data['recomendacion']
-        
-        # Colorear estado
-        if '✓' in lib_data['estado']:
-            ws_libs.cell(row=fila, column=5).fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-        elif '⚠' in lib_data['estado']:
-            ws_libs.cell(row=fila, column=5).fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-        
-        for col in range(1, 8):
-            aplicar_estilo(ws_libs.cell(row=fila, column=col), estilo_celda_normal())
-        
-        fila += 1
-    
-    # Ancho de columnas
-    ws_libs.column_dimensions['A'].width = 20
-    ws_libs.column_dimensions['B'].width = 12
-    ws_libs.column_dimensions['C'].width = 20
-    ws_libs.column_dimensions['D'].width = 35
-    ws_libs.column_dimensions['E'].width = 15
-    ws_libs.column_dimensions['F'].width = 15
-    ws_libs.column_dimensions['G'].width = 35
-    
-    # ============ HOJA 3: WARNINGS RESUELTOS ============
-    ws_warnings = wb.create_sheet('✓ Warnings Resueltos', 2)
-    
-    encabezados = ['Archivo', 'Línea', 'Import', 'Problema', 'Solución', 'Estado', 'Acción Tomada']
-    for col, encabezado in enumerate(encabezados, 1):
-        celda = ws_warnings.cell(row=1, column=col)
-        celda.value = encabezado
-        aplicar_estilo(celda, estilo_encabezado())
-    
-    fila = 2
-    for warning in warnings_resueltos:
-        ws_warnings.cell(row=fila, column=1).value = warning['archivo']
-        ws_warnings.cell(row=fila, column=2).value = warning['linea']
-        ws_warnings.cell(row=fila, column=3).value = warning['import']
-        ws_warnings.cell(row=fila, column=4).value = warning['problema']
-        ws_warnings.cell(row=fila, column=5).value = warning['solucion']
-        ws_warnings.cell(row=fila, column=6).value = warning['estado']
-        ws_warnings.cell(row=fila, column=6).fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-        ws_warnings.cell(row=fila, column=7).value = warning['accion_tomada']
-        
-        for col in range(1, 8):
-            aplicar_estilo(ws_warnings.cell(row=fila, column=col), estilo_celda_normal())
-        
-        fila += 1
-    
-    ws_warnings.column_dimensions['A'].width = 18
-    ws_warnings.column_dimensions['B'].width = 8
-    ws_warnings.column_dimensions['C'].width = 35
-    ws_warnings.column_dimensions['D'].width = 35
-    ws_warnings.column_dimensions['E'].width = 25
-    ws_warnings.column_dimensions['F'].width = 15
-    ws_warnings.column_dimensions['G'].width = 25
-    
-    # ============ HOJA 4: PROBLEMAS ENCONTRADOS ============
-    ws_problemas = wb.create_sheet('⚠ Problemas Encontrados', 3)
-    
-    encabezados = ['Tipo', 'Archivo', 'Línea(s)', 'Descripción', 'Severidad', 'Impacto', 'Solución']
-    for col, encabezado in enumerate(encabezados, 1):
-        celda = ws_problemas.cell(row=1, column=col)
-        celda.value = encabezado
-        aplicar_estilo(celda, estilo_encabezado())
-    
-    fila = 2
-    for problema in problemas:
-        ws_problemas.cell(row=fila, column=1).value = problema['tipo']
-        ws_problemas.cell(row=fila, column=2).value = problema['archivo']
-        ws_problemas.cell(row=fila, column=3).value = problema['linea']
-        ws_problemas.cell(row=fila, column=4).value = problema['descripcion']
-        ws_problemas.cell(row=fila, column=5).value = problema['severidad']
-        
-        # Colorear severidad
-        if 'ALTA' in problema['severidad']:
-            ws_problemas.cell(row=fila, column=5).fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-        elif 'MEDIA' in problema['severidad']:
-            ws_problemas.cell(row=fila, column=5).fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-        elif 'BAJA' in problema['severidad']:
-            ws_problemas.cell(row=fila, column=5).fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-        
-        ws_problemas.cell(row=fila, column=6).value = problema['impacto']
-        ws_problemas.cell(row=fila, column=7).value = problema['solucion']
-        
-        for col in range(1, 8):
-            aplicar_estilo(ws_problemas.cell(row=fila, column=col), estilo_celda_normal())
-        
-        fila += 1
-    
-    ws_problemas.column_dimensions['A'].width = 18
-    ws_problemas.column_dimensions['B'].width = 20
-    ws_problemas.column_dimensions['C'].width = 12
-    ws_problemas.column_dimensions['D'].width = 40
-    ws_problemas.column_dimensions['E'].width = 12
-    ws_problemas.column_dimensions['F'].width = 30
-    ws_problemas.column_dimensions['G'].width = 40
-    
-    # ============ HOJA 5: RECOMENDACIONES ============
-    ws_recomendaciones = wb.create_sheet('💡 Recomendaciones', 4)
-    
-    fila = 1
-    for idx, rec in enumerate(recomendaciones, 1):
-        # Encabezado de recomendación
-        celda_titulo = ws_recomendaciones[f'A{fila}']
-        celda_titulo.value = f"{idx}. {rec['descripcion']}"
-        celda_titulo.font = Font(bold=True, size=11, color='FFFFFF')
-        
-        if 'CRÍTICA' in rec['prioridad']:
-            celda_titulo.fill = PatternFill(start_color='C00000', end_color='C00000', fill_type='solid')
-        elif 'ALTA' in rec['prioridad']:
-            celda_titulo.fill = PatternFill(start_color='FF6B6B', end_color='FF6B6B', fill_type='solid')
-        elif 'MEDIA' in rec['prioridad']:
-            celda_titulo.fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-        else:
-            celda_titulo.fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-        
-        ws_recomendaciones.merge_cells(f'A{fila}:C{fila}')
-        
-        fila += 1
-        ws_recomendaciones[f'A{fila}'] = f"Área: {rec['area']} | Prioridad: {rec['prioridad']} | Tiempo: {rec['tiempo_estimado']}"
-        ws_recomendaciones[f'A{fila}'].font = Font(italic=True, size=9)
-        ws_recomendaciones.merge_cells(f'A{fila}:C{fila}')
-        
-        fila += 1
-        for paso in rec['pasos']:
-            ws_recomendaciones[f'A{fila}'] = paso
-            ws_recomendaciones[f'A{fila}'].alignment = Alignment(wrap_text=True, vertical='top')
-            fila += 1
-        
-        fila += 1  # Espacio entre recomendaciones
-    
-    ws_recomendaciones.column_dimensions['A'].width = 80
-    ws_recomendaciones.column_dimensions['B'].width = 20
-    ws_recomendaciones.column_dimensions['C'].width = 20
+    escribir_tabla(
+        ws_libs,
+        ['Librería', 'Módulo', 'Versión requerida', 'Versión instalada', 'Usado en',
+         'Import (ms)', 'Memoria (MB)', 'Módulos cargados', 'Estado'],
+        [
+            (dep['distribucion'], dep['modulo'], dep['version_requerida'], dep['version_instalada'],
+             ', '.join(sorted({uso['archivo'] for uso in dep['usos']})),
+             _ms(dep['ms']), dep['memoria_mb'], dep['modulos'], _estado(dep))
+            for dep in dependencias
+        ],
+        [24, 14, 14, 14, 40, 12, 12, 14, 22]
+    )
+    for fila, dep in enumerate(dependencias, 2):
+        celda = ws_libs.cell(row=fila, column=9)
+        celda.fill = RELLENO_VERDE if celda.value.startswith('✓') else (
+            RELLENO_ROJO if celda.value.startswith('✗') else RELLENO_AMARILLO)
+    
+    # ============ HOJA 3: ARRANQUE DE LA APLICACIÓN ============
+    ws_arranque = wb.create_sheet('🚀 Arranque', 2)
+    total = sum(arranque['por_paquete'].values()) or 1
+    escribir_tabla(
+        ws_arranque,
+        ['Paquete', 'Tiempo propio (ms)', '% del arranque'],
+        [(paquete, round(ms, 1), round(100 * ms / total, 1)) for paquete, ms in arranque['por_paquete'].items()],
+        [30, 18, 16]
+    )
+    
+    # ============ HOJA 4: CARGA DIFERIDA ============
+    ws_diferida = wb.create_sheet('💤 Carga Diferida', 3)
+    filas = []
+    for dep in dependencias:
+        for uso in dep['usos']:
+            if uso['diferido'] or uso['archivo'].startswith('test_'):
+                continue
+            al_cargar = '<modulo>' in uso['usado_en']
+            filas.append((
+                dep['modulo'], f"{uso['archivo']}:{uso['linea']}", uso['modulo'], _ms(dep['ms']),
+                ', '.join(uso['usado_en']),
+                'No: se usa al cargar el archivo' if al_cargar else 'Sí: solo se usa dentro de funciones'
+            ))
+    escribir_tabla(
+        ws_diferida,
+        ['Librería', 'Import', 'Módulo importado', 'Import (ms)', 'Usado en', '¿Puede diferirse?'],
+        filas,
+        [16, 28, 28, 12, 60, 34]
+    )
+    
+    # ============ HOJA 5: HALLAZGOS ============
+    ws_hallazgos = wb.create_sheet('⚠ Hallazgos', 4)
+    escribir_tabla(ws_hallazgos, ['Severidad', 'Librería', 'Descripción'], observaciones, [12, 26, 100])
+    for fila, (severidad, _, _) in enumerate(observaciones, 2):
+        ws_hallazgos.cell(row=fila, column=1).fill = RELLENO_SEVERIDAD[severidad]
     
     # ============ HOJA 6: INSTRUCCIONES DE INSTALACIÓN ============
     ws_install = wb.create_sheet('⚙️ Instalación', 5)
     
     instrucciones = [
         ('REQUISITOS PREVIOS', [
-            'Python 3.10 o superior (recomendado 3.13)',
-            'Windows PowerShell 5.1 o superior',
+            f"Python {analisis['python']} (versión con la que se midió este informe)",
             'MySQL Server (para base de datos)'
         ]),
-        ('PASO 1: Crear Entorno Virtual', [
-            'Abrir PowerShell en la carpeta del proyecto',
-            'Ejecutar: python -m venv .venv'
-        ]),
-        ('PASO 2: Activar Entorno Virtual', [
-            'Ejecutar: .\\.venv\\Scripts\\Activate.ps1',
-            '(Si da error de ejecución, ejecutar:',
-            'Set-ExecutionPolicy -ExecutionPolicy RemoteSigned -Scope CurrentUser)'
+        ('PASO 1: Crear y activar un entorno virtual', [
+            'python -m venv .venv',
+            'Windows: .\\.venv\\Scripts\\Activate.ps1  |  Linux/macOS: source .venv/bin/activate'
         ]),
-        ('PASO 3: Instalar Dependencias', [
-            'Ejecutar: pip install -r requirements.txt',
-            'O instalar uno a uno:',
-            '  pip install Flask==3.1.2',
-            '  pip install pandas==2.3.3',
-            '  pip install numpy==2.3.4',
-            '  pip install scikit-learn==1.7.2',
-            '  pip install mysql-connector-python==9.5.0',
-            '  pip install matplotlib==3.10.7',
-            '  pip install python-dotenv==1.2.1'
+        ('PASO 2: Instalar dependencias', ['pip install -r requirements.txt'] + [
+            f"  pip install {nombre}=={version}" if version else f"  pip install {nombre}"
+            for nombre, version in analisis['requirements']
         ]),
-        ('PASO 4: Verificar Instalación', [
-            'Ejecutar: pip list',
-            'Debe mostrar todas las librerías con sus versiones'
-        ]),
-        ('PASO 5: Configurar Base de Datos', [
-            'Crear archivo .env en la raíz del proyecto:',
+        ('PASO 3: Configurar base de datos (.env)', [
             '  DB_HOST=localhost',
             '  DB_USER=root',
             '  DB_PASSWORD=tu_password',
             '  DB_NAME=sistema_contador',
             '  SECRET_KEY=clave_secreta_super_fuerte'
         ]),
-        ('PASO 6: Ejecutar Aplicación', [
-            'Ejecutar: python app.py',
+        ('PASO 4: Ejecutar aplicación', [
+            'python app.py',
             'La aplicación se abrirá automáticamente en http://localhost:5000'
         ])
     ]
@@ -585,13 +240,7 @@ def crear_excel():
         for paso in pasos:
             celda = ws_install[f'A{fila}']
             celda.value = paso
-            celda.alignment = Alignment(wrap_text=True, vertical='top')
-            celda.border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
+            aplicar_estilo(celda, estilo_celda_normal())
             fila += 1
         
         fila += 1  # Espacio entre secciones
@@ -599,18 +248,22 @@ def crear_excel():
     ws_install.column_dimensions['A'].width = 80
     
     # ============ GUARDAR ARCHIVO ============
-    archivo_salida = 'c:\\Users\\ronal\\OneDrive\\Desktop\\sistema_contador\\INFORME_LIBRERIAS.xlsx'
     wb.save(archivo_salida)
     
     return archivo_salida
 
 if __name__ == '__main__':
-    archivo = crear_excel()
+    parser = argparse.ArgumentParser(description='Informe Excel de librerías con mediciones reales')
+    parser.add_argument('--salida', help='Ruta del archivo (por defecto INFORME_LIBRERIAS.xlsx en el proyecto)')
+    parser.add_argument('--forzar', action='store_true', help='Volver a medir aunque haya un análisis en caché')
+    args = parser.parse_args()
+    
+    archivo = crear_excel(analizar_proyecto(forzar=args.forzar), args.salida)
     print(f"✅ Informe Excel generado exitosamente: {archivo}")
     print(f"\n📊 Hojas incluidas:")
-    print("  1. 📋 Resumen Ejecutivo - Vista general y métricas")
-    print("  2. 📦 Librerías Detalladas - Análisis por librería")
-    print("  3. ✓ Warnings Resueltos - Problemas de imports solucionados")
-    print("  4. ⚠ Problemas Encontrados - Issues detectados")
-    print("  5. 💡 Recomendaciones - Acciones a tomar")
+    print("  1. 📋 Resumen Ejecutivo - Métricas medidas")
+    print("  2. 📦 Librerías Detalladas - Versiones, tiempo y memoria de import")
+    print("  3. 🚀 Arranque - Tiempo de arranque de app.py por paquete")
+    print("  4. 💤 Carga Diferida - Imports que se pueden mover dentro de funciones")
+    print("  5. ⚠ Hallazgos - Observaciones derivadas de las mediciones")
     print("  6. ⚙️ Instalación - Instrucciones paso a paso")
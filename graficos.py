@@ -0,0 +1,114 @@
+# sistema_contador/graficos.py
+"""
+Gráfico de distribución de estados de clientes
+La imagen solo depende de los conteos por estado, así que se guarda en caché con la huella
+de esos conteos y solo se vuelve a dibujar cuando cambian.
+
+Formatos:
+- png: matplotlib (API orientada a objetos, sin el estado global de pyplot, segura entre hilos)
+- svg: SVG escrito directamente, sin matplotlib; mucho más barato de generar
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+FORMATOS_GRAFICO = {'png': 'image/png', 'svg': 'image/svg+xml'}
+GRAFICOS_EN_CACHE = int(os.getenv('GRAFICOS_EN_CACHE', 16))  # Imágenes (huella, formato) guardadas
+
+COLORES_ESTADOS = ['#28a745', '#ffc107', '#fd7e14', '#dc3545']
+TITULO = 'Distribución de Estados de Clientes'
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _series(estados_clientes):
+    """Etiquetas y valores en el orden de la consulta"""
+    etiquetas = [(fila['estado_actual'] or '').title().replace('_', ' ') for fila in estados_clientes]
+    valores = [int(fila['cantidad']) for fila in estados_clientes]
+    return etiquetas, valores
+
+def huella_estados(estados_clientes):
+    """Huella de los conteos por estado: identifica la imagen (y su ETag)"""
+    contenido = '|'.join(f"{fila['estado_actual']}={int(fila['cantidad'])}" for fila in estados_clientes)
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+def renderizar_png(estados_clientes):
+    """PNG de 100 dpi dibujado con matplotlib"""
+    from matplotlib.figure import Figure  # Se importa con el primer gráfico, no al arrancar
+
+    etiquetas, valores = _series(estados_clientes)
+    figura = Figure(figsize=(10, 6))
+    ejes = figura.subplots()
+    ejes.bar(etiquetas, valores, color=COLORES_ESTADOS[:len(etiquetas)], alpha=0.8)
+    ejes.set_title(TITULO, fontsize=14, fontweight='bold')
+    ejes.set_xlabel('Estado Actual')
+    ejes.set_ylabel('Cantidad de Clientes')
+
+    for i, v in enumerate(valores):
+        ejes.text(i, v + 0.1, str(v), ha='center', va='bottom', fontweight='bold')
+
+    figura.tight_layout()
+    img = io.BytesIO()
+    figura.savefig(img, format='png', dpi=100, bbox_inches='tight')
+    return img.getvalue()
+
+def renderizar_svg(estados_clientes, ancho=800, alto=480):
+    """Gráfico de barras en SVG, con el mismo contenido que el PNG"""
+    etiquetas, valores = _series(estados_clientes)
+    izquierda, derecha, arriba, abajo = 70, 20, 50, 60
+    area_ancho = ancho - izquierda - derecha
+    area_alto = alto - arriba - abajo
+    maximo = max(valores, default=0) or 1
+    paso = area_ancho / max(len(valores), 1)
+    barra = paso * 0.6
+
+    partes = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {ancho} {alto}" '
+        f'font-family="sans-serif" font-size="13">',
+        f'<text x="{ancho / 2:.0f}" y="28" text-anchor="middle" font-size="18" font-weight="bold">{TITULO}</text>',
+        f'<line x1="{izquierda}" y1="{arriba + area_alto}" x2="{ancho - derecha}" y2="{arriba + area_alto}" stroke="#333"/>',
+        f'<line x1="{izquierda}" y1="{arriba}" x2="{izquierda}" y2="{arriba + area_alto}" stroke="#333"/>',
+        f'<text x="{ancho / 2:.0f}" y="{alto - 12}" text-anchor="middle">Estado Actual</text>',
+        f'<text x="18" y="{arriba + area_alto / 2:.0f}" text-anchor="middle" '
+        f'transform="rotate(-90 18 {arriba + area_alto / 2:.0f})">Cantidad de Clientes</text>'
+    ]
+    for i, (etiqueta, valor) in enumerate(zip(etiquetas, valores)):
+        altura = area_alto * valor / maximo
+        x = izquierda + paso * i + (paso - barra) / 2
+        y = arriba + area_alto - altura
+        centro = x + barra / 2
+        partes.append(
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{barra:.1f}" height="{altura:.1f}" '
+            f'fill="{COLORES_ESTADOS[i % len(COLORES_ESTADOS)]}" fill-opacity="0.8"/>'
+        )
+        partes.append(f'<text x="{centro:.1f}" y="{y - 6:.1f}" text-anchor="middle" font-weight="bold">{valor}</text>')
+        partes.append(f'<text x="{centro:.1f}" y="{arriba + area_alto + 20}" text-anchor="middle">{escape(etiqueta)}</text>')
+    partes.append('</svg>')
+    return '\n'.join(partes).encode('utf-8')
+
+RENDERIZADORES = {'png': renderizar_png, 'svg': renderizar_svg}
+
+def grafico_estados(estados_clientes, formato='png', huella=None):
+    """
+    Imagen del gráfico desde la caché, o dibujada y guardada si los conteos cambiaron
+    Retorna: (huella, bytes de la imagen)
+    """
+    huella = huella or huella_estados(estados_clientes)
+    clave = (huella, formato)
+    with _cache_lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return huella, _cache[clave]
+
+    # Se dibuja fuera del lock: dos peticiones simultáneas pueden dibujar la misma imagen, sin bloquear a las demás
+    contenido = RENDERIZADORES[formato](estados_clientes)
+    with _cache_lock:
+        _cache[clave] = contenido
+        _cache.move_to_end(clave)
+        while len(_cache) > GRAFICOS_EN_CACHE:
+            _cache.popitem(last=False)
+    return huella, contenido
@@ -0,0 +1,198 @@
+# sistema_contador/informes.py
+"""
+Cola de informes en segundo plano
+Los informes se generan en un pool de hilos fuera del hilo de la petición: solicitar() devuelve
+un trabajo y el cliente consulta su estado hasta poder descargarlo.
+
+Cada archivo generado queda en disco con el nombre <informe>-v<version>.<extension>, donde la
+versión es el sello de datos del informe (ver version_datos en database.py). Mientras los datos
+no cambien, pedir el mismo informe devuelve el archivo existente sin volver a generarlo.
+"""
+
+import itertools
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DIRECTORIO_INFORMES = os.getenv('INFORMES_DIR', os.path.join(tempfile.gettempdir(), 'sistema_contador_informes'))
+HILOS_INFORMES = int(os.getenv('INFORMES_HILOS', 2))                 # Informes generándose a la vez
+RETENCION_TRABAJOS = float(os.getenv('INFORMES_RETENCION', 3600))    # Segundos que se recuerda un trabajo terminado
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+LISTO = 'listo'
+ERROR = 'error'
+
+class ColaInformes:
+    """Generación de informes en un ThreadPoolExecutor con caché en disco por versión de datos"""
+
+    def __init__(self, directorio=DIRECTORIO_INFORMES, hilos=HILOS_INFORMES, retencion=RETENCION_TRABAJOS):
+        self.directorio = directorio
+        self.retencion = retencion
+        self.informes = {}
+        self._trabajos = {}
+        self._futuros = {}
+        self._en_curso = {}   # (informe, version) -> id del trabajo que lo está generando
+        self._orden = {}      # (informe, str(version)) -> orden en que se pidió una versión no numérica
+        self._secuencia = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='informes')
+
+    def registrar(self, nombre, generar, version, extension='xlsx'):
+        """
+        generar(destino): escribe el informe en la ruta destino
+        version(): sello de los datos del informe; se evalúa en el hilo que llama a solicitar()
+        """
+        self.informes[nombre] = {'generar': generar, 'version': version, 'extension': extension}
+
+    def ruta_archivo(self, nombre, version):
+        return os.path.join(self.directorio, f"{nombre}-v{version}.{self.informes[nombre]['extension']}")
+
+    def solicitar(self, nombre):
+        """
+        Trabajo para la versión actual del informe:
+        listo al instante si el archivo ya existe, el mismo trabajo si ya se está generando o uno nuevo en cola
+        """
+        version = self.informes[nombre]['version']()
+        ruta = self.ruta_archivo(nombre, version)
+
+        with self._lock:
+            self._purgar()
+            if not isinstance(version, int):
+                self._orden.setdefault((nombre, str(version)), next(self._secuencia))
+            trabajo_id = self._en_curso.get((nombre, version))
+            if trabajo_id:
+                return self._publico(self._trabajos[trabajo_id])
+
+            trabajo = {
+                'id': uuid.uuid4().hex,
+                'informe': nombre,
+                'version': version,
+                'estado': PENDIENTE,
+                'desde_cache': False,
+                'error': None,
+                'creado': time.time(),
+                'terminado': None,
+                'ruta': ruta
+            }
+            self._trabajos[trabajo['id']] = trabajo
+
+            if os.path.exists(ruta):
+                trabajo.update(estado=LISTO, desde_cache=True, terminado=trabajo['creado'])
+                return self._publico(trabajo)
+
+            self._en_curso[(nombre, version)] = trabajo['id']
+            self._futuros[trabajo['id']] = self._executor.submit(self._generar, trabajo)
+            return self._publico(trabajo)
+
+    def estado(self, trabajo_id):
+        """Estado del trabajo, o None si no existe (o ya se olvidó)"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return self._publico(trabajo) if trabajo else None
+
+    def archivo(self, trabajo_id):
+        """Ruta del archivo de un trabajo listo, o None si no está listo o el archivo ya se reemplazó"""
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            if not trabajo or trabajo['estado'] != LISTO:
+                return None
+            ruta = trabajo['ruta']
+        return ruta if os.path.exists(ruta) else None
+
+    def esperar(self, trabajo_id, timeout=None):
+        """Bloquear hasta que el trabajo termine; retorna su estado"""
+        with self._lock:
+            futuro = self._futuros.get(trabajo_id)
+        if futuro is not None:
+            futuro.result(timeout)
+        return self.estado(trabajo_id)
+
+    def _generar(self, trabajo):
+        with self._lock:
+            trabajo['estado'] = EN_PROCESO
+
+        temporal = f"{trabajo['ruta']}.{trabajo['id']}.tmp"
+        inicio = time.perf_counter()
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            self.informes[trabajo['informe']]['generar'](temporal)
+            # Renombrar al final: nunca se sirve un archivo a medio escribir
+            os.replace(temporal, trabajo['ruta'])
+            self._borrar_versiones_anteriores(trabajo)
+            print(f"📄 Informe '{trabajo['informe']}' v{trabajo['version']} generado "
+                  f"en {time.perf_counter() - inicio:.1f}s")
+            estado, error = LISTO, None
+        except Exception as e:
+            print(f"❌ Error generando informe '{trabajo['informe']}': {e}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            estado, error = ERROR, str(e)
+
+        with self._lock:
+            trabajo.update(estado=estado, error=error, terminado=time.time())
+            self._en_curso.pop((trabajo['informe'], trabajo['version']), None)
+            self._futuros.pop(trabajo['id'], None)
+
+    def _posterior(self, nombre, version, otra):
+        """
+        True si version es más nueva que otra
+        Las versiones numéricas (sello de datos) se comparan por valor; las demás (huellas) por el
+        orden en que se pidieron en este proceso; una huella que solo está en disco es la más antigua
+        """
+        try:
+            return int(version) > int(otra)
+        except (TypeError, ValueError):
+            return self._orden.get((nombre, str(version)), -1) > self._orden.get((nombre, str(otra)), -1)
+
+    def _versiones_en_disco(self, nombre):
+        """{version: ruta} de los archivos publicados del informe (sin temporales)"""
+        patron = re.compile(rf"{re.escape(nombre)}-v(.+)\.{re.escape(self.informes[nombre]['extension'])}")
+        versiones = {}
+        for archivo in os.listdir(self.directorio):
+            coincidencia = patron.fullmatch(archivo)
+            if coincidencia:
+                versiones[coincidencia.group(1)] = os.path.join(self.directorio, archivo)
+        return versiones
+
+    def _borrar_versiones_anteriores(self, trabajo):
+        """
+        Quitar los archivos de versiones anteriores a la del trabajo
+        Si ya hay una versión más nueva publicada o generándose, este trabajo llegó tarde y no borra nada
+        """
+        nombre, version = trabajo['informe'], trabajo['version']
+        with self._lock:
+            en_curso = [v for (informe, v) in self._en_curso if informe == nombre]
+        en_disco = self._versiones_en_disco(nombre)
+        if any(self._posterior(nombre, otra, version) for otra in list(en_disco) + en_curso):
+            return
+        for otra, ruta in en_disco.items():
+            if self._posterior(nombre, version, otra):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+        self._olvidar_orden_anterior(nombre, version)
+
+    def _olvidar_orden_anterior(self, nombre, version):
+        """Quitar de _orden las versiones reemplazadas por esta (salvo las que siguen generándose)"""
+        with self._lock:
+            en_curso = {str(v) for (informe, v) in self._en_curso if informe == nombre}
+            actual = self._orden.get((nombre, str(version)), -1)
+            for clave in [c for c, orden in self._orden.items()
+                          if c[0] == nombre and orden < actual and c[1] not in en_curso]:
+                del self._orden[clave]
+
+    def _purgar(self):
+        """Olvidar trabajos terminados hace más de la retención (se llama con el lock tomado)"""
+        limite = time.time() - self.retencion
+        for trabajo_id in [t['id'] for t in self._trabajos.values() if t['terminado'] and t['terminado'] < limite]:
+            del self._trabajos[trabajo_id]
+
+    @staticmethod
+    def _publico(trabajo):
+        return {clave: valor for clave, valor in trabajo.items() if clave != 'ruta'}
@@ -1,83 +1,272 @@
-►# sistema_contador/modelos_ia.py
-import numpy as np
+# sistema_contador/modelos_ia.py
+import threading
 from collections import defaultdict, Counter
-from sklearn.ensemble import RandomForestClassifier
+
+import numpy as np
 
 class CadenaMarkovPagos:
     """Sistema de predicción usando Cadenas de Markov"""
     
+    ESTADOS = ['al_dia', 'retraso_leve', 'retraso_grave', 'impago']
+    
+    # Matriz de transición por defecto basada en conocimiento experto (filas = estado actual)
+    MATRIZ_DEFAULT = np.array([
+        [0.70, 0.20, 0.08, 0.02],
+        [0.30, 0.40, 0.20, 0.10],
+        [0.10, 0.20, 0.40, 0.30],
+        [0.05, 0.15, 0.30, 0.50]
+    ])
+    
     def __init__(self):
-        self.estados = ['al_dia', 'retraso_leve', 'retraso_grave', 'impago']
-        self.matriz_transicion = None
-        
+        self.estados = list(self.ESTADOS)
+        self.indice = {estado: i for i, estado in enumerate(self.estados)}
+        n = len(self.estados)
+        # Conteos crudos de transiciones (desde x hacia): permiten actualizar sin reentrenar
+        self.conteos_array = np.zeros((n, n), dtype=np.int64)
+        self.matriz = None
+        # Versión de la matriz: los análisis derivados se cachean por versión
+        self.version = 0
+        self._analisis = {}
+        # El modelo publicado lo leen todos los hilos a la vez: el caché de análisis se llena bajo este lock
+        self._analisis_lock = threading.RLock()
+    
+    def copiar(self):
+        """Copia con sus propios conteos: se actualiza sin afectar a quien lee el original"""
+        copia = type(self)()
+        copia.conteos_array = self.conteos_array.copy()
+        copia.matriz = self.matriz
+        copia.version = self.version
+        with self._analisis_lock:
+            copia._analisis = dict(self._analisis)
+        return copia
+    
+    def codificar(self, estados):
+        """Convertir nombres de estado a códigos enteros (-1 para estados desconocidos)"""
+        return np.fromiter((self.indice.get(e, -1) for e in estados), dtype=np.int8)
+    
     def entrenar(self, datos_historicos):
-        """Entrenar la cadena de Markov con datos históricos"""
+        """Entrenar la cadena de Markov con datos históricos (lista de secuencias de estados)"""
         if not datos_historicos:
+            self.conteos_array[:] = 0
             self._usar_matriz_default()
             return
         
-        # Contar transiciones entre estados
-        transiciones = defaultdict(Counter)
-        
-        for secuencia in datos_historicos:
-            for i in range(len(secuencia) - 1):
-                estado_actual = secuencia[i]
-                estado_siguiente = secuencia[i + 1]
-                transiciones[estado_actual][estado_siguiente] += 1
-        
-        # Construir matriz de transición
-        self.matriz_transicion = {}
-        for estado_actual in self.estados:
-            total = sum(transiciones[estado_actual].values())
-            if total > 0:
-                self.matriz_transicion[estado_actual] = {
-                    sig: count/total for sig, count in transiciones[estado_actual].items()
-                }
-            else:
-                self.matriz_transicion[estado_actual] = self._probabilidades_default(estado_actual)
+        codigos = self.codificar(e for secuencia in datos_historicos for e in secuencia)
+        grupos = np.repeat(np.arange(len(datos_historicos)), [len(s) for s in datos_historicos])
+        self.entrenar_arrays(codigos, grupos)
+    
+    def entrenar_arrays(self, codigos, grupos):
+        """
+        Entrenar con arrays ya codificados y ordenados por cliente y periodo
+        - codigos: código de estado de cada pago (ver codificar)
+        - grupos: identificador del cliente de cada pago; solo se cuentan pares del mismo cliente
+        """
+        self.conteos_array = self._contar_pares(np.asarray(codigos), np.asarray(grupos))
+        self._recalcular_matriz()
+    
+    def _contar_pares(self, codigos, grupos):
+        """Contar transiciones consecutivas de forma vectorizada (bincount sobre pares codificados)"""
+        n = len(self.estados)
+        if len(codigos) < 2:
+            return np.zeros((n, n), dtype=np.int64)
+        desde = codigos[:-1].astype(np.intp)
+        hacia = codigos[1:].astype(np.intp)
+        validos = (grupos[1:] == grupos[:-1]) & (desde >= 0) & (hacia >= 0)
+        pares = desde[validos] * n + hacia[validos]
+        return np.bincount(pares, minlength=n * n).reshape(n, n).astype(np.int64)
+    
+    def actualizar_conteos(self, transiciones, signo=1):
+        """
+        Sumar (signo=1) o restar (signo=-1) transiciones {(desde, hacia): cantidad}
+        y recalcular la matriz
+        """
+        if not transiciones:
+            return
+        pares = [
+            (self.indice[desde], self.indice[hacia], cantidad)
+            for (desde, hacia), cantidad in transiciones.items()
+            if desde in self.indice and hacia in self.indice
+        ]
+        if pares:
+            filas, columnas, cantidades = (np.array(v) for v in zip(*pares))
+            np.add.at(self.conteos_array, (filas, columnas), signo * cantidades)
+            np.maximum(self.conteos_array, 0, out=self.conteos_array)
+        self._recalcular_matriz()
+    
+    def total_transiciones(self):
+        """Cantidad de transiciones observadas que respaldan la matriz"""
+        return int(self.conteos_array.sum())
+    
+    def _recalcular_matriz(self):
+        """Normalizar los conteos por fila; las filas sin datos usan la matriz por defecto"""
+        totales = self.conteos_array.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            empirica = self.conteos_array / totales
+        self._publicar_matriz(np.where(totales > 0, empirica, self.MATRIZ_DEFAULT))
     
     def _usar_matriz_default(self):
         """Matriz de transición por defecto basada en conocimiento experto"""
-        self.matriz_transicion = {
-            'al_dia': {'al_dia': 0.7, 'retraso_leve': 0.2, 'retraso_grave': 0.08, 'impago': 0.02},
-            'retraso_leve': {'al_dia': 0.3, 'retraso_leve': 0.4, 'retraso_grave': 0.2, 'impago': 0.1},
-            'retraso_grave': {'al_dia': 0.1, 'retraso_leve': 0.2, 'retraso_grave': 0.4, 'impago': 0.3},
-            'impago': {'al_dia': 0.05, 'retraso_leve': 0.15, 'retraso_grave': 0.3, 'impago': 0.5}
-        }
+        self._publicar_matriz(self.MATRIZ_DEFAULT.copy())
+    
+    def _publicar_matriz(self, matriz):
+        """Reemplazar la matriz e invalidar los análisis calculados con la anterior"""
+        with self._analisis_lock:
+            self.matriz = matriz
+            self._analisis = {}
+            self.version += 1
     
     def _probabilidades_default(self, estado_actual):
         """Probabilidades por defecto para estados sin datos"""
-        defaults = {
-            'al_dia': {'al_dia': 0.7, 'retraso_leve': 0.2, 'retraso_grave': 0.08, 'impago': 0.02},
-            'retraso_leve': {'al_dia': 0.3, 'retraso_leve': 0.4, 'retraso_grave': 0.2, 'impago': 0.1},
-            'retraso_grave': {'al_dia': 0.1, 'retraso_leve': 0.2, 'retraso_grave': 0.4, 'impago': 0.3},
-            'impago': {'al_dia': 0.05, 'retraso_leve': 0.15, 'retraso_grave': 0.3, 'impago': 0.5}
-        }
-        return defaults.get(estado_actual, {e: 0.25 for e in self.estados})
+        if estado_actual in self.indice:
+            fila = self.MATRIZ_DEFAULT[self.indice[estado_actual]]
+            return {e: float(p) for e, p in zip(self.estados, fila)}
+        return {e: 0.25 for e in self.estados}
+    
+    # ===== Vistas de compatibilidad con la API basada en diccionarios =====
+    
+    @property
+    def matriz_transicion(self):
+        """Matriz como {estado: {siguiente: probabilidad}} (None si no está entrenada)"""
+        if self.matriz is None:
+            return None
+        vista = {}
+        for i, estado in enumerate(self.estados):
+            if self.conteos_array[i].sum() > 0:
+                vista[estado] = {
+                    sig: float(self.matriz[i, j])
+                    for j, sig in enumerate(self.estados) if self.conteos_array[i, j] > 0
+                }
+            else:
+                vista[estado] = self._probabilidades_default(estado)
+        return vista
+    
+    @property
+    def conteos(self):
+        """Conteos como {desde: Counter({hacia: cantidad})}"""
+        vista = defaultdict(Counter)
+        for i, j in zip(*np.nonzero(self.conteos_array)):
+            vista[self.estados[i]][self.estados[j]] = int(self.conteos_array[i, j])
+        return vista
     
     def predecir(self, estado_actual, meses=3):
         """Predecir estados futuros"""
-        if not self.matriz_transicion:
+        if self.matriz is None:
             self._usar_matriz_default()
         
         predicciones = []
         probabilidades = []
-        estado = estado_actual
+        estado = self.indice.get(estado_actual)
         
         for _ in range(meses):
-            if estado in self.matriz_transicion:
-                trans = self.matriz_transicion[estado]
+            if estado is not None:
                 # Elegir estado más probable
-                estado_sig = max(trans.items(), key=lambda x: x[1])
-                predicciones.append(estado_sig[0])
-                probabilidades.append(round(estado_sig[1] * 100, 2))
-                estado = estado_sig[0]
+                fila = self.matriz[estado]
+                siguiente = int(np.argmax(fila))
+                predicciones.append(self.estados[siguiente])
+                probabilidades.append(round(float(fila[siguiente]) * 100, 2))
+                estado = siguiente
             else:
                 predicciones.append('al_dia')
                 probabilidades.append(50.0)
         
         return predicciones, probabilidades
     
+    # ===== Análisis de la cadena completa (cacheados por versión de la matriz) =====
+    
+    def _cacheado(self, clave, calcular):
+        with self._analisis_lock:
+            analisis = self._analisis
+            if clave not in analisis:
+                analisis[clave] = calcular()
+            return analisis[clave]
+    
+    def potencia(self, meses):
+        """Matriz de transición a n meses (P^n), calculada una vez por horizonte"""
+        with self._analisis_lock:
+            if self.matriz is None:
+                self._usar_matriz_default()
+            if meses <= 1:
+                return self.matriz if meses == 1 else np.eye(len(self.estados))
+            analisis = self._analisis
+            if ('potencia', meses) not in analisis:
+                # Partir de la mayor potencia ya calculada y multiplicar hasta el horizonte pedido
+                desde = max((k[1] for k in analisis if k[0] == 'potencia' and k[1] < meses), default=1)
+                resultado = self.potencia(desde)
+                for h in range(desde + 1, meses + 1):
+                    resultado = resultado @ self.matriz
+                    analisis[('potencia', h)] = resultado
+            return analisis[('potencia', meses)]
+    
+    def distribucion_estacionaria(self):
+        """Distribución de largo plazo π tal que π·P = π y Σπ = 1"""
+        def calcular():
+            n = len(self.estados)
+            sistema = np.vstack([self.potencia(1).T - np.eye(n), np.ones(n)])
+            objetivo = np.zeros(n + 1)
+            objetivo[-1] = 1.0
+            pi = np.linalg.lstsq(sistema, objetivo, rcond=None)[0]
+            pi = np.clip(pi, 0, None)
+            return pi / pi.sum()
+        return self._cacheado('estacionaria', calcular)
+    
+    @staticmethod
+    def _alcanzan(aristas, destinos):
+        """Máscara de los estados desde los que se llega a alguno de destinos siguiendo aristas"""
+        alcanzan = np.zeros(len(aristas), dtype=bool)
+        alcanzan[destinos] = True
+        while True:
+            nuevos = alcanzan | aristas[:, alcanzan].any(axis=1)
+            if np.array_equal(nuevos, alcanzan):
+                return alcanzan
+            alcanzan = nuevos
+    
+    def meses_hasta_impago(self):
+        """
+        Meses esperados hasta el primer impago desde cada estado
+        Se trata 'impago' como absorbente: t = (I - Q)^-1 · 1 (matriz fundamental), resuelto solo sobre
+        los estados que llegan a impago con certeza. Es infinito (nunca cae en impago) desde los estados que
+        no pueden llegar a impago y desde los que pueden pasar a uno de ellos
+        """
+        def calcular():
+            impago = self.indice['impago']
+            aristas = self.potencia(1) > 0
+            aristas[impago] = False  # Absorbente
+            sin_impago = ~self._alcanzan(aristas, [impago])
+            finitos = ~self._alcanzan(aristas, np.flatnonzero(sin_impago))
+            finitos[impago] = False
+            
+            tiempos = np.full(len(self.estados), np.inf)
+            tiempos[impago] = 0.0
+            if finitos.any():
+                q = self.potencia(1)[np.ix_(finitos, finitos)]
+                tiempos[finitos] = np.linalg.solve(np.eye(int(finitos.sum())) - q, np.ones(int(finitos.sum())))
+            return tiempos
+        return self._cacheado('meses_hasta_impago', calcular)
+    
+    def pronostico(self, estado_actual, meses=3):
+        """
+        Pronóstico completo para un estado: distribución de estados en cada horizonte,
+        distribución estacionaria y meses esperados hasta el primer impago.
+        Compartido por todos los clientes con el mismo estado actual.
+        """
+        if self.matriz is None:
+            self._usar_matriz_default()
+        
+        def calcular():
+            i = self.indice.get(estado_actual)
+            if i is None:
+                return None
+            def a_estados(fila):
+                return {e: round(float(p) * 100, 2) for e, p in zip(self.estados, fila)}
+            tiempo = float(self.meses_hasta_impago()[i])
+            return {
+                'distribuciones': [a_estados(self.potencia(h)[i]) for h in range(1, meses + 1)],
+                'estacionaria': a_estados(self.distribucion_estacionaria()),
+                'meses_hasta_impago': round(tiempo, 2) if np.isfinite(tiempo) else None,
+                'version_modelo': self.version
+            }
+        return self._cacheado(('pronostico', estado_actual, meses), calcular)
+    
     def calcular_riesgo(self, estado_actual):
         """Calcular nivel de riesgo"""
         riesgo = {
@@ -92,6 +281,8 @@ class PredictorML:
     """Predictor usando Machine Learning (Random Forest)"""
     
     def __init__(self):
+        # scikit-learn tarda en importarse: solo se carga si se usa el predictor
+        from sklearn.ensemble import RandomForestClassifier
         self.modelo = RandomForestClassifier(n_estimators=100, random_state=42)
         self.entrenado = False
     
@@ -0,0 +1,118 @@
+# sistema_contador/periodos.py
+"""
+Periodos de reporte: mes, trimestre, año o rango de meses
+Un periodo es un rango cerrado de meses {'tipo', 'desde': (año, mes), 'hasta': (año, mes)}, la
+misma granularidad de resumen_pagos (clave primaria año, mes, estado). Así cualquier periodo se
+resuelve leyendo solo sus meses del resumen, sin recorrer pagos.
+"""
+
+import os
+from datetime import date, datetime
+
+FECHA_REFERENCIA = os.getenv('FECHA_REFERENCIA', '')               # AAAA-MM-DD fija (datos de ejemplo); vacío = hoy
+MAX_MESES_PERIODO = int(os.getenv('PERIODO_MAX_MESES', 120))       # Largo máximo de un rango
+
+TIPOS_PERIODO = ('mes', 'trimestre', 'año', 'rango')
+
+NOMBRES_MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+                 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+def fecha_referencia():
+    """Fecha de "hoy" para los cálculos: FECHA_REFERENCIA si está definida, si no la fecha actual"""
+    if FECHA_REFERENCIA:
+        return datetime.strptime(FECHA_REFERENCIA, '%Y-%m-%d')
+    return datetime.combine(date.today(), datetime.min.time())
+
+def _indice(año_mes):
+    """(año, mes) a un número de mes correlativo"""
+    año, mes = año_mes
+    return año * 12 + mes - 1
+
+def _año_mes(indice):
+    año, mes = divmod(indice, 12)
+    return año, mes + 1
+
+def _entero(parametros, nombre, defecto, minimo, maximo):
+    valor = parametros.get(nombre)
+    if valor in (None, ''):
+        return defecto
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"El parámetro '{nombre}' debe ser un número entero")
+    if not minimo <= valor <= maximo:
+        raise ValueError(f"El parámetro '{nombre}' debe estar entre {minimo} y {maximo}")
+    return valor
+
+def _mes_texto(parametros, nombre):
+    """Parámetro obligatorio con formato AAAA-MM"""
+    valor = parametros.get(nombre) or ''
+    try:
+        fecha = datetime.strptime(valor, '%Y-%m')
+    except ValueError:
+        raise ValueError(f"El parámetro '{nombre}' debe tener el formato AAAA-MM")
+    return fecha.year, fecha.month
+
+def resolver_periodo(parametros, referencia=None):
+    """
+    Periodo pedido con los parámetros periodo, año, mes, trimestre, desde y hasta
+    Lo que falte se toma de la fecha de referencia (sin parámetros: el mes de referencia)
+    Retorna: dict del periodo; ValueError si algún parámetro no es válido
+    """
+    referencia = referencia or fecha_referencia()
+    tipo = parametros.get('periodo') or 'mes'
+    if tipo not in TIPOS_PERIODO:
+        raise ValueError(f"Periodo no válido: {tipo} (use {', '.join(TIPOS_PERIODO)})")
+
+    if tipo == 'rango':
+        desde, hasta = _mes_texto(parametros, 'desde'), _mes_texto(parametros, 'hasta')
+        if desde > hasta:
+            raise ValueError("'desde' no puede ser posterior a 'hasta'")
+        if _indice(hasta) - _indice(desde) + 1 > MAX_MESES_PERIODO:
+            raise ValueError(f"El rango no puede superar {MAX_MESES_PERIODO} meses")
+        return {'tipo': tipo, 'desde': desde, 'hasta': hasta}
+
+    año = _entero(parametros, 'año', referencia.year, 1, 9999)
+    if tipo == 'mes':
+        mes = _entero(parametros, 'mes', referencia.month, 1, 12)
+        return {'tipo': tipo, 'desde': (año, mes), 'hasta': (año, mes)}
+    if tipo == 'trimestre':
+        trimestre = _entero(parametros, 'trimestre', (referencia.month - 1) // 3 + 1, 1, 4)
+        return {'tipo': tipo, 'desde': (año, 3 * trimestre - 2), 'hasta': (año, 3 * trimestre)}
+    return {'tipo': tipo, 'desde': (año, 1), 'hasta': (año, 12)}
+
+def periodo_anterior(periodo):
+    """Periodo del mismo largo inmediatamente anterior (para comparar)"""
+    largo = _indice(periodo['hasta']) - _indice(periodo['desde']) + 1
+    inicio = _indice(periodo['desde']) - largo
+    return {'tipo': periodo['tipo'], 'desde': _año_mes(inicio), 'hasta': _año_mes(inicio + largo - 1)}
+
+def meses_del_periodo(periodo):
+    """Lista de (año, mes) del periodo, en orden"""
+    return [_año_mes(i) for i in range(_indice(periodo['desde']), _indice(periodo['hasta']) + 1)]
+
+def etiqueta_periodo(periodo):
+    (año_desde, mes_desde), (año_hasta, mes_hasta) = periodo['desde'], periodo['hasta']
+    if periodo['tipo'] == 'mes':
+        return f"{NOMBRES_MESES[mes_desde - 1]} {año_desde}"
+    if periodo['tipo'] == 'trimestre':
+        return f"T{(mes_desde - 1) // 3 + 1} {año_desde}"
+    if periodo['tipo'] == 'año':
+        return str(año_desde)
+    return f"{NOMBRES_MESES[mes_desde - 1][:3]} {año_desde} - {NOMBRES_MESES[mes_hasta - 1][:3]} {año_hasta}"
+
+def texto_mes(año_mes):
+    """(año, mes) como AAAA-MM"""
+    return '%04d-%02d' % año_mes
+
+def clave_periodo(periodo):
+    """Identificador corto del periodo (para ETag y caché)"""
+    return f"{texto_mes(periodo['desde'])}_{texto_mes(periodo['hasta'])}"
+
+def periodo_json(periodo):
+    return {
+        'tipo': periodo['tipo'],
+        'desde': texto_mes(periodo['desde']),
+        'hasta': texto_mes(periodo['hasta']),
+        'etiqueta': etiqueta_periodo(periodo)
+    }
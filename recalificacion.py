@@ -0,0 +1,203 @@
+# sistema_contador/recalificacion.py
+"""
+Recalificación periódica de la cartera de clientes
+Vuelve a evaluar a todos los clientes con EvaluadorCredito usando su último estado de pago
+y guarda solo las filas cuya calificación o aptitud cambió.
+
+Uso:
+    flask --app app recalificar                # Ejecución manual (p. ej. desde cron)
+    RECALIFICACION_HORA=02:30 python app.py    # Programador en segundo plano dentro del servidor
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from database import get_db_connection, obtener_reglas_credito, serializar_evaluacion, registrar_evaluaciones
+from database import marcar_datos_modificados
+from evaluacion_credito import EvaluadorCredito, ReglasCredito, DETALLE_DESGLOSE
+
+TAMANO_BLOQUE = int(os.getenv('RECALIFICACION_BLOQUE', 5000))  # Clientes por lectura y por transacción
+HORA_PROGRAMADA = os.getenv('RECALIFICACION_HORA', '')         # 'HH:MM' para activar el programador
+
+# calificacion_crediticia es DECIMAL(3,1): se compara con la precisión que guarda MySQL
+PRECISION_CALIFICACION = Decimal('0.1')
+
+SQL_BLOQUE_CLIENTES = """
+    SELECT id, sueldo, otros_ingresos, gastos_vivienda, tiene_propiedad, valor_propiedad,
+           estado_actual, apto_prestamo, calificacion_crediticia
+    FROM clientes
+    WHERE id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+SQL_ULTIMOS_ESTADOS = """
+    SELECT cliente_id, estado FROM (
+        SELECT cliente_id, estado,
+               ROW_NUMBER() OVER (PARTITION BY cliente_id ORDER BY año DESC, mes DESC, id DESC) as orden
+        FROM pagos
+        WHERE cliente_id BETWEEN %s AND %s
+    ) ultimos
+    WHERE orden = 1
+"""
+
+SQL_ACTUALIZAR = """
+    UPDATE clientes SET apto_prestamo=%s, evaluacion_ia=%s, calificacion_crediticia=%s, fecha_evaluacion=NOW()
+    WHERE id=%s
+"""
+
+_lock_recalificacion = threading.Lock()
+
+def _como_calificacion(valor):
+    """Valor numérico redondeado como lo guarda la columna calificacion_crediticia"""
+    if valor is None:
+        return None
+    return Decimal(str(valor)).quantize(PRECISION_CALIFICACION, rounding=ROUND_HALF_UP)
+
+def detectar_cambios(evaluador, filas, ultimos_estados):
+    """
+    Evaluar un bloque de clientes y devolver (cliente_id, evaluacion) de los que cambiaron
+    filas: tuplas en el orden de SQL_BLOQUE_CLIENTES
+    ultimos_estados: {cliente_id: estado del último pago}; sin pagos se usa estado_actual
+    """
+    if not filas:
+        return []
+
+    estados = [ultimos_estados.get(fila[0], fila[6]) for fila in filas]
+    lote = evaluador.evaluar_lote(
+        sueldo=[float(fila[1] or 0) for fila in filas],
+        otros_ingresos=[float(fila[2] or 0) for fila in filas],
+        gastos_vivienda=[float(fila[3] or 0) for fila in filas],
+        tiene_propiedad=[bool(fila[4]) for fila in filas],
+        valor_propiedad=[float(fila[5] or 0) for fila in filas],
+        estado_actual=estados
+    )
+
+    cambios = []
+    for i, fila in enumerate(filas):
+        apto = lote['apto_prestamo'][i]
+        puntuacion = float(lote['puntuacion_final'][i])
+        if apto == fila[7] and _como_calificacion(puntuacion) == _como_calificacion(fila[8]):
+            continue
+
+        # Solo las filas que cambian necesitan el desglose y los códigos de motivo que se guardan
+        evaluacion = evaluador.evaluar_cliente(
+            sueldo=float(fila[1] or 0),
+            otros_ingresos=float(fila[2] or 0),
+            gastos_vivienda=float(fila[3] or 0),
+            tiene_propiedad=bool(fila[4]),
+            valor_propiedad=float(fila[5] or 0),
+            estado_actual=estados[i],
+            detalle=DETALLE_DESGLOSE
+        )
+        cambios.append((fila[0], evaluacion))
+    return cambios
+
+def parametros_actualizacion(cambios):
+    """Parámetros de SQL_ACTUALIZAR para los cambios de detectar_cambios"""
+    return [
+        (evaluacion['apto_prestamo'], serializar_evaluacion(evaluacion), evaluacion['puntuacion_final'], cliente_id)
+        for cliente_id, evaluacion in cambios
+    ]
+
+def recalificar_cartera(tamano_bloque=TAMANO_BLOQUE, progreso=print):
+    """
+    Recorrer clientes por bloques de id (paginación por clave), recalificarlos y
+    escribir los cambios con executemany, una transacción por bloque
+    Retorna: diccionario con procesados, actualizados y segundos
+    """
+    if not _lock_recalificacion.acquire(blocking=False):
+        raise RuntimeError('Ya hay una recalificación en curso')
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError('No se pudo conectar a la base de datos')
+        cursor = conn.cursor()
+
+        # Reglas activas en la base (este proceso puede no haberlas cargado todavía)
+        registro = obtener_reglas_credito(cursor)
+        evaluador = EvaluadorCredito(ReglasCredito.desde_registro(*registro) if registro else None)
+        if progreso:
+            progreso(f"  Reglas de crédito v{evaluador.reglas.version}")
+
+        inicio = time.perf_counter()
+        procesados = actualizados = 0
+        ultimo_id = 0
+
+        while True:
+            cursor.execute(SQL_BLOQUE_CLIENTES, (ultimo_id, tamano_bloque))
+            filas = cursor.fetchall()
+            if not filas:
+                break
+
+            cursor.execute(SQL_ULTIMOS_ESTADOS, (filas[0][0], filas[-1][0]))
+            ultimos_estados = dict(cursor.fetchall())
+
+            cambios = detectar_cambios(evaluador, filas, ultimos_estados)
+            try:
+                if cambios:
+                    cursor.executemany(SQL_ACTUALIZAR, parametros_actualizacion(cambios))
+                    registrar_evaluaciones(cursor, cambios, 'recalificacion')
+                    marcar_datos_modificados(cursor)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+            procesados += len(filas)
+            actualizados += len(cambios)
+            ultimo_id = filas[-1][0]
+            segundos = time.perf_counter() - inicio
+            if progreso:
+                progreso(f"  ... {procesados:,} clientes, {actualizados:,} actualizados "
+                         f"({procesados / max(segundos, 1e-9):,.0f} filas/s)")
+
+        segundos = time.perf_counter() - inicio
+        return {'procesados': procesados, 'actualizados': actualizados, 'segundos': round(segundos, 2)}
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if conn is not None:
+            conn.close()
+        _lock_recalificacion.release()
+
+def _segundos_hasta(hora, ahora=None):
+    """Segundos hasta la próxima ocurrencia de 'HH:MM'"""
+    ahora = ahora or datetime.now()
+    horas, minutos = (int(parte) for parte in hora.split(':'))
+    siguiente = ahora.replace(hour=horas, minute=minutos, second=0, microsecond=0)
+    if siguiente <= ahora:
+        siguiente += timedelta(days=1)
+    return (siguiente - ahora).total_seconds()
+
+def iniciar_programador(hora=HORA_PROGRAMADA, al_terminar=None):
+    """
+    Ejecutar recalificar_cartera todos los días a la hora indicada en un hilo de fondo
+    Retorna el hilo, o None si no hay hora configurada
+    """
+    if not hora:
+        return None
+
+    def ciclo():
+        while True:
+            time.sleep(_segundos_hasta(hora))
+            print(f"🔄 Recalificación programada ({hora})...")
+            try:
+                resultado = recalificar_cartera()
+                print(f"✅ Recalificación: {resultado['procesados']:,} clientes, "
+                      f"{resultado['actualizados']:,} actualizados en {resultado['segundos']}s")
+                if al_terminar:
+                    al_terminar()
+            except Exception as e:
+                print(f"❌ Error en la recalificación programada: {e}")
+
+    hilo = threading.Thread(target=ciclo, name='recalificacion', daemon=True)
+    hilo.start()
+    print(f"⏰ Recalificación diaria programada a las {hora}")
+    return hilo
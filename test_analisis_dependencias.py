@@ -0,0 +1,91 @@
+# test_analisis_dependencias.py
+# Pruebas del escaneo de imports y de la medición de dependencias
+
+from analisis_dependencias import (_parsear_importtime, analizar_proyecto, escanear_imports,
+                                   huella_proyecto, medir_import)
+
+FUENTE = '''
+import json
+import numpy as np
+from openpyxl.styles import Font
+import local
+
+TABLA = np.zeros(3)
+
+class Informe:
+    fuente = None
+
+    def estilo(self):
+        return Font(bold=True)
+
+def exportar():
+    import pyarrow
+    return pyarrow
+'''
+
+def _proyecto(tmp_path):
+    (tmp_path / 'modulo.py').write_text(FUENTE, encoding='utf-8')
+    (tmp_path / 'local.py').write_text('', encoding='utf-8')
+    (tmp_path / 'requirements.txt').write_text('numpy==2.3.4\nopenpyxl==3.1.5\n', encoding='utf-8')
+    return tmp_path
+
+def test_escanear_imports_distingue_usos(tmp_path):
+    imports = escanear_imports(str(_proyecto(tmp_path)))
+    assert set(imports) == {'numpy', 'openpyxl', 'pyarrow'}  # Sin estándar ni módulos locales
+
+    numpy, = imports['numpy']
+    assert not numpy['diferido'] and numpy['usado_en'] == ['<modulo>']
+
+    openpyxl, = imports['openpyxl']
+    assert openpyxl['modulo'] == 'openpyxl.styles'
+    assert openpyxl['usado_en'] == ['Informe.estilo']
+
+    pyarrow, = imports['pyarrow']
+    assert pyarrow['diferido'] and pyarrow['linea'] == 16
+
+def test_huella_cambia_con_requirements_y_fuentes(tmp_path):
+    proyecto = _proyecto(tmp_path)
+    inicial = huella_proyecto(str(proyecto))
+    assert huella_proyecto(str(proyecto)) == inicial
+
+    (proyecto / 'requirements.txt').write_text('numpy==2.3.5\n', encoding='utf-8')
+    con_requirements = huella_proyecto(str(proyecto))
+    assert con_requirements != inicial
+
+    (proyecto / 'local.py').write_text('X = 1\n', encoding='utf-8')
+    assert huella_proyecto(str(proyecto)) != con_requirements
+
+def test_parsear_importtime():
+    salida = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       120 |        120 |   numpy._core\n'
+        'import time:        30 |        150 | numpy\n'
+    )
+    assert _parsear_importtime(salida) == [(120, 120, 'numpy._core', 3), (30, 150, 'numpy', 1)]
+
+def test_medir_import_en_interprete_limpio(tmp_path):
+    medida = medir_import('decimal', str(tmp_path))
+    assert medida['ms'] > 0 and medida['modulos'] >= 1
+    assert 'decimal' in medida['por_paquete']
+    assert 'error' in medir_import('modulo_que_no_existe', str(tmp_path))
+
+def test_analisis_se_reutiliza_mientras_no_cambie_la_huella(tmp_path, monkeypatch):
+    (tmp_path / 'proyecto').mkdir()
+    proyecto = _proyecto(tmp_path / 'proyecto')
+    cache = str(tmp_path / 'cache.json')
+    mediciones = []
+
+    def medir(modulos, directorio):
+        mediciones.append(modulos)
+        return {'ms': 1.0, 'memoria_bytes': 0, 'modulos': 1, 'por_paquete': {}}
+
+    monkeypatch.setattr('analisis_dependencias.medir_import', medir)
+    primero = analizar_proyecto(str(proyecto), repeticiones=1, ruta_cache=cache)
+    cantidad = len(mediciones)
+    assert analizar_proyecto(str(proyecto), repeticiones=1, ruta_cache=cache) == primero
+    assert len(mediciones) == cantidad
+    assert primero['requirements'] == [['numpy', '2.3.4'], ['openpyxl', '3.1.5']]
+
+    (proyecto / 'modulo.py').write_text(FUENTE + '\n# cambio\n', encoding='utf-8')
+    assert analizar_proyecto(str(proyecto), repeticiones=1, ruta_cache=cache)['huella'] != primero['huella']
+    assert len(mediciones) > cantidad
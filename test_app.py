@@ -0,0 +1,135 @@
+# test_app.py
+# Pruebas de la lógica de app.py que no necesita MySQL (conexión reemplazada por una falsa)
+
+import threading
+
+import numpy as np
+import pytest
+
+import app as aplicacion
+from informes import ColaInformes
+from modelos_ia import CadenaMarkovPagos
+
+class CursorContadores:
+    """Cursor dictionary que responde cualquier conteo"""
+    
+    def __init__(self, registro):
+        self.registro = registro
+    
+    def execute(self, sql, params=()):
+        self.registro.append(' '.join(sql.split()))
+    
+    def fetchone(self):
+        return {'total': 10, 'count': 3}
+    
+    def close(self):
+        pass
+
+class ConexionContadores:
+    def __init__(self):
+        self.consultas = []
+        self.falla = False
+    
+    def cursor(self, dictionary=False):
+        if self.falla:
+            raise RuntimeError('sin conexión')
+        return CursorContadores(self.consultas)
+
+@pytest.fixture
+def conexion(monkeypatch):
+    conn = ConexionContadores()
+    monkeypatch.setattr(aplicacion, 'obtener_conexion', lambda: conn)
+    aplicacion.invalidar_contadores()
+    yield conn
+    aplicacion.invalidar_contadores()
+
+def test_contadores_en_cache_hasta_invalidar(conexion):
+    contadores = aplicacion.obtener_contadores()
+    assert contadores == {'total_clientes': 10, 'clientes_riesgo_count': 3,
+                          'pagos_pendientes': 3, 'alertas_count': 6}
+    consultas = len(conexion.consultas)
+    
+    assert aplicacion.obtener_contadores() == contadores
+    assert len(conexion.consultas) == consultas
+    
+    aplicacion.invalidar_contadores()
+    aplicacion.obtener_contadores()
+    assert len(conexion.consultas) == 2 * consultas
+
+def test_contadores_vencen_con_el_ttl(conexion, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'CONTADORES_TTL', 0)
+    aplicacion.obtener_contadores()
+    consultas = len(conexion.consultas)
+    aplicacion.obtener_contadores()
+    assert len(conexion.consultas) == 2 * consultas
+
+def test_contadores_con_error_no_se_guardan(conexion):
+    conexion.falla = True
+    assert set(aplicacion.obtener_contadores().values()) == {0}
+    
+    conexion.falla = False
+    assert aplicacion.obtener_contadores()['total_clientes'] == 10
+
+def test_grafico_no_carga_contadores(conexion, monkeypatch):
+    monkeypatch.setattr(aplicacion, 'obtener_contadores', lambda: pytest.fail('contadores cargados'))
+    with aplicacion.app.test_request_context('/charts/estados.svg'):
+        aplicacion.app.preprocess_request()
+    with aplicacion.app.test_request_context('/api/dashboard/stats'):
+        aplicacion.app.preprocess_request()
+
+@pytest.mark.parametrize('metodo, url, cuerpo', [
+    ('post', '/api/evaluar-crediticio', {'sueldo': 3000, 'gastos_vivienda': 500, 'detalle': 'todo'}),
+    ('get', '/api/predecir/7?detalle=todo', None),
+    ('post', '/api/predecir/lote', {'detalle': 'todo'}),
+    ('get', '/api/predecir/lote?ids=1,x', None),
+    ('post', '/api/predecir/lote', {'cliente_ids': [1, None]})
+])
+def test_parametros_no_validos_400_sin_consultar(conexion, metodo, url, cuerpo):
+    cliente = aplicacion.app.test_client()
+    respuesta = getattr(cliente, metodo)(url, json=cuerpo)
+    assert respuesta.status_code == 400 and respuesta.get_json()['success'] is False
+    assert conexion.consultas == []
+
+def test_descarga_directa_espera_el_archivo(conexion, monkeypatch, tmp_path):
+    cola = ColaInformes(directorio=str(tmp_path), hilos=1)
+    liberar = threading.Event()
+    
+    def generar(destino):
+        liberar.wait(5)
+        with open(destino, 'wb') as f:
+            f.write(b'xlsx')
+    
+    cola.registrar('pagos', generar, lambda: 1)
+    monkeypatch.setattr(aplicacion, 'cola_informes', cola)
+    monkeypatch.setattr(aplicacion, 'ESPERA_DESCARGA_INFORME', 0.05)
+    cliente = aplicacion.app.test_client()
+    
+    # Sin terminar a tiempo: 503 con Retry-After, nunca el JSON del trabajo
+    respuesta = cliente.get('/api/descargar-informe-pagos')
+    assert respuesta.status_code == 503 and respuesta.headers['Retry-After']
+    
+    # Terminado durante la espera: se envía el archivo
+    monkeypatch.setattr(aplicacion, 'ESPERA_DESCARGA_INFORME', 5)
+    threading.Timer(0.1, liberar.set).start()
+    respuesta = cliente.get('/api/descargar-informe-pagos')
+    assert respuesta.status_code == 200 and respuesta.data == b'xlsx'
+    assert respuesta.mimetype == aplicacion.MIMETYPE_EXCEL
+
+def test_aportes_durante_reentrenamiento_se_cuentan_una_vez(monkeypatch):
+    monkeypatch.setattr(aplicacion, '_modelo_markov',
+                        {'modelo': None, 'entrenado_en': 0.0, 'version_datos': 0, 'pendientes': None})
+    
+    def datos():
+        # Confirmados mientras se entrena: la versión 5 ya está en la lectura, la 6 llegó después
+        aplicacion.aplicar_aporte_markov({('al_dia', 'impago'): 1}, 5)
+        aplicacion.aplicar_aporte_markov({('al_dia', 'retraso_leve'): 1}, 6)
+        codigos = CadenaMarkovPagos().codificar(['al_dia', 'impago'])
+        return codigos, np.zeros(2, dtype=np.int64), 5
+    
+    monkeypatch.setattr(aplicacion, 'obtener_datos_entrenamiento', datos)
+    modelo = aplicacion.refrescar_modelo_markov()
+    assert modelo.conteos['al_dia'] == {'impago': 1, 'retraso_leve': 1}
+    
+    aplicacion.aplicar_aporte_markov({('al_dia', 'impago'): 1}, 4)  # Ya contado al entrenar
+    aplicacion.aplicar_aporte_markov({('al_dia', 'impago'): 1}, 7)
+    assert aplicacion.obtener_modelo_markov().conteos['al_dia'] == {'impago': 2, 'retraso_leve': 1}
@@ -0,0 +1,36 @@
+# test_arranque.py
+# Benchmark de arranque: import app en un intérprete limpio
+
+import json
+import os
+import subprocess
+import sys
+
+from analisis_dependencias import DIRECTORIO_PROYECTO, _mediana, medir_import
+
+# Límites generosos para máquinas lentas; la medición de referencia es ~0,3 s y ~40 MB
+ARRANQUE_MAX_MS = float(os.getenv('ARRANQUE_MAX_MS', 1500))
+ARRANQUE_MAX_MB = float(os.getenv('ARRANQUE_MAX_MB', 100))
+
+# Se cargan en el primer gráfico, informe Excel, exportación parquet o predictor ML
+LIBRERIAS_DIFERIDAS = ['matplotlib', 'openpyxl', 'pandas', 'sklearn', 'scipy', 'pyarrow']
+
+def test_import_app_no_carga_librerias_pesadas():
+    proceso = subprocess.run(
+        [sys.executable, '-c',
+         'import json, sys, app; '
+         f'print(json.dumps([m for m in {LIBRERIAS_DIFERIDAS!r} if m in sys.modules]))'],
+        cwd=DIRECTORIO_PROYECTO, capture_output=True, text=True
+    )
+    assert proceso.returncode == 0, proceso.stderr
+    assert json.loads(proceso.stdout.strip().splitlines()[-1]) == []
+
+def test_tiempo_y_memoria_de_arranque():
+    medida = _mediana([medir_import('app') for _ in range(3)])
+    assert 'error' not in medida, medida.get('error')
+    print(f"\nimport app: {medida['ms']:.0f} ms, {medida['modulos']} módulos, "
+          f"{(medida['memoria_bytes'] or 0) / 2**20:.1f} MB")
+
+    assert medida['ms'] <= ARRANQUE_MAX_MS
+    if medida['memoria_bytes'] is not None:
+        assert medida['memoria_bytes'] / 2**20 <= ARRANQUE_MAX_MB
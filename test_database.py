@@ -0,0 +1,236 @@
+# test_database.py
+# Pruebas de las funciones de database.py que no necesitan MySQL
+
+import time
+
+import mysql.connector
+import pytest
+
+from database import _evaluacion_antigua_a_json, leer_evaluacion, serializar_evaluacion, registrar_evaluaciones
+from database import PoolAgotadoError, PoolConexiones, ajustar_resumen_pagos, reconstruir_resumen_pagos
+from database import MIGRACIONES, aplicar_migraciones
+from evaluacion_credito import EvaluadorCredito
+
+def test_evaluacion_antigua_str_dict_a_json():
+    evaluacion = EvaluadorCredito().evaluar_cliente(3500.0, 500.0, 800.0, True, 30000.0, 'al_dia')
+    convertida = _evaluacion_antigua_a_json(str(evaluacion))
+    assert leer_evaluacion(convertida) == evaluacion
+    # Lo que ya es JSON se deja igual; lo ilegible se descarta
+    assert _evaluacion_antigua_a_json(convertida) == convertida
+    assert _evaluacion_antigua_a_json("{'a': __import__('os')}") is None
+    assert _evaluacion_antigua_a_json('') is None
+
+def test_serializar_y_leer_evaluacion():
+    evaluacion = {'puntuacion_final': 72.5, 'apto_prestamo': 'Sí ✓', 'motivos': ['veredicto:apto']}
+    texto = serializar_evaluacion(evaluacion)
+    assert 'Sí ✓' in texto
+    assert leer_evaluacion(texto) == evaluacion
+    assert leer_evaluacion(texto.encode('utf-8')) == evaluacion
+    assert leer_evaluacion(None) is None
+
+class CursorRegistro:
+    """Cursor que solo registra las sentencias recibidas"""
+    
+    def __init__(self):
+        self.sentencias = []
+    
+    def execute(self, sql, params=()):
+        self.sentencias.append((' '.join(sql.split()), list(params)))
+    
+    def executemany(self, sql, filas):
+        self.sentencias.append((' '.join(sql.split()), list(filas)))
+
+def test_registrar_evaluaciones_por_lote():
+    evaluador = EvaluadorCredito()
+    evaluaciones = [
+        (7, evaluador.evaluar_cliente(3500.0, 0.0, 800.0, False, 0.0, 'al_dia', detalle='desglose')),
+        (9, evaluador.evaluar_cliente(900.0, 0.0, 1600.0, False, 0.0, 'impago', detalle='desglose'))
+    ]
+    cursor = CursorRegistro()
+    registrar_evaluaciones(cursor, evaluaciones)
+    
+    (insercion, filas), (puntero, ids) = cursor.sentencias
+    assert insercion.startswith('INSERT INTO evaluaciones')
+    assert filas[0][:5] == (7, 'recalificacion', 0, evaluaciones[0][1]['puntuacion_final'], 'Sí ✓')
+    assert filas[1][-1] == evaluaciones[1][1]['detalle']['ratio_deuda']
+    assert 'SET c.ultima_evaluacion_id = u.id' in puntero and ids == [7, 9]
+    
+    registrar_evaluaciones(cursor, [])
+    assert len(cursor.sentencias) == 2
+
+def test_ajustar_resumen_suma_y_resta_deltas():
+    filas = [(2025, 11, 'al_dia', 3, 750.0), (2025, 11, 'impago', 1, 250.0)]
+    cursor = CursorRegistro()
+    ajustar_resumen_pagos(cursor, filas)
+    ajustar_resumen_pagos(cursor, filas[:1], signo=-1)
+    
+    (suma, deltas), (resta, deltas_resta) = cursor.sentencias
+    assert suma.startswith('INSERT INTO resumen_pagos') and 'ON DUPLICATE KEY UPDATE' in suma
+    assert 'cantidad = cantidad + VALUES(cantidad)' in suma and 'monto = monto + VALUES(monto)' in suma
+    assert deltas == filas
+    assert deltas_resta == [(2025, 11, 'al_dia', -3, -750.0)]
+
+def test_ajustar_resumen_sin_filas_no_ejecuta_nada():
+    cursor = CursorRegistro()
+    ajustar_resumen_pagos(cursor, [])
+    assert cursor.sentencias == []
+
+def test_reconstruir_resumen_desde_pagos():
+    cursor = CursorRegistro()
+    cursor.rowcount = 4
+    assert reconstruir_resumen_pagos(cursor) == 4
+    (borrado, _), (insercion, _) = cursor.sentencias
+    assert borrado == 'DELETE FROM resumen_pagos'
+    assert insercion.startswith('INSERT INTO resumen_pagos') and 'GROUP BY año, mes, estado' in insercion
+
+class ConexionFalsa:
+    """Conexión MySQL falsa para el pool: registra rollback/close y puede fallar el ping"""
+    
+    def __init__(self, **config):
+        self.rollbacks = 0
+        self.cerrada = False
+        self.caida = False
+        self.falla_rollback = False
+    
+    def ping(self, reconnect=False):
+        if self.caida:
+            raise mysql.connector.InterfaceError('conexión perdida')
+    
+    def rollback(self):
+        if self.falla_rollback:
+            raise mysql.connector.OperationalError('servidor desconectado')
+        self.rollbacks += 1
+    
+    def close(self):
+        self.cerrada = True
+
+@pytest.fixture
+def conexiones(monkeypatch):
+    """Conexiones abiertas por el pool, en orden"""
+    abiertas = []
+    
+    def conectar(**config):
+        conn = ConexionFalsa(**config)
+        abiertas.append(conn)
+        return conn
+    
+    monkeypatch.setattr(mysql.connector, 'connect', conectar)
+    return abiertas
+
+def test_pool_reutiliza_y_hace_rollback_al_devolver(conexiones):
+    pool = PoolConexiones({}, pool_size=2, max_overflow=0)
+    prestada = pool.obtener()
+    prestada.close()
+    prestada.close()  # Idempotente
+    assert conexiones[0].rollbacks == 1
+    
+    with pytest.raises(mysql.connector.InterfaceError):
+        prestada.cursor()
+    
+    pool.obtener().close()
+    assert len(conexiones) == 1 and not conexiones[0].cerrada
+
+def test_pool_desborde_limite_y_tiempo_de_espera(conexiones):
+    pool = PoolConexiones({}, pool_size=1, max_overflow=1, timeout=0.05)
+    primera, segunda = pool.obtener(), pool.obtener()
+    assert len(conexiones) == 2
+    
+    with pytest.raises(PoolAgotadoError):
+        pool.obtener()
+    
+    # Solo pool_size conexiones quedan abiertas; la de desborde se cierra
+    primera.close()
+    segunda.close()
+    assert [conn.cerrada for conn in conexiones] == [False, True]
+    
+    # Los cupos se liberaron
+    pool.obtener()
+    pool.obtener()
+
+def test_pool_recicla_conexiones_vencidas(conexiones):
+    pool = PoolConexiones({}, pool_size=1, max_overflow=0, recycle=0.01)
+    pool.obtener().close()
+    time.sleep(0.02)
+    pool.obtener()
+    assert len(conexiones) == 2 and conexiones[0].cerrada
+
+def test_pool_pre_ping_descarta_conexiones_caidas(conexiones):
+    pool = PoolConexiones({}, pool_size=1, max_overflow=0)
+    pool.obtener().close()
+    conexiones[0].caida = True
+    pool.obtener()
+    assert len(conexiones) == 2 and conexiones[0].cerrada
+    
+    # Sin pre_ping la conexión se presta sin verificar
+    sin_ping = PoolConexiones({}, pool_size=1, max_overflow=0, pre_ping=False)
+    sin_ping.obtener().close()
+    conexiones[-1].caida = True
+    sin_ping.obtener()
+    assert len(conexiones) == 3
+
+def test_pool_descarta_si_falla_el_rollback(conexiones):
+    pool = PoolConexiones({}, pool_size=1, max_overflow=0, timeout=0.05)
+    prestada = pool.obtener()
+    conexiones[0].falla_rollback = True
+    prestada.close()
+    assert conexiones[0].cerrada
+    
+    # El cupo se devolvió aunque la conexión se descartara
+    pool.obtener()
+    assert len(conexiones) == 2
+
+class BaseMigraciones:
+    """Conexión y cursor falsos que guardan schema_version en memoria"""
+    
+    def __init__(self, aplicadas=()):
+        self.aplicadas = list(aplicadas)
+        self.confirmadas = []
+        self.resultado = None
+    
+    def execute(self, sql, params=()):
+        if 'MAX(version)' in sql:
+            self.resultado = (max(self.aplicadas, default=0),)
+        elif sql.startswith('INSERT INTO schema_version'):
+            self.aplicadas.append(params[0])
+    
+    def fetchone(self):
+        return self.resultado
+    
+    def commit(self):
+        self.confirmadas.append(list(self.aplicadas))
+
+def _migraciones(ejecutadas, falla_en=None):
+    def migracion(version):
+        def aplicar(cursor):
+            if version == falla_en:
+                raise RuntimeError(f'falla {version}')
+            ejecutadas.append(version)
+        return aplicar
+    return [(version, f'migración {version}', migracion(version)) for version in (1, 2, 3)]
+
+def test_migraciones_en_orden_y_una_sola_vez(monkeypatch):
+    ejecutadas = []
+    monkeypatch.setattr('database.MIGRACIONES', _migraciones(ejecutadas))
+    base = BaseMigraciones()
+    
+    assert aplicar_migraciones(base, base) == 3
+    assert ejecutadas == [1, 2, 3] and base.aplicadas == [1, 2, 3]
+    assert base.confirmadas == [[1], [1, 2], [1, 2, 3]]  # Un commit por migración
+    
+    assert aplicar_migraciones(base, base) == 3
+    assert ejecutadas == [1, 2, 3] and len(base.confirmadas) == 3
+
+def test_migraciones_retoman_desde_la_version_actual(monkeypatch):
+    ejecutadas = []
+    monkeypatch.setattr('database.MIGRACIONES', _migraciones(ejecutadas, falla_en=2))
+    base = BaseMigraciones()
+    with pytest.raises(RuntimeError):
+        aplicar_migraciones(base, base)
+    assert base.aplicadas == [1] and base.confirmadas == [[1]]
+    
+    monkeypatch.setattr('database.MIGRACIONES', _migraciones(ejecutadas))
+    assert aplicar_migraciones(base, base) == 3
+    assert ejecutadas == [1, 2, 3]
+
+def test_migraciones_publicadas_numeradas_sin_huecos():
+    assert [version for version, _, _ in MIGRACIONES] == list(range(1, len(MIGRACIONES) + 1))
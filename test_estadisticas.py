@@ -0,0 +1,133 @@
+# test_estadisticas.py
+# Pruebas del payload de métricas del dashboard
+
+import json
+import threading
+import time
+from decimal import Decimal
+
+from estadisticas import SQL_AGREGADOS, SQL_CLIENTES_RIESGO, SQL_PERIODO, calcular_estadisticas, server_timing
+
+NOVIEMBRE = {'tipo': 'mes', 'desde': (2025, 11), 'hasta': (2025, 11)}
+
+AGREGADOS_PAGOS = {
+    'monto_total_cartera': Decimal('4499.75'), 'monto_moroso': Decimal('499.25'),
+    'pagos_retraso': Decimal(3), 'pagos_impago': Decimal(2)
+}
+
+RESPUESTAS = {
+    'agregados': [
+        dict(AGREGADOS_PAGOS, estado_actual='al_dia', aptos=Decimal(5), rechazados=Decimal(0)),
+        dict(AGREGADOS_PAGOS, estado_actual='impago', aptos=Decimal(2), rechazados=Decimal(1)),
+        dict(AGREGADOS_PAGOS, estado_actual='retraso_grave', aptos=Decimal(0), rechazados=Decimal(3))
+    ],
+    'periodo': [
+        {'año': 2025, 'mes': 10, 'estado': 'al_dia', 'cantidad': 4, 'monto': Decimal('500.00')},
+        {'año': 2025, 'mes': 11, 'estado': 'al_dia', 'cantidad': 6, 'monto': Decimal('600.00')},
+        {'año': 2025, 'mes': 11, 'estado': 'impago', 'cantidad': 1, 'monto': Decimal('80.10')}
+    ],
+    'riesgo': [{'id': 3, 'nombre': 'Ana', 'email': 'ana@x.bo', 'estado_actual': 'impago',
+                'total_pagos': 4, 'total_impagos': Decimal(2), 'deuda_total': Decimal('199.25')}],
+    'rechazados': [{'id': 9, 'nombre': 'Luis', 'email': 'l@x.bo', 'telefono': '', 'estado_actual': 'impago',
+                    'puntuacion': Decimal('12.5'), 'deuda_total': None, 'razon_rechazo': 'Impago permanente'}]
+}
+
+class ConexionGuion:
+    """Conexión falsa: responde según la consulta y registra cuándo se devuelve"""
+    
+    def __init__(self, respuestas, demora=0.0):
+        self.respuestas = respuestas
+        self.demora = demora
+        self.cerrada = False
+        self.filas = None
+        self.params = None
+    
+    def cursor(self, dictionary=False):
+        return self
+    
+    def execute(self, sql, params=()):
+        time.sleep(self.demora)
+        self.params = params
+        if sql == SQL_AGREGADOS:
+            self.filas = self.respuestas['agregados']
+        elif sql == SQL_PERIODO:
+            self.filas = self.respuestas['periodo']
+        elif sql == SQL_CLIENTES_RIESGO:
+            self.filas = self.respuestas['riesgo']
+        else:
+            self.filas = self.respuestas['rechazados']
+    
+    def fetchall(self):
+        return self.filas
+    
+    def close(self):
+        if self.filas is not None:
+            self.cerrada = True
+
+def _fabrica(respuestas, demora=0.0):
+    conexiones = []
+    lock = threading.Lock()
+    
+    def obtener_conexion():
+        conn = ConexionGuion(respuestas, demora)
+        with lock:
+            conexiones.append(conn)
+        return conn
+    return obtener_conexion, conexiones
+
+def test_payload_compacto_y_serializable():
+    obtener_conexion, conexiones = _fabrica(RESPUESTAS)
+    estadisticas, tiempos = calcular_estadisticas(NOVIEMBRE, obtener_conexion)
+    json.dumps(estadisticas)  # Sin Decimal ni fechas
+    
+    assert estadisticas['total_clientes'] == 7 and estadisticas['total_rechazados'] == 4
+    assert estadisticas['estados'] == {'al_dia': 5, 'impago': 2}
+    assert estadisticas['pagos_retraso'] == 3 and estadisticas['pagos_impago'] == 2
+    assert estadisticas['monto_moroso'] == 499.25 and estadisticas['monto_total_cartera'] == 4499.75
+    
+    periodo, anterior = estadisticas['periodo'], estadisticas['periodo_anterior']
+    assert periodo['etiqueta'] == 'Noviembre 2025' and anterior['desde'] == '2025-10'
+    assert periodo['ingresos'] == 600.0 and periodo['pagos_al_dia'] == 6
+    assert periodo['por_estado']['impago'] == {'cantidad': 1, 'monto': 80.1}
+    assert anterior['ingresos'] == 500.0 and anterior['meses'] == [['2025-10', 500.0]]
+    
+    riesgo = estadisticas['clientes_riesgo']
+    assert riesgo['columnas'][:2] == ['id', 'nombre']
+    assert riesgo['filas'] == [[3, 'Ana', 'ana@x.bo', 'impago', 4, 2.0, 199.25]]
+    assert estadisticas['clientes_rechazados']['filas'][0][5] == 12.5
+    
+    # Una conexión por consulta, todas devueltas al pool
+    assert len(conexiones) == 4 and all(conn.cerrada for conn in conexiones)
+    assert set(tiempos) == {'agregados', 'periodo', 'clientes_riesgo', 'clientes_rechazados', 'total'}
+    
+    # El periodo anterior y el elegido se leen juntos, acotados por la clave (año, mes)
+    periodo_leido, = [conn for conn in conexiones if conn.filas is RESPUESTAS['periodo']]
+    assert periodo_leido.params == (2025, 2025, 202510, 202511)
+
+def test_periodo_con_meses_sin_pagos():
+    trimestre = {'tipo': 'trimestre', 'desde': (2025, 10), 'hasta': (2025, 12)}
+    estadisticas, _ = calcular_estadisticas(trimestre, _fabrica(RESPUESTAS)[0])
+    assert estadisticas['periodo']['meses'] == [['2025-10', 500.0], ['2025-11', 600.0], ['2025-12', 0.0]]
+    assert estadisticas['periodo']['ingresos'] == 1100.0
+    assert estadisticas['periodo_anterior']['etiqueta'] == 'T3 2025'
+    assert estadisticas['periodo_anterior']['por_estado'] == {}
+
+def test_sin_clientes_ni_pagos():
+    vacio = dict.fromkeys(AGREGADOS_PAGOS, 0)
+    respuestas = {'agregados': [dict(vacio, estado_actual=None, aptos=None, rechazados=None)],
+                  'periodo': [], 'riesgo': [], 'rechazados': []}
+    estadisticas, _ = calcular_estadisticas(NOVIEMBRE, _fabrica(respuestas)[0])
+    assert estadisticas['estados'] == {} and estadisticas['total_clientes'] == 0
+    assert estadisticas['monto_total_cartera'] == 0 and estadisticas['periodo']['ingresos'] == 0
+    assert estadisticas['clientes_riesgo'] == {'columnas': [], 'filas': []}
+
+def test_consultas_en_paralelo():
+    obtener_conexion, _ = _fabrica(RESPUESTAS, demora=0.2)
+    inicio = time.perf_counter()
+    _, tiempos = calcular_estadisticas(NOVIEMBRE, obtener_conexion)
+    assert time.perf_counter() - inicio < 0.5  # En serie serían 0,8 s
+    assert tiempos['agregados']['consulta'] >= 200
+    
+    cabecera = server_timing(tiempos)
+    assert 'agregados;dur=' in cabecera and 'clientes_riesgo-conexion;dur=' in cabecera
+    assert cabecera.endswith(f"total;dur={tiempos['total']:.1f}")
@@ -76,5 +76,141 @@ def prueba_evaluacion():
     print("✅ TODAS LAS PRUEBAS COMPLETADAS EXITOSAMENTE")
     print("="*60 + "\n")
 
+def test_evaluar_lote_coincide_con_escalar():
+    """La evaluación vectorizada debe dar exactamente los mismos valores que evaluar_cliente"""
+    import numpy as np
+    
+    evaluador = EvaluadorCredito()
+    rng = np.random.default_rng(7)
+    n = 2000
+    
+    # Mitad en los bordes de cada tramo, mitad aleatorios
+    bordes_ingresos = [0, 999.99, 1000, 1999, 2000, 3000, 4999.99, 5000, -5]
+    bordes_gastos = [0, 299, 300, 599.5, 600, 1000, 1499, 1500, -1]
+    sueldo = np.concatenate([rng.choice(bordes_ingresos, n // 2), np.round(rng.uniform(0, 9000, n // 2), 2)])
+    otros_ingresos = np.where(rng.random(n) < 0.5, 0, np.round(rng.uniform(0, 1000, n), 2))
+    gastos_vivienda = np.concatenate([rng.choice(bordes_gastos, n // 2), np.round(rng.uniform(0, 3000, n // 2), 2)])
+    tiene_propiedad = rng.random(n) < 0.4
+    valor_propiedad = np.where(rng.random(n) < 0.8, np.round(rng.uniform(0, 90000, n), 2), 0)
+    estado_actual = rng.choice(['al_dia', 'retraso_leve', 'retraso_grave', 'impago', 'pendiente', 'otro'], n)
+    
+    lote = evaluador.evaluar_lote(
+        sueldo=sueldo,
+        otros_ingresos=otros_ingresos,
+        gastos_vivienda=gastos_vivienda,
+        tiene_propiedad=tiene_propiedad,
+        valor_propiedad=valor_propiedad,
+        estado_actual=estado_actual
+    )
+    
+    for i in range(n):
+        escalar = evaluador.evaluar_cliente(
+            sueldo=float(sueldo[i]),
+            otros_ingresos=float(otros_ingresos[i]),
+            gastos_vivienda=float(gastos_vivienda[i]),
+            tiene_propiedad=bool(tiene_propiedad[i]),
+            valor_propiedad=float(valor_propiedad[i]),
+            estado_actual=estado_actual[i]
+        )
+        for campo in ['puntuacion_final', 'apto_prestamo', 'nivel_riesgo', 'color', 'margen_disponible']:
+            assert lote[campo][i] == escalar[campo], (campo, i)
+        for campo in ['ingresos_mensuales', 'gastos_mensuales', 'ratio_deuda', 'score_ingresos',
+                      'score_deudas', 'score_ratio', 'score_historial', 'score_propiedad']:
+            assert lote[campo][i] == escalar['detalle'][campo], (campo, i)
+
+def test_evaluar_lote_con_dataframe():
+    import pandas as pd
+    
+    datos = pd.DataFrame({
+        'sueldo': [3500, 0],
+        'otros_ingresos': [500, 0],
+        'gastos_vivienda': [800, 200],
+        'tiene_propiedad': [True, False],
+        'valor_propiedad': [30000, 0],
+        'estado_actual': ['al_dia', 'impago']
+    }, index=[10, 20])
+    
+    resultado = EvaluadorCredito().evaluar_lote(datos)
+    assert list(resultado.index) == [10, 20]
+    assert resultado.loc[10, 'apto_prestamo'] == 'Sí ✓'
+    assert resultado.loc[20, 'apto_prestamo'] == 'No ✗'
+
+def test_reglas_personalizadas_en_escalar_y_lote():
+    """Unas reglas cargadas desde JSON cambian por igual el camino escalar y el de lote"""
+    from evaluacion_credito import ReglasCredito
+    
+    reglas = ReglasCredito.desde_json(json.dumps({
+        'version': 7,
+        'ingresos': {'umbrales': [2500], 'puntajes': [10, 100], 'cero': 0},
+        'aptitud': {
+            'umbrales': [60],
+            'niveles': [
+                {'apto': 'No ✗', 'riesgo': 'Alto', 'color': 'danger'},
+                {'apto': 'Sí ✓', 'riesgo': 'Bajo', 'color': 'success'}
+            ]
+        }
+    }))
+    evaluador = EvaluadorCredito(reglas)
+    
+    escalar = evaluador.evaluar_cliente(2500, 0, 800, False, 0, 'al_dia')
+    lote = evaluador.evaluar_lote(sueldo=[2499, 2500], gastos_vivienda=[800, 800], estado_actual=['al_dia', 'al_dia'])
+    assert escalar['version_reglas'] == 7
+    assert escalar['detalle']['score_ingresos'] == 100
+    assert list(lote['score_ingresos']) == [10, 100]
+    assert lote['puntuacion_final'][1] == escalar['puntuacion_final']
+    assert lote['apto_prestamo'][1] == escalar['apto_prestamo']
+
+def test_reglas_invalidas():
+    from evaluacion_credito import ReglasCredito, ReglasInvalidasError
+    import pytest
+    
+    with pytest.raises(ReglasInvalidasError):
+        ReglasCredito({'deudas': {'umbrales': [600, 300], 'puntajes': [1, 2, 3]}})
+    with pytest.raises(ReglasInvalidasError):
+        ReglasCredito({'ratio': {'umbrales': [0.5], 'puntajes': [1, 2, 3]}})
+
+def test_niveles_de_detalle_y_motivos():
+    """Las recomendaciones se generan desde los códigos de motivo guardados"""
+    evaluador = EvaluadorCredito()
+    datos = dict(sueldo=1500.0, otros_ingresos=0.0, gastos_vivienda=1200.0,
+                 tiene_propiedad=True, valor_propiedad=25000.0, estado_actual='retraso_grave')
+    
+    puntuacion = evaluador.evaluar_cliente(**datos, detalle='puntuacion')
+    desglose = evaluador.evaluar_cliente(**datos, detalle='desglose')
+    completo = evaluador.evaluar_cliente(**datos)
+    
+    assert 'detalle' not in puntuacion and 'recomendaciones' not in puntuacion
+    assert 'recomendaciones' not in desglose
+    assert puntuacion['puntuacion_final'] == desglose['puntuacion_final'] == completo['puntuacion_final']
+    assert desglose['motivos'][:2] == ['propiedad:1', 'veredicto:no_apto']
+    assert 'mejora:deudas' in desglose['motivos']
+    assert evaluador.recomendaciones_de(desglose) == completo['recomendaciones']
+    assert completo['recomendaciones'][1].startswith('🚫')
+
+def test_mensajes_de_gastos_en_los_umbrales():
+    """En los umbrales de gastos el texto es el de la versión original (comparaciones <=)"""
+    evaluador = EvaluadorCredito()
+    apto = '🎉 APTO PARA PRÉSTAMO: Reunes todos los requisitos para acceder a financiamiento.'
+    ingresos = '✅ Ingresos buenos (≥ 3000 Bs.). Capacidad de pago adecuada.'
+    historial = '✅ Historial perfecto. Cliente al día en todos sus compromisos.'
+    sin_propiedad = '💡 SIN PROPIEDAD: Adquirir una propiedad mejoraría significativamente tu perfil crediticio.'
+    esperadas = {
+        300: [apto, ingresos, '✅ Gastos bajos (≤ 300 Bs.). Mucho margen disponible para nuevas obligaciones.',
+              '✅ Ratio excelente (7.5%). Puede asumir fácilmente un préstamo.', historial, sin_propiedad],
+        600: [apto, ingresos, '✅ Gastos controlados (≤ 600 Bs.). Buen margen para asumir préstamo.',
+              '✅ Ratio excelente (15.0%). Puede asumir fácilmente un préstamo.', historial, sin_propiedad],
+        1000: [apto, ingresos, '⚠️ Gastos moderados (≤ 1000 Bs.). Margen disponible aceptable.',
+               '✅ Ratio excelente (25.0%). Puede asumir fácilmente un préstamo.', historial, sin_propiedad],
+        1500: ['⏳ APTO CONDICIONADO: Puedes acceder a préstamo pero con limitaciones.', ingresos,
+               '✅ Ratio adecuado (37.5%). Capacidad de pago comprobada.', historial,
+               '❌ Gastos altos (> 1000 Bs.). Poco margen para nuevas obligaciones.', sin_propiedad,
+               '💡 REDUCIR GASTOS: Disminuir gastos de vivienda mejorará tu margen disponible.']
+    }
+    for gastos, recomendaciones in esperadas.items():
+        evaluacion = evaluador.evaluar_cliente(sueldo=4000.0, otros_ingresos=0.0, gastos_vivienda=float(gastos),
+                                               tiene_propiedad=False, valor_propiedad=0.0, estado_actual='al_dia')
+        assert evaluacion['recomendaciones'] == recomendaciones, gastos
+        assert evaluacion['apto_prestamo'] == ('Sí ✓' if gastos < 1500 else 'Condicionado')
+
 if __name__ == '__main__':
     prueba_evaluacion()
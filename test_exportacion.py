@@ -0,0 +1,67 @@
+# test_exportacion.py
+# Pruebas de los filtros y serializadores de la exportación masiva
+
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from exportacion import (EXPORTACIONES, consulta_exportacion, exportar_csv, exportar_ndjson,
+                         exportar_parquet, validar_filtros)
+
+COLUMNAS = [('id', 'entero'), ('activo', 'booleano'), ('monto', 'decimal(10,2)'), ('fecha', 'fecha_hora')]
+
+def _lotes():
+    return iter([
+        [(1, 1, Decimal('10.50'), datetime(2025, 3, 1, 12, 0)), (2, 0, Decimal('0.00'), None)],
+        [(3, None, Decimal('7.25'), datetime(2025, 4, 1))]
+    ])
+
+def test_validar_filtros():
+    assert validar_filtros({'estado': 'impago', 'año': '2025', 'mes': '3', 'cliente': ''}) == \
+        {'estado': 'impago', 'año': 2025, 'mes': 3}
+    for parametros in ({'estado': 'moroso'}, {'mes': '13'}, {'año': 'dos mil'}):
+        with pytest.raises(ValueError):
+            validar_filtros(parametros)
+
+def test_consulta_con_filtros_parametrizados():
+    sql, parametros = consulta_exportacion('pagos', {'estado': 'al_dia', 'cliente': 7})
+    assert " FROM pagos p WHERE " in sql
+    assert sql.endswith("WHERE p.estado = %s AND p.cliente_id = %s ORDER BY p.id")
+    assert parametros == ('al_dia', 7)
+
+    sql, parametros = consulta_exportacion('clientes', {})
+    assert 'evaluacion_ia' not in sql and 'WHERE' not in sql
+    assert sql.endswith(" FROM clientes c ORDER BY c.id")
+    assert sql.count(',') == len(EXPORTACIONES['clientes']['columnas']) - 1
+
+def test_csv_un_bloque_por_lote():
+    partes = list(exportar_csv(COLUMNAS, _lotes()))
+    assert len(partes) == 3  # Encabezado + dos lotes
+    filas = list(csv.reader(io.StringIO(b''.join(partes).decode('utf-8'))))
+    assert filas[0] == ['id', 'activo', 'monto', 'fecha']
+    assert filas[1] == ['1', 'true', '10.50', '2025-03-01 12:00:00']
+    assert filas[2] == ['2', 'false', '0.00', '']
+    assert filas[3][1] == ''
+    assert len(filas) == 4
+
+def test_ndjson_tipos_json():
+    lineas = b''.join(exportar_ndjson(COLUMNAS, _lotes())).decode('utf-8').splitlines()
+    assert [json.loads(linea) for linea in lineas] == [
+        {'id': 1, 'activo': True, 'monto': 10.5, 'fecha': '2025-03-01T12:00:00'},
+        {'id': 2, 'activo': False, 'monto': 0.0, 'fecha': None},
+        {'id': 3, 'activo': None, 'monto': 7.25, 'fecha': '2025-04-01T00:00:00'}
+    ]
+
+def test_parquet_por_grupos_de_filas():
+    pq = pytest.importorskip('pyarrow.parquet')
+    lotes = ([(i, i % 2, Decimal('1.00'), None)] for i in range(5))
+    archivo = pq.ParquetFile(io.BytesIO(b''.join(exportar_parquet(COLUMNAS, lotes, filas_por_grupo=2))))
+    assert archivo.metadata.num_rows == 5
+    assert archivo.metadata.num_row_groups == 3
+    tabla = archivo.read()
+    assert tabla.column('activo').to_pylist() == [False, True, False, True, False]
+    assert str(tabla.schema.field('monto').type) == 'decimal128(10, 2)'
@@ -0,0 +1,34 @@
+# test_graficos.py
+# Pruebas de la caché y los formatos del gráfico de estados
+
+import graficos
+from graficos import grafico_estados, huella_estados, renderizar_svg
+
+ESTADOS = [{'estado_actual': 'al_dia', 'cantidad': 5}, {'estado_actual': 'impago', 'cantidad': 2}]
+
+def test_huella_depende_solo_de_los_conteos():
+    assert huella_estados(ESTADOS) == huella_estados([dict(fila) for fila in ESTADOS])
+    assert huella_estados(ESTADOS) != huella_estados([{'estado_actual': 'al_dia', 'cantidad': 6}, ESTADOS[1]])
+
+def test_svg_con_una_barra_por_estado():
+    svg = renderizar_svg(ESTADOS).decode('utf-8')
+    assert svg.startswith('<svg') and svg.endswith('</svg>')
+    assert svg.count('<rect') == 2
+    assert '>Al Dia<' in svg and '>5<' in svg
+
+def test_se_dibuja_una_vez_por_huella(monkeypatch):
+    dibujos = []
+
+    def contar(estados):
+        dibujos.append(estados)
+        return b'<svg/>'
+
+    monkeypatch.setitem(graficos.RENDERIZADORES, 'svg', contar)
+    graficos._cache.clear()
+
+    huella, contenido = grafico_estados(ESTADOS, 'svg')
+    assert grafico_estados(ESTADOS, 'svg') == (huella, contenido)
+    assert len(dibujos) == 1
+
+    grafico_estados([{'estado_actual': 'al_dia', 'cantidad': 9}], 'svg')
+    assert len(dibujos) == 2
@@ -0,0 +1,114 @@
+# test_informes.py
+# Pruebas de la cola de informes y su caché por versión de datos
+
+import os
+import threading
+
+from informes import ColaInformes, LISTO, ERROR
+
+def _cola(tmp_path, version, llamadas, liberar=None):
+    cola = ColaInformes(directorio=str(tmp_path), hilos=1)
+
+    def generar(destino):
+        if liberar is not None:
+            liberar.wait(5)
+        llamadas.append(destino)
+        with open(destino, 'w') as f:
+            f.write(f"datos v{version['v']}")
+
+    cola.registrar('pagos', generar, lambda: version['v'])
+    return cola
+
+def test_reutiliza_trabajo_en_curso_y_archivo_en_cache(tmp_path):
+    version = {'v': 1}
+    llamadas = []
+    liberar = threading.Event()
+    cola = _cola(tmp_path, version, llamadas, liberar)
+
+    primero = cola.solicitar('pagos')
+    assert cola.solicitar('pagos')['id'] == primero['id']
+    assert cola.archivo(primero['id']) is None
+    liberar.set()
+    assert cola.esperar(primero['id'])['estado'] == LISTO
+
+    cacheado = cola.solicitar('pagos')
+    assert cacheado['estado'] == LISTO and cacheado['desde_cache']
+    assert len(llamadas) == 1
+    with open(cola.archivo(cacheado['id'])) as f:
+        assert f.read() == 'datos v1'
+
+def test_nueva_version_reemplaza_archivo_anterior(tmp_path):
+    version = {'v': 1}
+    llamadas = []
+    cola = _cola(tmp_path, version, llamadas)
+    anterior = cola.esperar(cola.solicitar('pagos')['id'])
+
+    version['v'] = 2
+    nuevo = cola.esperar(cola.solicitar('pagos')['id'])
+    assert nuevo['estado'] == LISTO and len(llamadas) == 2
+    assert os.listdir(tmp_path) == ['pagos-v2.xlsx']
+    assert cola.archivo(anterior['id']) is None
+
+def test_error_no_deja_archivo(tmp_path):
+    cola = ColaInformes(directorio=str(tmp_path), hilos=1)
+
+    def fallar(destino):
+        with open(destino, 'w') as f:
+            f.write('incompleto')
+        raise RuntimeError('sin conexión')
+
+    cola.registrar('pagos', fallar, lambda: 1)
+    trabajo = cola.esperar(cola.solicitar('pagos')['id'])
+    assert trabajo['estado'] == ERROR and trabajo['error'] == 'sin conexión'
+    assert os.listdir(tmp_path) == []
+
+def test_version_lenta_no_borra_la_mas_nueva(tmp_path):
+    version = {'v': 1}
+    liberar_v1 = threading.Event()
+    cola = ColaInformes(directorio=str(tmp_path), hilos=2)
+
+    def generar(destino):
+        if destino.startswith(os.path.join(str(tmp_path), 'pagos-v1.')):
+            liberar_v1.wait(5)
+        with open(destino, 'w') as f:
+            f.write(os.path.basename(destino))
+
+    cola.registrar('pagos', generar, lambda: version['v'])
+    lento = cola.solicitar('pagos')
+
+    version['v'] = 2
+    nuevo = cola.esperar(cola.solicitar('pagos')['id'])
+    assert nuevo['estado'] == LISTO
+
+    # v1 termina después de publicada v2: no debe borrarla
+    liberar_v1.set()
+    assert cola.esperar(lento['id'])['estado'] == LISTO
+    assert cola.archivo(nuevo['id']) is not None
+    assert 'pagos-v2.xlsx' in os.listdir(tmp_path)
+
+    # La próxima versión limpia las dos anteriores
+    version['v'] = 3
+    cola.esperar(cola.solicitar('pagos')['id'])
+    assert os.listdir(tmp_path) == ['pagos-v3.xlsx']
+
+def test_huellas_se_ordenan_por_pedido(tmp_path):
+    version = {'v': 'b7f0'}
+    cola = ColaInformes(directorio=str(tmp_path), hilos=1)
+    cola.registrar('librerias', lambda destino: open(destino, 'w').close(), lambda: version['v'])
+    (tmp_path / 'librerias-vzz99.xlsx').write_text('')  # De un proceso anterior
+
+    cola.esperar(cola.solicitar('librerias')['id'])
+    version['v'] = '0a1c'
+    cola.esperar(cola.solicitar('librerias')['id'])
+    assert os.listdir(tmp_path) == ['librerias-v0a1c.xlsx']
+
+def test_orden_de_huellas_no_crece(tmp_path):
+    version = {'v': 'a0'}
+    cola = ColaInformes(directorio=str(tmp_path), hilos=1)
+    cola.registrar('librerias', lambda destino: open(destino, 'w').close(), lambda: version['v'])
+
+    for i in range(20):
+        version['v'] = f"h{i:02d}"
+        cola.esperar(cola.solicitar('librerias')['id'])
+    assert list(cola._orden) == [('librerias', 'h19')]
+    assert os.listdir(tmp_path) == ['librerias-vh19.xlsx']
@@ -0,0 +1,113 @@
+# test_modelos_ia.py
+# Pruebas del modelo de Markov (CadenaMarkovPagos)
+
+import numpy as np
+
+from modelos_ia import CadenaMarkovPagos
+
+def test_entrenar_cuenta_transiciones_por_cliente():
+    """Solo se cuentan pares consecutivos del mismo cliente"""
+    markov = CadenaMarkovPagos()
+    markov.entrenar([
+        ['al_dia', 'al_dia', 'retraso_leve'],
+        ['impago', 'impago']
+    ])
+    assert markov.total_transiciones() == 3
+    assert markov.conteos['al_dia'] == {'al_dia': 1, 'retraso_leve': 1}
+    assert markov.conteos['impago'] == {'impago': 1}
+    # Sin transición entre la última del primer cliente y la primera del segundo
+    assert markov.conteos['retraso_leve'] == {}
+
+def test_vista_compatible_con_diccionarios():
+    """Filas con datos solo incluyen estados observados; las demás usan la matriz por defecto"""
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'al_dia', 'al_dia', 'retraso_leve']])
+    matriz = markov.matriz_transicion
+    assert matriz['al_dia'] == {'al_dia': 2 / 3, 'retraso_leve': 1 / 3}
+    assert matriz['impago'] == markov._probabilidades_default('impago')
+
+def test_entrenar_arrays_equivale_a_secuencias():
+    markov_lista = CadenaMarkovPagos()
+    markov_lista.entrenar([['al_dia', 'impago', 'impago'], ['retraso_leve', 'al_dia']])
+
+    markov_arrays = CadenaMarkovPagos()
+    codigos = markov_arrays.codificar(['al_dia', 'impago', 'impago', 'retraso_leve', 'al_dia'])
+    markov_arrays.entrenar_arrays(codigos, np.array([7, 7, 7, 9, 9]))
+
+    assert np.array_equal(markov_lista.conteos_array, markov_arrays.conteos_array)
+    assert np.allclose(markov_lista.matriz, markov_arrays.matriz)
+
+def test_actualizar_conteos_equivale_a_reentrenar():
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'retraso_leve']])
+    markov.actualizar_conteos({('retraso_leve', 'impago'): 1})
+    markov.actualizar_conteos({('al_dia', 'retraso_leve'): 1}, -1)
+
+    referencia = CadenaMarkovPagos()
+    referencia.entrenar([['retraso_leve', 'impago']])
+    assert np.array_equal(markov.conteos_array, referencia.conteos_array)
+    assert np.allclose(markov.matriz, referencia.matriz)
+
+def test_predecir_sin_entrenar_usa_matriz_default():
+    predicciones, probabilidades = CadenaMarkovPagos().predecir('impago', 2)
+    assert predicciones == ['impago', 'impago']
+    assert probabilidades == [50.0, 50.0]
+
+def test_potencias_y_estacionaria():
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'retraso_leve', 'al_dia', 'impago', 'retraso_grave', 'al_dia']])
+    assert np.allclose(markov.potencia(4), np.linalg.matrix_power(markov.matriz, 4))
+    pi = markov.distribucion_estacionaria()
+    assert np.isclose(pi.sum(), 1.0)
+    assert np.allclose(pi @ markov.matriz, pi)
+
+def test_meses_hasta_impago_matriz_fundamental():
+    """Con la matriz por defecto, t = (I - Q)^-1 · 1 sobre los estados no absorbentes"""
+    markov = CadenaMarkovPagos()
+    markov.entrenar([])
+    q = CadenaMarkovPagos.MATRIZ_DEFAULT[:3, :3]
+    esperado = np.linalg.solve(np.eye(3) - q, np.ones(3))
+    assert np.allclose(markov.meses_hasta_impago()[:3], esperado)
+    assert markov.meses_hasta_impago()[3] == 0
+
+def test_meses_hasta_impago_con_clase_cerrada_sin_impago():
+    """al_dia solo vuelve a al_dia: nunca cae en impago, sin afectar a los estados que sí llegan"""
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'al_dia'], ['retraso_leve', 'retraso_grave', 'impago']])
+    tiempos = markov.meses_hasta_impago()
+    assert np.isinf(tiempos[0])
+    assert np.allclose(tiempos[1:], [2, 1, 0])
+    assert markov.pronostico('al_dia')['meses_hasta_impago'] is None
+    assert markov.pronostico('retraso_leve')['meses_hasta_impago'] == 2
+
+    # Si retraso_leve puede pasar a al_dia, el impago ya no es seguro desde él
+    markov.actualizar_conteos({('retraso_leve', 'al_dia'): 1})
+    tiempos = markov.meses_hasta_impago()
+    assert np.isinf(tiempos[:2]).all()
+    assert np.allclose(tiempos[2:], [1, 0])
+
+def test_pronostico_se_invalida_al_actualizar():
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'al_dia']])
+    antes = markov.pronostico('al_dia', 2)
+    assert markov.pronostico('al_dia', 2) is antes
+    assert antes['distribuciones'][0]['al_dia'] == 100.0
+
+    markov.actualizar_conteos({('al_dia', 'impago'): 1})
+    despues = markov.pronostico('al_dia', 2)
+    assert despues['version_modelo'] > antes['version_modelo']
+    assert despues['distribuciones'][0]['impago'] == 50.0
+
+def test_copiar_no_modifica_el_original():
+    markov = CadenaMarkovPagos()
+    markov.entrenar([['al_dia', 'al_dia', 'retraso_leve']])
+    antes = markov.potencia(3).copy()
+    version, matriz = markov.version, markov.matriz
+
+    copia = markov.copiar()
+    copia.actualizar_conteos({('retraso_leve', 'impago'): 5})
+
+    assert markov.version == version and markov.matriz is matriz
+    assert markov.conteos['retraso_leve'] == {}
+    assert np.array_equal(markov.potencia(3), antes)
+    assert copia.version == version + 1 and copia.conteos['retraso_leve'] == {'impago': 5}
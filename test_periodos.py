@@ -0,0 +1,48 @@
+# test_periodos.py
+# Pruebas de la resolución de periodos de reporte
+
+from datetime import datetime
+
+import pytest
+
+from periodos import clave_periodo, etiqueta_periodo, meses_del_periodo, periodo_anterior, resolver_periodo
+
+REFERENCIA = datetime(2025, 11, 10)
+
+def test_por_defecto_el_mes_de_referencia():
+    periodo = resolver_periodo({}, REFERENCIA)
+    assert periodo == {'tipo': 'mes', 'desde': (2025, 11), 'hasta': (2025, 11)}
+    assert etiqueta_periodo(periodo) == 'Noviembre 2025'
+
+def test_trimestre_año_y_rango():
+    trimestre = resolver_periodo({'periodo': 'trimestre'}, REFERENCIA)
+    assert (trimestre['desde'], trimestre['hasta']) == ((2025, 10), (2025, 12))
+    assert etiqueta_periodo(trimestre) == 'T4 2025'
+    
+    año = resolver_periodo({'periodo': 'año', 'año': '2024'}, REFERENCIA)
+    assert (año['desde'], año['hasta']) == ((2024, 1), (2024, 12))
+    
+    rango = resolver_periodo({'periodo': 'rango', 'desde': '2024-11', 'hasta': '2025-02'}, REFERENCIA)
+    assert meses_del_periodo(rango) == [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]
+    assert etiqueta_periodo(rango) == 'Nov 2024 - Feb 2025'
+    assert clave_periodo(rango) == '2024-11_2025-02'
+
+def test_periodo_anterior_del_mismo_largo():
+    enero = resolver_periodo({'año': '2025', 'mes': '1'}, REFERENCIA)
+    assert periodo_anterior(enero) == {'tipo': 'mes', 'desde': (2024, 12), 'hasta': (2024, 12)}
+    
+    rango = resolver_periodo({'periodo': 'rango', 'desde': '2025-02', 'hasta': '2025-04'}, REFERENCIA)
+    anterior = periodo_anterior(rango)
+    assert (anterior['desde'], anterior['hasta']) == ((2024, 11), (2025, 1))
+
+@pytest.mark.parametrize('parametros', [
+    {'periodo': 'semana'},
+    {'mes': '13'},
+    {'periodo': 'trimestre', 'trimestre': 'x'},
+    {'periodo': 'rango', 'desde': '2025-03'},
+    {'periodo': 'rango', 'desde': '2025-03', 'hasta': '2025-01'},
+    {'periodo': 'rango', 'desde': '2000-01', 'hasta': '2025-01'}
+])
+def test_parametros_no_validos(parametros):
+    with pytest.raises(ValueError):
+        resolver_periodo(parametros, REFERENCIA)
@@ -0,0 +1,32 @@
+# test_recalificacion.py
+# Pruebas de la detección de cambios en la recalificación de la cartera
+
+import json
+from decimal import Decimal
+
+from evaluacion_credito import EvaluadorCredito
+from recalificacion import detectar_cambios, parametros_actualizacion
+
+def _fila(cliente_id, estado_actual, apto, calificacion):
+    # id, sueldo, otros_ingresos, gastos_vivienda, tiene_propiedad, valor_propiedad, estado_actual, apto, calificacion
+    return (cliente_id, Decimal('3500.00'), Decimal('0.00'), Decimal('800.00'), 0, Decimal('0.00'),
+            estado_actual, apto, calificacion)
+
+def test_solo_devuelve_clientes_que_cambian():
+    evaluador = EvaluadorCredito()
+    actual = evaluador.evaluar_cliente(3500.0, 0.0, 800.0, False, 0.0, 'al_dia')
+    guardada = Decimal(str(actual['puntuacion_final'])).quantize(Decimal('0.1'))
+    
+    filas = [
+        _fila(1, 'al_dia', actual['apto_prestamo'], guardada),   # Sin cambios
+        _fila(2, 'al_dia', actual['apto_prestamo'], guardada),   # Su último pago es impago
+        _fila(3, 'al_dia', 'pendiente', Decimal('0.0'))          # Nunca evaluado
+    ]
+    cambios = parametros_actualizacion(detectar_cambios(evaluador, filas, {1: 'al_dia', 2: 'impago'}))
+    
+    assert [cambio[3] for cambio in cambios] == [2, 3]
+    impago = evaluador.evaluar_cliente(3500.0, 0.0, 800.0, False, 0.0, 'impago', detalle='desglose')
+    assert cambios[0][0] == impago['apto_prestamo']
+    assert json.loads(cambios[0][1]) == impago
+    assert cambios[0][2] == impago['puntuacion_final']
+    assert 'recomendaciones' not in impago and impago['motivos']